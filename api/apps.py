@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Connects the query recorder before any connection is opened.
+        from ride_info import instrumentation  # noqa: F401
+        # Connects the user payload cache's invalidation receiver.
+        from api import usercache  # noqa: F401
+        # Registers the OpenAPI security scheme for the token authentication.
+        from api import schema  # noqa: F401
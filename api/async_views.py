@@ -0,0 +1,323 @@
+"""
+Async (ASGI) counterparts of the ride list/detail and bulk event ingestion endpoints, and
+the live ride event stream.
+
+Plain Django async views rather than DRF, whose views are synchronous. They reuse the same
+queryset builder, filters, keyset pagination and payload expressions as `engine=db`, and
+run the compiled SQL through `api.asyncdb`, so a request waiting on Postgres holds no thread.
+
+Every query, reads included, goes to the primary (`default`): the pool is not replica-aware,
+and the router only steers the ORM's synchronous connections.
+"""
+
+import asyncio
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    ParseError,
+    PermissionDenied,
+    UnsupportedMediaType,
+)
+from psycopg.errors import QueryCanceled
+from rest_framework.request import Request
+
+from api.asyncdb import connection, execute, fetch_rows
+from api.authentication import (
+    AUTH_VERSION_CLAIM,
+    ROLE_CLAIM,
+    AdminJWTAuthentication,
+    aadmin_auth_version,
+    check_auth_version,
+    token_user_id,
+)
+from api.conditional import TODAYS_EVENTS_WINDOW
+from api.connections import QueryTimeout, is_distance_ordering
+from api.eventstream import (
+    END_REPLAY_LIMIT,
+    END_UNAUTHORIZED,
+    RECONNECT_MS,
+    EventFilter,
+    StreamPosition,
+    StreamRequiresASGI,
+    replay_rows,
+    replayed_position,
+    ride_events,
+    sse_end,
+    sse_message,
+)
+from api.fieldsets import RideFieldset
+from api.ingestion import LOCK_RIDES_SQL, batch_result, drop_unknown_rides, validate_batch
+from api.pagination import RideKeysetPagination
+from api.parsers import NDJSONParser
+from api.queries import filter_rides, ride_list_queryset, ride_payload_rows
+from api.renderers import FastJSONRenderer, render_with_results
+from rides.cache import EVENTS, abump_data_version, apin_to_primary
+from rides.models import User
+
+INSERT_EVENTS_SQL = """
+INSERT INTO rides_rideevent (id_ride, description, created_at)
+SELECT id_ride, description, created_at
+FROM unnest(%s::bigint[], %s::text[], %s::timestamptz[]) WITH ORDINALITY AS item(id_ride, description, created_at, position)
+ORDER BY position
+RETURNING id_ride_event
+"""
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, headers=headers, content_type="application/json"
+    )
+
+
+def error_response(exc, headers=None):
+    """The body and status DRF's exception handler would send for `exc`."""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    return json_response(data, status=exc.status_code, headers=headers)
+
+
+async def authenticate_admin(request):
+    """
+    `AdminJWTAuthentication` + `IsAdminRole` for async views: `None` when the caller may
+    proceed (their id is left in `request.token_user_id`), otherwise the 401/403 response.
+
+    The token is verified in-process. In stateless mode only the (usually cached) auth version
+    is looked up; otherwise the user's `is_active`/`role` are read through the async connection.
+    """
+    authenticator = AdminJWTAuthentication()
+    challenge = {"WWW-Authenticate": authenticator.authenticate_header(request)}
+    try:
+        header = authenticator.get_header(request)
+        raw_token = None if header is None else authenticator.get_raw_token(header)
+        if raw_token is None:
+            raise NotAuthenticated()
+        token = authenticator.get_validated_token(raw_token)
+        user_id = request.token_user_id = token_user_id(token)
+        if AUTH_VERSION_CLAIM in token and settings.JWT_AUTH_MODE == "stateless":
+            check_auth_version(token, await aadmin_auth_version(request, user_id))
+            return None if token.get(ROLE_CLAIM) == User.ROLE_ADMIN else error_response(PermissionDenied())
+
+        users = await fetch_rows(
+            request, User.objects.filter(pk=user_id).values("is_active", "role", "auth_version")
+        )
+        if not users:
+            raise AuthenticationFailed("User not found")
+        if not users[0]["is_active"]:
+            raise AuthenticationFailed("User is inactive")
+        if AUTH_VERSION_CLAIM in token:
+            check_auth_version(token, users[0]["auth_version"])
+    except APIException as exc:
+        return error_response(exc, challenge)
+
+    if users[0]["role"] != User.ROLE_ADMIN:
+        return error_response(PermissionDenied())
+    return None
+
+
+def ride_rows(request, since):
+    """Payload rows for the request's filters, ordering and `fields` / `exclude` / `expand`."""
+    fieldset = RideFieldset.from_query_params(request.query_params)
+    rides = filter_rides(ride_list_queryset(request.query_params, since=since, fieldset=fieldset), request)
+    return ride_payload_rows(rides, since, fieldset)
+
+
+@require_GET
+async def ride_list(request):
+    """
+    `GET /api/async/rides/`: the ride list with the same filters and orderings, always as
+    `engine=db` payloads and keyset (cursor) pages.
+    """
+    denied = await authenticate_admin(request)
+    if denied is not None:
+        return denied
+
+    drf_request = Request(request)
+    since = timezone.now() - TODAYS_EVENTS_WINDOW
+    paginator = RideKeysetPagination()
+    try:
+        rows = ride_rows(drf_request, since)
+        page_queryset = paginator.get_page_queryset(rows, drf_request)
+    except APIException as exc:
+        return error_response(exc)
+
+    timeout = None
+    if is_distance_ordering(drf_request.query_params):
+        timeout = settings.RIDE_DISTANCE_STATEMENT_TIMEOUT_MS
+    try:
+        page = paginator.set_page(await fetch_rows(request, page_queryset, statement_timeout=timeout))
+    except QueryCanceled:
+        return error_response(QueryTimeout())
+    envelope = paginator.get_paginated_response([]).data
+    return HttpResponse(
+        render_with_results(envelope, [row["payload"] for row in page]),
+        content_type="application/json",
+    )
+
+
+@require_GET
+async def ride_detail(request, pk):
+    """`GET /api/async/rides/<id>/`: one ride, as built by `engine=db`."""
+    denied = await authenticate_admin(request)
+    if denied is not None:
+        return denied
+
+    since = timezone.now() - TODAYS_EVENTS_WINDOW
+    try:
+        rows = ride_rows(Request(request), since).filter(pk=pk)[:1]
+    except APIException as exc:
+        return error_response(exc)
+
+    page = await fetch_rows(request, rows)
+    if not page:
+        return error_response(NotFound("No Ride matches the given query."))
+    return HttpResponse(page[0]["payload"], content_type="application/json")
+
+
+def parse_events_body(request):
+    content_type = request.content_type
+    if content_type == "application/json":
+        try:
+            return json.loads(request.body)
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+    if content_type == NDJSONParser.media_type:
+        parser_context = {"encoding": request.encoding or "utf-8"}
+        return NDJSONParser().parse(BytesIO(request.body), parser_context=parser_context)
+    raise UnsupportedMediaType(content_type)
+
+
+@csrf_exempt
+@require_POST
+async def ride_event_bulk(request):
+    """
+    `POST /api/async/ride-events/bulk/`: same contract as `/api/ride-events/bulk/`, with
+    the ride lookup and the multi-row INSERT in one transaction on the async connection.
+
+    The lookup locks the rides it finds, so a ride deleted meanwhile is reported as unknown
+    instead of failing the INSERT's foreign key check.
+    """
+    denied = await authenticate_admin(request)
+    if denied is not None:
+        return denied
+
+    try:
+        validated, errors = validate_batch(parse_events_body(request))
+    except APIException as exc:
+        return error_response(exc)
+
+    ids = []
+    if validated:
+        ride_ids = sorted({data["id_ride"] for _index, data in validated})
+        async with connection(request) as conn:
+            async with conn.transaction():
+                cursor = conn.cursor()
+                await execute(cursor, LOCK_RIDES_SQL, [ride_ids])
+                existing = {row[0] for row in await cursor.fetchall()}
+                accepted = drop_unknown_rides(validated, existing, errors)
+                if accepted:
+                    await execute(
+                        cursor,
+                        INSERT_EVENTS_SQL,
+                        [
+                            [data["id_ride"] for data in accepted],
+                            [data["description"] for data in accepted],
+                            [data["created_at"] for data in accepted],
+                        ],
+                    )
+                    ids = [row[0] for row in await cursor.fetchall()]
+    if ids:
+        await abump_data_version(EVENTS)
+        if settings.DATABASE_REPLICAS:
+            await apin_to_primary(request.token_user_id)
+
+    body, response_status = batch_result(ids, errors)
+    return json_response(body, status=response_status)
+
+
+def last_event_id(request):
+    """
+    The `StreamPosition` to resume from: the `Last-Event-ID` header a reconnecting client
+    sends, or `last_id`.
+    """
+    value = request.headers.get("Last-Event-ID") or request.GET.get("last_id")
+    if not value:
+        return None
+    return StreamPosition.parse(value)
+
+
+async def ride_event_messages(request, subscription, position):
+    loop = asyncio.get_running_loop()
+    keepalive = settings.RIDE_EVENT_STREAM_KEEPALIVE_SECONDS
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n".encode()
+        replayed = set()
+        if position is not None:
+            # Subscribed first, so events committed meanwhile are queued, not lost; the ones
+            # both read back here and queued are sent once.
+            rows = await fetch_rows(request, replay_rows(subscription.filter, position))
+            for row in rows:
+                replayed.add(row["id_ride_event"])
+                row["position"] = replayed_position(row)
+                yield sse_message(row)
+            if len(rows) == settings.RIDE_EVENT_STREAM_REPLAY_LIMIT:
+                yield sse_end(END_REPLAY_LIMIT)
+                return
+
+        recheck_at = loop.time() + keepalive
+        while True:
+            try:
+                row = await asyncio.wait_for(subscription.get(), timeout=keepalive)
+            except TimeoutError:
+                row = False
+            if loop.time() >= recheck_at:
+                # Expired tokens and revoked users end long-lived streams too.
+                if await authenticate_admin(request) is not None:
+                    yield sse_end(END_UNAUTHORIZED)
+                    return
+                recheck_at = loop.time() + keepalive
+            if row is False:
+                yield b": keepalive\n\n"
+            elif row is None:
+                yield sse_end(subscription.ended)
+                return
+            elif row["id_ride_event"] not in replayed:
+                yield sse_message(row)
+    finally:
+        ride_events.unsubscribe(subscription)
+
+
+@require_GET
+async def ride_event_stream(request):
+    """
+    `GET /api/async/ride-events/stream/`: new ride events as server-sent events, optionally
+    limited by `id_ride`, `id_driver` and `status`, resuming after `Last-Event-ID`.
+    """
+    denied = await authenticate_admin(request)
+    if denied is not None:
+        return denied
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would buffer the endless body, and has no event loop to keep listening.
+        return error_response(StreamRequiresASGI())
+
+    try:
+        event_filter = EventFilter.from_query_params(request.GET)
+        position = last_event_id(request)
+        subscription = await ride_events.subscribe(event_filter)
+    except APIException as exc:
+        return error_response(exc)
+
+    return StreamingHttpResponse(
+        ride_event_messages(request, subscription, position),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
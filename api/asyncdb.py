@@ -0,0 +1,133 @@
+"""
+Non-blocking Postgres access for the async views.
+
+Django's async ORM methods still run each query on a worker thread with its own connection.
+These helpers instead compile a queryset to SQL and run it on a psycopg `AsyncConnection`,
+so an ASGI process holds hundreds of in-flight requests with only
+`ASYNC_DB_POOL_MAX_SIZE` connections and no extra threads.
+"""
+
+import time
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.handlers.asgi import ASGIRequest
+from psycopg import AsyncClientCursor, AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from ride_info.instrumentation import record_query
+
+_pool = None
+
+
+def connection_kwargs(host=None, port=None):
+    """psycopg connection arguments for the default database, optionally at another address."""
+    database = {**settings.DATABASES["default"]}
+    database["HOST"] = host or database["HOST"]
+    database["PORT"] = port or database["PORT"]
+    conninfo = make_conninfo(
+        **{
+            key: value
+            for key, value in {
+                "dbname": database["NAME"],
+                "user": database["USER"],
+                "password": database["PASSWORD"],
+                "host": database["HOST"],
+                "port": database["PORT"],
+            }.items()
+            if value
+        }
+    )
+    return {
+        "conninfo": conninfo,
+        "kwargs": {
+            "autocommit": True,
+            # Client-side binding, like Django's own psycopg cursors, so compiled querysets
+            # (untyped `%s` literals included) run unchanged.
+            "cursor_factory": AsyncClientCursor,
+            # Same session settings Django's connections use.
+            "client_encoding": "UTF8",
+            "options": "-c TimeZone=UTC",
+            # No prepared statements, which a PgBouncer in transaction mode cannot route.
+            "prepare_threshold": None,
+        },
+    }
+
+
+async def get_pool():
+    global _pool
+    if _pool is None:
+        params = connection_kwargs()
+        # Same switch as Django's pool: test connections before handing them out.
+        health_checks = settings.DATABASES["default"]["CONN_HEALTH_CHECKS"]
+        _pool = AsyncConnectionPool(
+            params["conninfo"],
+            kwargs=params["kwargs"],
+            min_size=settings.ASYNC_DB_POOL_MIN_SIZE,
+            max_size=settings.ASYNC_DB_POOL_MAX_SIZE,
+            timeout=settings.ASYNC_DB_POOL_TIMEOUT,
+            check=AsyncConnectionPool.check_connection if health_checks else None,
+            open=False,
+        )
+    # Idempotent; the first request under the server's event loop opens it.
+    await _pool.open()
+    return _pool
+
+
+def current_pool():
+    """This process's pool, or `None` before the first pooled request."""
+    return _pool
+
+
+@asynccontextmanager
+async def connection(request):
+    """An autocommit connection: pooled under ASGI, a short-lived one otherwise."""
+    if isinstance(request, ASGIRequest):
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            yield conn
+        return
+
+    # Under WSGI (runserver) each async view runs in its own throwaway event loop, which
+    # cannot own a pool.
+    params = connection_kwargs()
+    conn = await AsyncConnection.connect(params["conninfo"], **params["kwargs"])
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+async def execute(cursor, sql, params):
+    """`cursor.execute()`, counted in the request's query metrics like Django's queries."""
+    started = time.perf_counter()
+    try:
+        await cursor.execute(sql, params)
+    finally:
+        record_query(sql, time.perf_counter() - started)
+
+
+async def fetch_rows(request, queryset, statement_timeout=None):
+    """
+    Evaluate a `.values()` queryset without blocking the event loop; rows are dicts.
+
+    With `statement_timeout` (milliseconds) the query runs in a transaction capped by
+    `SET LOCAL statement_timeout` and raises `psycopg.errors.QueryCanceled` when it is hit.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        # e.g. `pk__in=[]`: Django knows there are no rows without asking.
+        return []
+    async with connection(request) as conn:
+        cursor = conn.cursor(row_factory=dict_row)
+        if not statement_timeout:
+            await execute(cursor, sql, params)
+            return await cursor.fetchall()
+        async with conn.transaction():
+            await execute(cursor, "SELECT set_config('statement_timeout', %s, true)", [f"{statement_timeout}ms"])
+            await execute(cursor, sql, params)
+            return await cursor.fetchall()
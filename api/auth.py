@@ -1,9 +1,28 @@
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from api.authentication import (
+    AUTH_VERSION_CLAIM,
+    ROLE_CLAIM,
+    check_auth_version,
+    load_admin_auth_version,
+    token_user_id,
+)
 
 
 class AdminTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Logging in may have rehashed the password, and the trigger bumped `auth_version`
+        # in the database when that save went through; the instance still has the old one.
+        user.refresh_from_db(fields=["auth_version"])
+        # Copied onto the access tokens minted from this refresh token.
+        token[ROLE_CLAIM] = user.role
+        token[AUTH_VERSION_CLAIM] = user.auth_version
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         if getattr(self.user, "role", None) != "admin":
@@ -11,5 +30,18 @@ class AdminTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class AdminTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if AUTH_VERSION_CLAIM in refresh:
+            # Refreshes are rare enough to always ask the database.
+            check_auth_version(refresh, load_admin_auth_version(token_user_id(refresh)))
+        return super().validate(attrs)
+
+
 class AdminTokenObtainPairView(TokenObtainPairView):
     serializer_class = AdminTokenObtainPairSerializer
+
+
+class AdminTokenRefreshView(TokenRefreshView):
+    serializer_class = AdminTokenRefreshSerializer
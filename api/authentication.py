@@ -0,0 +1,102 @@
+"""
+JWT authentication for the admin API, and token revocation.
+
+Tokens carry the user's `role` and `auth_version` as claims. With `JWT_AUTH_MODE=stateless`
+(the default) requests are authenticated from those claims, checked against the user's current
+`auth_version` held in the cache for `JWT_AUTH_VERSION_CACHE_TTL` seconds, so a request costs
+no user query. Changing a user's role, `is_active` or password bumps the version (a database
+trigger) and so revokes every token issued before; saves through the ORM also drop the cached
+copy, making the lockout immediate.
+
+Nothing here may import DRF views: this module is loaded while `APIView` reads
+`DEFAULT_AUTHENTICATION_CLASSES`.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from api.asyncdb import fetch_rows
+from rides.cache import auth_version_key
+from rides.models import User
+
+ROLE_CLAIM = "role"
+AUTH_VERSION_CLAIM = "auth_version"
+
+# Cached for users that may not use the API (unknown, inactive, not admins); versions start at 1.
+NO_ACCESS_VERSION = 0
+
+
+def admin_auth_version_queryset(user_id):
+    return User.objects.filter(pk=user_id, is_active=True, role=User.ROLE_ADMIN).values("auth_version")
+
+
+def load_admin_auth_version(user_id):
+    """The user's `auth_version` from the database, or `NO_ACCESS_VERSION`."""
+    row = admin_auth_version_queryset(user_id).first()
+    return row["auth_version"] if row else NO_ACCESS_VERSION
+
+
+def admin_auth_version(user_id):
+    """`load_admin_auth_version()` through the cache."""
+    key = auth_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = load_admin_auth_version(user_id)
+        cache.set(key, version, settings.JWT_AUTH_VERSION_CACHE_TTL)
+    return version
+
+
+async def aadmin_auth_version(request, user_id):
+    """`admin_auth_version()` for async views, querying through `api.asyncdb`."""
+    key = auth_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        rows = await fetch_rows(request, admin_auth_version_queryset(user_id))
+        version = rows[0]["auth_version"] if rows else NO_ACCESS_VERSION
+        await cache.aset(key, version, settings.JWT_AUTH_VERSION_CACHE_TTL)
+    return version
+
+
+def check_auth_version(token, current_version):
+    if token[AUTH_VERSION_CLAIM] != current_version:
+        raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+
+def token_user_id(token):
+    try:
+        return token[jwt_settings.USER_ID_CLAIM]
+    except KeyError as exc:
+        raise InvalidToken("Token contained no recognizable user identification") from exc
+
+
+class AdminTokenUser(TokenUser):
+    """`request.user` in stateless mode: built from the token's claims, no database row."""
+
+    @cached_property
+    def role(self):
+        return self.token.get(ROLE_CLAIM)
+
+
+class AdminJWTAuthentication(JWTAuthentication):
+    """
+    `JWTAuthentication` that honours `auth_version` revocation and, in stateless mode,
+    trusts the signed `role` claim instead of loading the user.
+
+    Tokens issued before the claims existed are authenticated the database way.
+    """
+
+    def get_user(self, validated_token):
+        if AUTH_VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if settings.JWT_AUTH_MODE != "stateless":
+            user = super().get_user(validated_token)
+            check_auth_version(validated_token, user.auth_version)
+            return user
+        check_auth_version(validated_token, admin_auth_version(token_user_id(validated_token)))
+        return AdminTokenUser(validated_token)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from api.usercache import user_payloads
+from ride_info.routers import current_read_alias
+from rides.cache import DATA_SCOPES, get_data_versions
+
+HITS_KEY = "api:response-cache:hits"
+MISSES_KEY = "api:response-cache:misses"
+COORDINATE_PARAMS = ("lat", "lon")
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+
+def normalize_query_params(query_params):
+    """
+    Query params as a canonical, order-independent list.
+
+    Empty values are dropped (filters ignore them). With `RIDE_RESPONSE_CACHE_COORDINATE_DECIMALS`
+    set, `lat`/`lon` are rounded to it, so nearby positions share an entry.
+    """
+    normalized = []
+    for key in sorted(query_params):
+        values = sorted(value for value in query_params.getlist(key) if value != "")
+        if key in COORDINATE_PARAMS and settings.RIDE_RESPONSE_CACHE_COORDINATE_DECIMALS is not None:
+            values = [round_coordinate(value) for value in values]
+        if values:
+            normalized.append((key, values))
+    return normalized
+
+
+def round_coordinate(value):
+    try:
+        return f"{float(value):.{settings.RIDE_RESPONSE_CACHE_COORDINATE_DECIMALS}f}"
+    except ValueError:
+        # Left as sent; the view rejects it and error responses are never cached.
+        return value
+
+
+def response_cache_key(request, view, kwargs):
+    parts = [
+        request.build_absolute_uri(request.path),
+        view.action,
+        sorted(kwargs.items()),
+        request.accepted_media_type,
+        normalize_query_params(request.query_params),
+        sorted(get_data_versions(view.get_data_scopes()).items()),
+    ]
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    # `v3`: keyed on the versions of the data the response shows (`v2`: entries hold validators).
+    return f"api:response:v3:{digest}"
+
+
+def use_rounded_coordinates(request):
+    """
+    Run the view with the same rounded `lat`/`lon` the cache key was built from, if rounding
+    is on; otherwise the request is left alone.
+    """
+    params = request._request.GET
+    if settings.RIDE_RESPONSE_CACHE_COORDINATE_DECIMALS is None or not any(key in params for key in COORDINATE_PARAMS):
+        return
+    params = params.copy()
+    for key in COORDINATE_PARAMS:
+        if key in params:
+            params.setlist(key, [round_coordinate(value) for value in params.getlist(key)])
+    request._request.GET = params
+
+
+def cache_response(view_method):
+    """
+    Cache a viewset action's rendered `200` responses for `RIDE_RESPONSE_CACHE_TTL` seconds.
+
+    Runs after authentication and permission checks, so only requests that may see the
+    response are served from the cache. Only JSON is cached (the browsable API page
+    is per user). Entries are keyed on the versions (`rides.cache`) of the data scopes the
+    viewset's `get_data_scopes()` names, so a write to that data retires them without a lookup,
+    and writes to other data leave them alone; responses read from a replica are kept at
+    most `REPLICA_MAX_LAG_SECONDS`. Responses carry
+    `X-Cache: HIT` or `X-Cache: MISS`.
+
+    Goes outside `conditional_get`: an entry keeps the response's `ETag` / `Last-Modified`,
+    so a hit answers `If-None-Match` / `If-Modified-Since` without any query. A miss that
+    ends in `304` is not stored.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if (
+            settings.RIDE_RESPONSE_CACHE_TTL <= 0
+            or request.method != "GET"
+            or request.accepted_renderer.format != "json"
+        ):
+            return view_method(self, request, *args, **kwargs)
+
+        key = response_cache_key(request, self, kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            record(HITS_KEY)
+            content, content_type, validators = cached
+            response = HttpResponse(content, content_type=content_type)
+            for header, value in validators.items():
+                response[header] = value
+            response["X-Cache"] = "HIT"
+            return get_conditional_response(
+                request,
+                etag=validators.get("ETag"),
+                last_modified=parse_http_date_safe(validators.get("Last-Modified")),
+                response=response,
+            )
+
+        record(MISSES_KEY)
+        use_rounded_coordinates(request)
+        response = view_method(self, request, *args, **kwargs)
+        response["X-Cache"] = "MISS"
+        ttl = settings.RIDE_RESPONSE_CACHE_TTL
+        if current_read_alias.get() is not None:
+            # A replica may not have replayed the write that bumped the data version yet, so
+            # what it served can be stale under the new key: keep it no longer than the lag allowed.
+            ttl = min(ttl, settings.REPLICA_MAX_LAG_SECONDS)
+
+        def store(rendered):
+            if rendered.status_code == 200:
+                validators = {header: rendered[header] for header in VALIDATOR_HEADERS if rendered.has_header(header)}
+                cache.set(key, (rendered.content, rendered["Content-Type"], validators), ttl)
+
+        if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+
+    return wrapper
+
+
+def record(counter_key):
+    try:
+        cache.incr(counter_key)
+    except ValueError:
+        if not cache.add(counter_key, 1, timeout=None):
+            cache.incr(counter_key)
+
+
+def response_cache_stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    return {
+        "backend": settings.CACHES["default"]["BACKEND"],
+        "ttl": settings.RIDE_RESPONSE_CACHE_TTL,
+        "data_versions": get_data_versions(DATA_SCOPES),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        # Per process, unlike the figures above.
+        "user_payloads": user_payloads.stats(),
+    }
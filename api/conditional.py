@@ -0,0 +1,103 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rides.models import RideEvent, User
+
+TODAYS_EVENTS_WINDOW = timedelta(hours=24)
+
+
+def make_etag(*parts):
+    """Weak ETag over JSON-serializable validator parts (versions, ids, counts, links)."""
+    payload = json.dumps(parts, default=str, separators=(",", ":")).encode("utf-8")
+    return f'W/"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
+def todays_event_count(since):
+    """
+    Events inside the `todays_ride_events` window, per ride.
+
+    Inserts, updates and deletes already bump `Ride.version`; this catches the one change
+    that has no write behind it, an event ageing out of the window.
+    """
+    events = (
+        RideEvent.objects.filter(id_ride=OuterRef("pk"), created_at__gte=since)
+        .order_by()
+        .values("id_ride")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return Coalesce(Subquery(events, output_field=IntegerField()), Value(0))
+
+
+def user_version(foreign_key):
+    """
+    The `version` of the user a ride's `foreign_key` points at.
+
+    A primary-key subquery rather than a join, so the page's `COUNT` (and its cache entry)
+    stays the same as the list's.
+    """
+    return Subquery(User.objects.filter(pk=OuterRef(foreign_key)).values("version"))
+
+
+def last_aged_out_at(since):
+    """
+    `created_at` of the newest event that has left the window since the ride was last written.
+
+    The ride's representation changed when that event aged out, `TODAYS_EVENTS_WINDOW` later.
+    """
+    events = (
+        RideEvent.objects.filter(
+            id_ride=OuterRef("pk"),
+            created_at__lt=since,
+            created_at__gte=OuterRef("updated_at") - TODAYS_EVENTS_WINDOW,
+        )
+        .order_by()
+        .values("id_ride")
+        .annotate(latest=Max("created_at"))
+        .values("latest")
+    )
+    return Subquery(events)
+
+
+def conditional_get(view_method):
+    """
+    Answer `If-None-Match` / `If-Modified-Since` for a viewset action before it runs.
+
+    The viewset's `get_conditional_validators(request, **kwargs)` returns
+    `(etag, last_modified)` from one lightweight query (either may be `None`). A match
+    returns `304 Not Modified` without running the action's query or serializer; otherwise
+    the validators are added to the action's `200` response. An action whose page is as
+    cheap to read as any validator query (ride events) returns `(None, None)` there and sets
+    `ETag` on its response itself; a match then only drops the body.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view_method(self, request, *args, **kwargs)
+
+        etag, last_modified = self.get_conditional_validators(request, **kwargs)
+        timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if etag is None and response.has_header("ETag"):
+                return get_conditional_response(request, etag=response["ETag"], response=response)
+
+        if etag is not None:
+            response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    return wrapper
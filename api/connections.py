@@ -0,0 +1,122 @@
+"""
+Per-request statement timeouts and connection pool statistics.
+
+Timeouts are set with `set_config(..., true)` (`SET LOCAL`) inside a transaction, so they
+end with it and never leak onto a reused, pooled or PgBouncer-shared server connection.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from psycopg.errors import QueryCanceled
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from api import asyncdb
+from api.eventstream import ride_events
+from ride_info.routers import read_alias, replica_stats
+
+SET_STATEMENT_TIMEOUT_SQL = "SELECT set_config('statement_timeout', %s, true)"
+
+
+class QueryTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The query took too long. Narrow it with filters such as radius_m or bbox."
+    default_code = "query_timeout"
+
+
+def is_distance_ordering(query_params):
+    return query_params.get("ordering") in {"distance", "-distance"}
+
+
+@contextmanager
+def statement_timeout(milliseconds, using=None):
+    """
+    Cap every statement in the block on database `using` (default: where this request reads)
+    at `milliseconds`; raises `QueryTimeout` when hit.
+    """
+    using = using or read_alias()
+    try:
+        with transaction.atomic(using=using):
+            with connections[using].cursor() as cursor:
+                cursor.execute(SET_STATEMENT_TIMEOUT_SQL, [f"{milliseconds}ms"])
+            yield
+    except OperationalError as exc:
+        if isinstance(exc.__cause__, QueryCanceled):
+            raise QueryTimeout() from exc
+        raise
+
+
+def distance_statement_timeout(view_method):
+    """
+    Run a ride list/detail action under `RIDE_DISTANCE_STATEMENT_TIMEOUT_MS` when it orders
+    by distance, so one expensive sort cannot hold a connection (and a pool slot) for long.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        milliseconds = settings.RIDE_DISTANCE_STATEMENT_TIMEOUT_MS
+        if not milliseconds or not is_distance_ordering(request.query_params):
+            return view_method(self, request, *args, **kwargs)
+        with statement_timeout(milliseconds):
+            return view_method(self, request, *args, **kwargs)
+
+    return wrapper
+
+
+def describe_pool(pool):
+    """Size, saturation and wait-time figures for a psycopg (sync or async) pool."""
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    in_use = stats["pool_size"] - stats["pool_available"]
+    requests = stats.get("requests_num", 0)
+    connections = stats.get("connections_num", 0)
+    return {
+        "min_size": stats["pool_min"],
+        "max_size": stats["pool_max"],
+        "size": stats["pool_size"],
+        "available": stats["pool_available"],
+        "in_use": in_use,
+        "saturation": round(in_use / stats["pool_max"], 4) if stats["pool_max"] else None,
+        "requests_waiting": stats["requests_waiting"],
+        "requests": requests,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "wait_ms_total": stats.get("requests_wait_ms", 0),
+        "wait_ms_avg": round(stats.get("requests_wait_ms", 0) / requests, 2) if requests else None,
+        "connections_opened": connections,
+        "connect_ms_avg": round(stats.get("connections_ms", 0) / connections, 2) if connections else None,
+        "connections_lost": stats.get("connections_lost", 0),
+        "returns_bad": stats.get("returns_bad", 0),
+    }
+
+
+def database_connection_stats():
+    """Connection reuse settings and pool statistics for this process."""
+    database = connection.settings_dict
+    sync_pool = connection.pool
+    if sync_pool is not None:
+        mode = "pool"
+    elif database["CONN_MAX_AGE"]:
+        mode = "persistent"
+    else:
+        mode = "per-request"
+    return {
+        "sync": {
+            "mode": mode,
+            "conn_max_age": database["CONN_MAX_AGE"],
+            "health_checks": database["CONN_HEALTH_CHECKS"],
+            "server_side_cursors": not database["DISABLE_SERVER_SIDE_CURSORS"],
+            "pool": describe_pool(sync_pool),
+        },
+        # Only the ASGI process serving /api/async/ has one, after its first request.
+        "async": {"pool": describe_pool(asyncdb.current_pool())},
+        "distance_statement_timeout_ms": settings.RIDE_DISTANCE_STATEMENT_TIMEOUT_MS,
+        # Lag as last measured by this process; empty without DATABASE_REPLICA_HOSTS.
+        "replicas": replica_stats(),
+        # Only meaningful in an ASGI process; the listener runs while streams are open.
+        "event_stream": ride_events.stats(),
+    }
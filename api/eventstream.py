@@ -0,0 +1,370 @@
+"""
+Live ride events for `GET /api/async/ride-events/stream/` (server-sent events, ASGI only).
+
+Every committed insert into `rides_rideevent` announces the new ids on the `rides_rideevent`
+channel (trigger from migration 0010). An ASGI process holds one `LISTEN` connection while it
+has subscribers. For each batch of notifications that connection loads the new events once,
+together with their ride's driver and status. It then queues every subscriber the events its
+filters match. So a thousand open streams cost one connection and one query per committed
+batch, not a thousand polling clients.
+
+Streams are resumable, not durable. A subscriber more than `RIDE_EVENT_STREAM_QUEUE_SIZE`
+events behind has its stream ended, and a lost listener connection ends every stream. The
+client then reconnects with `Last-Event-ID`, and the events it missed are read back from
+the table.
+
+Event ids are handed out at insert time, not commit time, so "the events after id N" misses
+a slower transaction's lower ids. Each event's SSE id is therefore a `StreamPosition`: the
+snapshot its statement ran under, whose transactions have all been streamed before it, plus
+its own transaction and id. A reconnect replays the events of every transaction that snapshot
+does not show, from the `inserted_xid` index.
+"""
+
+import asyncio
+import contextvars
+import logging
+import re
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import BooleanField, F, Func, Q, TextField, Value
+from django.db.models.functions import Cast
+from psycopg import AsyncConnection
+from psycopg import Error as PsycopgError
+from psycopg.rows import dict_row
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, ValidationError
+
+from api.asyncdb import connection_kwargs, execute
+from api.fieldsets import split_names
+from api.payloads import ride_event_object
+from rides.models import RideEvent
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "rides_rideevent"
+# Milliseconds a client waits before reconnecting after a stream ends (the SSE `retry` field).
+RECONNECT_MS = 1000
+
+# Why a stream ended, sent to the client as the `data` of a final `end` event.
+END_LAGGING = "lagging"
+END_LISTENER_LOST = "listener-lost"
+END_REPLAY_LIMIT = "replay-limit"
+END_UNAUTHORIZED = "unauthorized"
+
+
+class StreamUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The ride event stream is unavailable, try again later."
+    default_code = "stream_unavailable"
+
+
+class StreamRequiresASGI(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = "The ride event stream is only served by the ASGI server."
+    default_code = "asgi_required"
+
+
+def event_rows(queryset):
+    """Events with the ride fields streams filter on, their transaction, and the JSON payload."""
+    return queryset.values(
+        "id_ride_event",
+        "inserted_xid",
+        "id_ride",
+        id_driver=F("id_ride__id_driver_id"),
+        ride_status=F("id_ride__status"),
+        payload=Cast(ride_event_object(), TextField()),
+    )
+
+
+def parse_ids(query_params, param):
+    names = split_names(query_params, param)
+    try:
+        return {int(name) for name in names}
+    except ValueError:
+        raise ValidationError({param: "Expected comma-separated integers."})
+
+
+class EventFilter:
+    """The rides, drivers and ride statuses a stream is limited to; empty means any."""
+
+    def __init__(self, ride_ids=(), driver_ids=(), statuses=()):
+        self.ride_ids = frozenset(ride_ids)
+        self.driver_ids = frozenset(driver_ids)
+        self.statuses = frozenset(value.upper() for value in statuses)
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        """`id_ride`, `id_driver` and `status`, each comma-separated or repeated."""
+        return cls(
+            parse_ids(query_params, "id_ride"),
+            parse_ids(query_params, "id_driver"),
+            split_names(query_params, "status"),
+        )
+
+    def matches(self, row):
+        return (
+            (not self.ride_ids or row["id_ride"] in self.ride_ids)
+            and (not self.driver_ids or row["id_driver"] in self.driver_ids)
+            and (not self.statuses or (row["ride_status"] or "").upper() in self.statuses)
+        )
+
+    def filter(self, queryset):
+        """`queryset` narrowed the way `matches()` narrows delivered rows."""
+        if self.ride_ids:
+            queryset = queryset.filter(id_ride__in=self.ride_ids)
+        if self.driver_ids:
+            queryset = queryset.filter(id_ride__id_driver__in=self.driver_ids)
+        if self.statuses:
+            # Same case-insensitive match as the ride list's `status` filter.
+            condition = Q()
+            for value in self.statuses:
+                condition |= Q(id_ride__status__iexact=value)
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+SNAPSHOT_RE = re.compile(r"\d+:\d+:(\d+(,\d+)*)?")
+
+
+class StreamPosition(NamedTuple):
+    """
+    What a stream has sent: the events of every transaction `snapshot` shows, and those of
+    transaction `xid` up to `id_ride_event`. Sent to the client as each event's SSE id,
+    `<id_ride_event>/<xid>/<snapshot>`.
+
+    A bare `<id_ride_event>` (from a REST listing, or an event without `inserted_xid`) stands
+    for the events up to that id.
+    """
+
+    id_ride_event: int
+    xid: int | None = None
+    snapshot: str | None = None
+
+    @classmethod
+    def parse(cls, value):
+        parts = value.split("/")
+        try:
+            if len(parts) == 1:
+                return cls(int(parts[0]))
+            if len(parts) == 3 and SNAPSHOT_RE.fullmatch(parts[2]):
+                return cls(int(parts[0]), int(parts[1]), parts[2])
+        except ValueError:
+            pass
+        raise ParseError("Last-Event-ID must be an event id or a position sent by the stream.")
+
+    def __str__(self):
+        if self.snapshot is None:
+            return str(self.id_ride_event)
+        return f"{self.id_ride_event}/{self.xid}/{self.snapshot}"
+
+
+class VisibleInSnapshot(Func):
+    """`pg_visible_in_snapshot(xid, snapshot)`, with the snapshot given as text."""
+
+    function = "pg_visible_in_snapshot"
+    template = "%(function)s(%(expressions)s::pg_snapshot)"
+    output_field = BooleanField()
+
+
+def replay_rows(event_filter, position):
+    """
+    The first `RIDE_EVENT_STREAM_REPLAY_LIMIT` matching events not sent as of `position`, in
+    transaction order, each with the snapshot they were read under (`read_snapshot`).
+    """
+    events = RideEvent.objects.all()
+    if position.snapshot is None:
+        events = events.filter(id_ride_event__gt=position.id_ride_event)
+    else:
+        xmin = int(position.snapshot.split(":", 1)[0])
+        events = events.alias(sent=VisibleInSnapshot(F("inserted_xid"), Value(position.snapshot))).filter(
+            Q(inserted_xid=position.xid, id_ride_event__gt=position.id_ride_event)
+            | (Q(inserted_xid__gte=min(xmin, position.xid), sent=False) & ~Q(inserted_xid=position.xid))
+        )
+    rows = event_rows(event_filter.filter(events)).annotate(
+        read_snapshot=Func(template="pg_current_snapshot()::text", output_field=TextField())
+    )
+    ordering = (F("inserted_xid").asc(nulls_first=True), "id_ride_event")
+    return rows.order_by(*ordering)[: settings.RIDE_EVENT_STREAM_REPLAY_LIMIT]
+
+
+def replayed_position(row):
+    """
+    The position after replayed `row`, or `None` for an event without `inserted_xid`.
+
+    A replay runs in transaction id order, so from the row's transaction up everything counts
+    as unsent. Below it, what the replay's snapshot showed was sent, and the transactions it
+    still saw running were not.
+    """
+    if row["inserted_xid"] is None:
+        return None
+    xid = int(row["inserted_xid"])
+    xmin, _xmax, running = row["read_snapshot"].split(":")
+    xmin = min(int(xmin), xid)
+    running = [value for value in running.split(",") if value and int(value) < xid]
+    return StreamPosition(row["id_ride_event"], xid, f"{xmin}:{xid}:{','.join(running)}")
+
+
+class Subscription:
+    """One open stream: its filter and the matching events not yet sent."""
+
+    def __init__(self, listener, event_filter):
+        self.listener = listener
+        self.filter = event_filter
+        self.queue = asyncio.Queue(maxsize=settings.RIDE_EVENT_STREAM_QUEUE_SIZE)
+        self.ended = None
+
+    def offer(self, row):
+        if self.ended is not None:
+            return
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.listener.broker.lagging += 1
+            self.end(END_LAGGING)
+            # Also covers a stream whose client left before its body started, whose cleanup
+            # never runs.
+            self.listener.broker.unsubscribe(self)
+
+    def end(self, reason):
+        """Stop queueing; `get()` returns what is already queued, then `None`."""
+        if self.ended is None:
+            self.ended = reason
+            try:
+                # Wakes a waiting `get()`; a full queue has no waiter.
+                self.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    async def get(self):
+        """The next event row, or `None` once the stream has ended."""
+        if self.ended is not None and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class Listener:
+    """One `LISTEN` connection and the subscriptions it feeds."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.subscriptions = set()
+        loop = asyncio.get_running_loop()
+        self.ready = loop.create_future()
+        # A context of its own: the listener outlives the request that started it, and must not
+        # count its queries in that request's metrics.
+        self.task = loop.create_task(self.run(), context=contextvars.Context())
+
+    async def run(self):
+        params = connection_kwargs(
+            host=settings.RIDE_EVENT_STREAM_DATABASE_HOST, port=settings.RIDE_EVENT_STREAM_DATABASE_PORT
+        )
+        try:
+            conn = await AsyncConnection.connect(params["conninfo"], **params["kwargs"])
+            async with conn:
+                await conn.execute(f"LISTEN {CHANNEL}")
+                self.ready.set_result(None)
+                while True:
+                    # Event id -> the snapshot of the statement that inserted it, in commit order.
+                    snapshots = {}
+                    # Everything received in one read; notifications that arrive while the
+                    # events load are kept by psycopg for the next round.
+                    async for notify in conn.notifies(stop_after=1):
+                        snapshot, _, ids = notify.payload.partition("/")
+                        snapshots.update((int(value), snapshot) for value in ids.split(","))
+                        self.broker.notifications += 1
+                    await self.deliver(conn, snapshots)
+        except PsycopgError as exc:
+            self.broker.listener_errors += 1
+            logger.warning("Ride event listener stopped: %s", exc)
+            if not self.ready.done():
+                self.ready.set_exception(exc)
+        finally:
+            if not self.ready.done():
+                self.ready.cancel()
+            for subscription in self.subscriptions:
+                subscription.end(END_LISTENER_LOST)
+
+    async def deliver(self, conn, snapshots):
+        sql, params = event_rows(RideEvent.objects.filter(id_ride_event__in=list(snapshots))).query.sql_with_params()
+        cursor = conn.cursor(row_factory=dict_row)
+        await execute(cursor, sql, params)
+        rows = await cursor.fetchall()
+        self.broker.events += len(rows)
+        # Streamed in commit order, so each event's position also covers everything before it.
+        order = {event_id: index for index, event_id in enumerate(snapshots)}
+        rows.sort(key=lambda row: order[row["id_ride_event"]])
+        for row in rows:
+            row["inserted_xid"] = int(row["inserted_xid"])
+            row["position"] = StreamPosition(row["id_ride_event"], row["inserted_xid"], snapshots[row["id_ride_event"]])
+        for subscription in list(self.subscriptions):
+            for row in rows:
+                if subscription.filter.matches(row):
+                    subscription.offer(row)
+
+
+class RideEventBroker:
+    """This process's listener, started by the first subscriber and stopped after the last."""
+
+    def __init__(self):
+        self.listener = None
+        self.notifications = 0
+        self.events = 0
+        self.lagging = 0
+        self.listener_errors = 0
+
+    async def subscribe(self, event_filter):
+        """
+        A subscription that receives every matching event committed from now on. Raises
+        `StreamUnavailable` when the listener cannot connect.
+        """
+        if self.listener is None or self.listener.task.done():
+            self.listener = Listener(self)
+        listener = self.listener
+        try:
+            # Shared by everyone waiting for this listener; one client leaving must not cancel it.
+            await asyncio.shield(listener.ready)
+        except PsycopgError:
+            raise StreamUnavailable()
+        except asyncio.CancelledError:
+            # The listener stopped before listening, rather than this request being cancelled.
+            if listener.ready.cancelled():
+                raise StreamUnavailable()
+            raise
+        subscription = Subscription(listener, event_filter)
+        listener.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        listener = subscription.listener
+        listener.subscriptions.discard(subscription)
+        if not listener.subscriptions and listener is self.listener:
+            listener.task.cancel()
+            self.listener = None
+
+    def stats(self):
+        listener = self.listener
+        return {
+            "listening": listener is not None and listener.ready.done() and not listener.task.done(),
+            "subscribers": 0 if listener is None else len(listener.subscriptions),
+            "notifications": self.notifications,
+            "events": self.events,
+            "lagging_subscribers_ended": self.lagging,
+            "listener_errors": self.listener_errors,
+        }
+
+
+ride_events = RideEventBroker()
+
+
+def sse_message(row):
+    """
+    One event in the `text/event-stream` format. Its id is the row's `position`, which a
+    reconnect resumes from; without one, the client keeps the previous id.
+    """
+    position = "" if row["position"] is None else f"id: {row['position']}\n"
+    return f"{position}event: ride-event\ndata: {row['payload']}\n\n".encode()
+
+
+def sse_end(reason):
+    return f"event: end\ndata: {reason}\n\n".encode()
@@ -0,0 +1,113 @@
+import csv
+import json
+
+RIDE_EXPORT_FIELDS = (
+    "id_ride",
+    "status",
+    "id_rider",
+    "id_driver",
+    "pickup_latitude",
+    "pickup_longitude",
+    "dropoff_latitude",
+    "dropoff_longitude",
+    "pickup_time",
+    "picked_up_at",
+    "dropped_off_at",
+    "last_event_at",
+    "distance_to_pickup_meters",
+)
+EVENT_EXPORT_FIELDS = ("id_ride_event", "description", "kind", "created_at")
+
+# Bytes buffered before a chunk is handed to the server; the first line is always sent at once.
+CHUNK_SIZE_BYTES = 64 * 1024
+
+
+def format_datetime(value):
+    """Same ISO 8601 form DRF's DateTimeField renders (UTC as a trailing `Z`)."""
+    if value is None:
+        return None
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def ride_row(ride):
+    return {
+        "id_ride": ride.id_ride,
+        "status": ride.status,
+        "id_rider": ride.id_rider_id,
+        "id_driver": ride.id_driver_id,
+        "pickup_latitude": ride.pickup_latitude,
+        "pickup_longitude": ride.pickup_longitude,
+        "dropoff_latitude": ride.dropoff_latitude,
+        "dropoff_longitude": ride.dropoff_longitude,
+        "pickup_time": format_datetime(ride.pickup_time),
+        "picked_up_at": format_datetime(ride.picked_up_at),
+        "dropped_off_at": format_datetime(ride.dropped_off_at),
+        "last_event_at": format_datetime(ride.last_event_at),
+        "distance_to_pickup_meters": ride.distance_to_pickup_meters,
+    }
+
+
+def event_row(event):
+    return {
+        "id_ride_event": event.id_ride_event,
+        "description": event.description,
+        "kind": event.kind,
+        "created_at": format_datetime(event.created_at),
+    }
+
+
+def chunked(lines):
+    buffer = []
+    size = 0
+    first = True
+    for line in lines:
+        if first:
+            first = False
+            yield line
+            continue
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE_BYTES:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_ndjson(rides, include_events):
+    for ride in rides:
+        row = ride_row(ride)
+        if include_events:
+            row["events"] = [event_row(event) for event in ride.export_events]
+        yield json.dumps(row, separators=(",", ":")) + "\n"
+
+
+class _Echo:
+    """File-like object whose `write` hands the formatted CSV line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rides, include_events):
+    writer = csv.writer(_Echo())
+    header = list(RIDE_EXPORT_FIELDS)
+    if include_events:
+        header += [f"event_{field}" for field in EVENT_EXPORT_FIELDS]
+    yield writer.writerow(header)
+
+    empty_event = [""] * len(EVENT_EXPORT_FIELDS)
+    for ride in rides:
+        values = ["" if value is None else value for value in ride_row(ride).values()]
+        if not include_events:
+            yield writer.writerow(values)
+            continue
+        # One row per event, ride columns repeated; rides without events still get one row.
+        events = ride.export_events or [None]
+        for event in events:
+            event_values = empty_event if event is None else list(event_row(event).values())
+            yield writer.writerow(values + event_values)
@@ -0,0 +1,116 @@
+from operator import attrgetter
+
+from django.db import models
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from api.renderers import finite_float
+
+# Field classes whose `to_representation` is exactly the builtin conversion (floats are also
+# checked for NaN and infinities, which the renderer would otherwise write as `null`).
+BUILTIN_CONVERTERS = {
+    serializers.IntegerField: int,
+    serializers.FloatField: finite_float,
+    serializers.CharField: str,
+    serializers.EmailField: str,
+}
+
+
+def compile_plan(serializer):
+    """
+    Turn a serializer's readable fields into `(name, getter, converter)` steps.
+
+    Getters are `attrgetter`s resolved once, and converters are builtins where DRF's
+    `to_representation` would do the same thing, or the field's own bound
+    `to_representation` otherwise, so the output matches `Serializer.to_representation`.
+    """
+    plan = []
+    model = getattr(getattr(serializer, "Meta", None), "model", None)
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        source = field.source
+        if isinstance(field, serializers.ListSerializer):
+            child_plan = compile_plan(field.child)
+            plan.append((name, attrgetter(source), _many(child_plan)))
+        elif isinstance(field, serializers.BaseSerializer):
+            child_plan = compile_plan(field)
+            plan.append((name, attrgetter(source), _one(child_plan)))
+        elif isinstance(field, serializers.PrimaryKeyRelatedField) and model is not None:
+            # DRF reads the raw FK value (`serializable_value`), never the related object.
+            attname = model._meta.get_field(source).attname
+            plan.append((name, attrgetter(attname), _identity))
+        elif type(field) is serializers.DateTimeField:
+            plan.append((name, attrgetter(source), _datetime_converter(field)))
+        else:
+            converter = BUILTIN_CONVERTERS.get(type(field), field.to_representation)
+            plan.append((name, attrgetter(source), converter))
+
+    return plan
+
+
+def represent(plan, instance):
+    ret = {}
+    for name, getter, converter in plan:
+        value = getter(instance)
+        ret[name] = None if value is None else converter(value)
+    return ret
+
+
+def _datetime_converter(field):
+    """
+    `DateTimeField.to_representation` with the output timezone resolved once per plan.
+
+    DRF looks the current timezone up for every value; a plan lives for one serializer,
+    i.e. one request, so the lookup is hoisted. Anything other than an aware datetime
+    rendered as ISO 8601 goes through the field itself.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def _identity(value):
+    return value
+
+
+def _one(plan):
+    def convert(instance):
+        return represent(plan, instance)
+
+    return convert
+
+
+def _many(plan):
+    def convert(items):
+        if isinstance(items, models.manager.BaseManager):
+            items = items.all()
+        return [represent(plan, item) for item in items]
+
+    return convert
+
+
+class FastRepresentationMixin:
+    """Serializer mixin that replaces per-field DRF dispatch with a plan compiled once per instance."""
+
+    def to_representation(self, instance):
+        plan = getattr(self, "_fast_plan", None)
+        if plan is None:
+            plan = self._fast_plan = compile_plan(self)
+        return represent(plan, instance)
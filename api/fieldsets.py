@@ -0,0 +1,94 @@
+"""
+Sparse fieldsets for ride list and detail responses: `fields=`, `exclude=` and `expand=`.
+
+The selection prunes the query as well as the output: an unrequested `rider` / `driver`
+drops its join, unrequested `todays_ride_events` drops the prefetch, an unrequested
+`distance_to_pickup_meters` drops the distance computation, and `.only()` limits the ride
+and user columns to the ones the response shows.
+"""
+
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import RideListSerializer, UserSerializer
+
+RIDE_FIELDS = RideListSerializer.Meta.fields
+RIDE_RELATIONS = ("rider", "driver", "todays_ride_events")
+EXPAND_NONE = "none"
+
+# Relation field -> the ride's foreign key it is read through.
+USER_RELATIONS = {"rider": "id_rider", "driver": "id_driver"}
+# Fields written by event writes: the embedded events, and the timings event triggers fold
+# into the ride row (migration 0007).
+EVENT_FIELDS = ("picked_up_at", "dropped_off_at", "last_event_at", "todays_ride_events")
+# Fields that are not plain columns of `rides_ride`.
+COMPUTED_FIELDS = {"todays_ride_events", "distance_to_pickup_meters"}
+# Always loaded: the primary key and the keyset pagination cursor.
+REQUIRED_COLUMNS = ("id_ride", "pickup_time")
+
+
+def split_names(query_params, param):
+    """Comma-separated names from every `param` value, in order and without repeats."""
+    names = []
+    for value in query_params.getlist(param):
+        for name in value.split(","):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+class RideFieldset:
+    """The top-level `RideListSerializer` fields a request asked for, in serializer order."""
+
+    def __init__(self, names):
+        self.names = tuple(name for name in RIDE_FIELDS if name in names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    @property
+    def is_full(self):
+        return len(self.names) == len(RIDE_FIELDS)
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        """
+        `fields` (default: all) minus `exclude`, keeping only the relations named by `expand`
+        (default: all; `expand=none` embeds none). Unknown names are a `400`.
+        """
+        fields = split_names(query_params, "fields")
+        exclude = split_names(query_params, "exclude")
+        expand = split_names(query_params, "expand")
+
+        errors = {}
+        for param, names, allowed in (
+            ("fields", fields, RIDE_FIELDS),
+            ("exclude", exclude, RIDE_FIELDS),
+            ("expand", expand, (*RIDE_RELATIONS, EXPAND_NONE)),
+        ):
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                errors[param] = f"Unknown name(s): {', '.join(unknown)}. Choose from: {', '.join(allowed)}"
+        if errors:
+            raise ValidationError(errors)
+
+        selected = set(fields or RIDE_FIELDS) - set(exclude)
+        if expand:
+            selected -= {relation for relation in RIDE_RELATIONS if relation not in expand}
+        return cls(selected)
+
+    def only_fields(self, *, join_users):
+        """
+        Arguments for `.only()`: the ride columns behind the selected fields and, when users
+        are joined, the `UserSerializer` columns of each selected relation.
+        """
+        columns = list(REQUIRED_COLUMNS)
+        for name in self.names:
+            if name in USER_RELATIONS:
+                foreign_key = USER_RELATIONS[name]
+                columns.append(foreign_key)
+                if join_users:
+                    columns += [f"{foreign_key}__{field}" for field in UserSerializer.Meta.fields]
+            elif name not in COMPUTED_FIELDS:
+                columns.append(name)
+        return list(dict.fromkeys(columns))
@@ -1,12 +1,88 @@
+from datetime import datetime
+
 import django_filters
+from django.db.models import F, Q, Value
+from django.db.models.lookups import LessThanOrEqual
+from rest_framework.exceptions import ValidationError
 
-from rides.models import Ride
+from rides.geo import Cube, CubeContains, EarthBox, EarthDistance, LLToEarth, bounding_cube
+from rides.models import DriverMonthlyTripSummary, Ride
 
 
 class RideFilter(django_filters.FilterSet):
     status = django_filters.CharFilter(field_name="status", lookup_expr="iexact")
     rider_email = django_filters.CharFilter(field_name="id_rider__email", lookup_expr="iexact")
+    radius_m = django_filters.NumberFilter(method="filter_radius", min_value=0)
+    bbox = django_filters.CharFilter(method="filter_bbox")
 
     class Meta:
         model = Ride
-        fields = ["status", "rider_email"]
+        fields = ["status", "rider_email", "radius_m", "bbox"]
+
+    def filter_radius(self, queryset, name, value):
+        lat = self.data.get("lat")
+        lon = self.data.get("lon")
+        if lat is None or lon is None:
+            raise ValidationError({"radius_m": "Radius filtering requires lat and lon query params"})
+        try:
+            lat_f = float(lat)
+            lon_f = float(lon)
+        except ValueError as exc:
+            raise ValidationError({"lat": "Must be a number", "lon": "Must be a number"}) from exc
+
+        center = LLToEarth(Value(lat_f), Value(lon_f))
+        radius = float(value)
+        return queryset.filter(
+            # Index condition: the GiST index on pickup_earth answers cube containment.
+            CubeContains(EarthBox(center, Value(radius)), F("pickup_earth")),
+            # earth_box is a cube around the circle; trim its corners on the candidates only.
+            LessThanOrEqual(EarthDistance(F("pickup_earth"), center), radius),
+        )
+
+    def filter_bbox(self, queryset, name, value):
+        try:
+            min_lat, min_lon, max_lat, max_lon = (float(part) for part in value.split(","))
+        except ValueError as exc:
+            raise ValidationError({"bbox": "Expected minLat,minLon,maxLat,maxLon"}) from exc
+
+        if not (-90.0 <= min_lat <= max_lat <= 90.0):
+            raise ValidationError({"bbox": "Latitudes must satisfy -90 <= minLat <= maxLat <= 90"})
+        if not (-180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
+            raise ValidationError({"bbox": "Longitudes must be between -180 and 180"})
+
+        lower, upper = bounding_cube(min_lat, min_lon, max_lat, max_lon)
+        if min_lon <= max_lon:
+            in_longitudes = Q(pickup_longitude__gte=min_lon, pickup_longitude__lte=max_lon)
+        else:
+            # Viewport crosses the antimeridian.
+            in_longitudes = Q(pickup_longitude__gte=min_lon) | Q(pickup_longitude__lte=max_lon)
+
+        return queryset.filter(
+            CubeContains(Cube(lower, upper), F("pickup_earth")),
+            in_longitudes,
+            pickup_latitude__gte=min_lat,
+            pickup_latitude__lte=max_lat,
+        )
+
+
+class TripReportFilter(django_filters.FilterSet):
+    month_from = django_filters.CharFilter(method="filter_month_from")
+    month_to = django_filters.CharFilter(method="filter_month_to")
+    driver = django_filters.NumberFilter(field_name="id_driver")
+
+    class Meta:
+        model = DriverMonthlyTripSummary
+        fields = ["month_from", "month_to", "driver"]
+
+    def filter_month_from(self, queryset, name, value):
+        return queryset.filter(month__gte=parse_month(name, value))
+
+    def filter_month_to(self, queryset, name, value):
+        return queryset.filter(month__lte=parse_month(name, value))
+
+
+def parse_month(name, value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError as exc:
+        raise ValidationError({name: "Expected YYYY-MM"}) from exc
@@ -0,0 +1,66 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import RideEventBulkItemSerializer
+
+# The batch's rides that exist, locked until the ingesting transaction ends, so none can be
+# deleted between the lookup and the INSERT. It is the lock the event triggers take on the
+# same rides during the INSERT (migration 0005), taken earlier and in the same id order:
+# anything weaker would be shared by concurrent batches, which would then deadlock upgrading
+# it. Overlapping batches already waited on each other in the trigger; they now wait here.
+LOCK_RIDES_SQL = """
+SELECT id_ride FROM rides_ride WHERE id_ride = ANY(%s::bigint[]) ORDER BY id_ride FOR UPDATE
+"""
+
+
+def validate_batch(items):
+    """
+    Validate a bulk ingestion body item by item.
+
+    Returns `(validated, errors)`: `(index, data)` pairs for the valid items and per-index
+    error entries for the rest. Raises `ValidationError` when the body is not a usable batch.
+    """
+    if not isinstance(items, list):
+        raise ValidationError({"detail": "Expected a JSON array or NDJSON body of events."})
+    if not items:
+        raise ValidationError({"detail": "Batch is empty."})
+    if len(items) > settings.RIDE_EVENT_BULK_MAX_ITEMS:
+        raise ValidationError(
+            {"detail": f"Batch exceeds the maximum of {settings.RIDE_EVENT_BULK_MAX_ITEMS} events."}
+        )
+
+    item_serializer = RideEventBulkItemSerializer()
+    validated = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            validated.append((index, item_serializer.run_validation(item)))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.detail})
+    return validated, errors
+
+
+def drop_unknown_rides(validated, existing_ride_ids, errors):
+    """Items whose ride exists; the others are reported in `errors` like a failed lookup."""
+    accepted = []
+    for index, data in validated:
+        if data["id_ride"] not in existing_ride_ids:
+            errors.append(
+                {"index": index, "errors": {"id_ride": [f'Invalid pk "{data["id_ride"]}" - object does not exist.']}}
+            )
+            continue
+        accepted.append(data)
+    return accepted
+
+
+def batch_result(ids, errors):
+    """Response body and status: 201 all written, 207 some rejected, 400 none written."""
+    errors.sort(key=lambda error: error["index"])
+    if not ids:
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif errors:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_201_CREATED
+    return {"created": len(ids), "ids": ids, "errors": errors}, response_status
@@ -1,7 +1,312 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Q, Value
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids exact `COUNT(*)` on large result sets.
+
+    The planner's row estimate for the filtered query (`EXPLAIN`, which reads
+    `pg_class.reltuples` and column statistics) is used when it is at least
+    `PAGINATION_COUNT_ESTIMATE_THRESHOLD`; smaller results are counted exactly.
+    Either way the count is cached per query for `PAGINATION_COUNT_CACHE_TTL` seconds.
+    Pages of an estimated count read one extra row to tell whether a next page exists.
+    """
+
+    count_is_estimate = False
+
+    def __init__(self, *args, counts=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Counts this request has already taken, by cache key (see `EstimatedCountPagination`).
+        self.counts = {} if counts is None else counts
+
+    @cached_property
+    def count(self):
+        cache_key = self.get_count_cache_key()
+        cached = self.counts.get(cache_key)
+        if cached is None:
+            cached = cache.get(cache_key)
+        if cached is not None:
+            count, self.count_is_estimate = self.counts[cache_key] = cached
+            return count
+
+        count = self.estimate_count()
+        self.count_is_estimate = count >= settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        if not self.count_is_estimate:
+            count = self.object_list.count()
+
+        self.counts[cache_key] = (count, self.count_is_estimate)
+        if settings.PAGINATION_COUNT_CACHE_TTL > 0:
+            cache.set(cache_key, (count, self.count_is_estimate), settings.PAGINATION_COUNT_CACHE_TTL)
+        return count
+
+    def get_count_queryset(self):
+        return self.object_list.order_by().values("pk")
+
+    def get_count_cache_key(self):
+        queryset = self.get_count_queryset()
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.sha256(f"{queryset.db}|{sql}|{params!r}".encode("utf-8")).hexdigest()
+        return f"pagination:count:{digest}"
+
+    def estimate_count(self):
+        queryset = self.get_count_queryset()
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def validate_number(self, number):
+        if not (self.count and self.count_is_estimate):
+            return super().validate_number(number)
+
+        # The estimate can be low, so accept any positive page and let it come back empty.
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+
+        # Never clip the last slice to an estimated count, and tell whether there is a next
+        # page from one row past this one rather than from the estimate.
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+        return EstimatedPage(rows[: self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class EstimatedPage(Page):
+    """A page of an estimated count, which knows whether another page follows it."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPagination(StandardResultsSetPagination):
+    """
+    Page-number pagination over `EstimatedCountPaginator`.
+
+    Pages of the same filtered query share one count per pagination instance, so a
+    conditional-GET validator and the action it guards count once between them.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    @property
+    def django_paginator_class(self):
+        return partial(EstimatedCountPaginator, counts=self.counts)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.page.paginator.count,
+                "count_is_estimate": self.page.paginator.count_is_estimate,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_is_estimate"] = {"type": "boolean"}
+        response_schema["required"].append("count_is_estimate")
+        return response_schema
+
+
+class RowComparison(Expression):
+    """
+    `(a, b, ...) <operator> (x, y, ...)`, compared left to right like a composite sort key.
+
+    Postgres turns a row comparison over leading index columns into a single btree range,
+    where the equivalent `a > x OR (a = x AND b > y)` only filters an unbounded scan.
+    """
+
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__()
+        self.lhs = list(lhs)
+        self.operator = operator
+        self.rhs = list(rhs)
+
+    def get_source_expressions(self):
+        return [*self.lhs, *self.rhs]
+
+    def set_source_expressions(self, exprs):
+        self.lhs, self.rhs = exprs[: len(self.lhs)], exprs[len(self.lhs) :]
+
+    def as_sql(self, compiler, connection):
+        sides = []
+        params = []
+        for expressions in (self.lhs, self.rhs):
+            parts = []
+            for expression in expressions:
+                sql, expression_params = compiler.compile(expression)
+                parts.append(sql)
+                params.extend(expression_params)
+            sides.append(f"({', '.join(parts)})")
+        return f"{sides[0]} {self.operator} {sides[1]}", params
+
+
+def encode_position(ordering, value, last_id):
+    """The opaque cursor for the row after `(value, last_id)` in `ordering`."""
+    payload = {"o": ordering, "v": value, "id": last_id}
+    if isinstance(value, datetime):
+        payload["v"] = value.isoformat()
+        payload["t"] = "dt"
+    return urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+class RideKeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination that follows whatever ordering the queryset already has.
+
+    The opaque cursor stores the last row's `(ordering value, id_ride)` pair, so each
+    page becomes `WHERE (key, id_ride) > (...) LIMIT n` instead of `OFFSET` + `COUNT(*)`
+    (descending keys: `key <= ... AND (key < ... OR ...)`), an index range starting at the
+    cursor however deep it is. Distance keys are the exception: the KNN scan behind
+    `pickup_knn_distance` always starts at the center (and `-distance` sorts), so there the
+    condition only filters out earlier rows and deeper pages cost more.
+    The queryset must be ordered by `<field>` (optionally descending) followed by the
+    ascending `id_ride` tiebreaker, which is how `RideViewSet.get_queryset` orders it.
+    Rows may be model instances or `.values()` dicts that include both keys.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    tiebreak_field = "id_ride"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        The unevaluated page query; hand its rows to `set_page()`.
+
+        Split out so callers that run the SQL themselves (the async views) share the cursor logic.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Fetch one extra row to learn whether a next page exists without counting.
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        order_by = queryset.query.order_by
+        if not order_by or not isinstance(order_by[0], str):
+            raise ValueError("Keyset pagination requires a queryset ordered by a field name.")
+        return order_by[0]
+
+    def get_position_filter(self, position):
+        value, last_id = position
+        field = self.ordering.lstrip("-")
+        operator = "lt" if self.ordering.startswith("-") else "gt"
+
+        if field == self.tiebreak_field:
+            return Q(**{f"{field}__{operator}": last_id})
+
+        if operator == "gt":
+            # Same direction as the ascending tiebreaker: one range over `(field, id_ride)`.
+            return RowComparison([F(field), F(self.tiebreak_field)], ">", [Value(value), Value(last_id)])
+
+        # Descending with an ascending tiebreaker has no row-comparison form. The leading
+        # `<=` bound still starts the index scan at the cursor; only ties are filtered.
+        return Q(**{f"{field}__lte": value}) & (
+            Q(**{f"{field}__lt": value}) | Q(**{field: value, f"{self.tiebreak_field}__gt": last_id})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            if payload["o"] != self.ordering:
+                raise ValueError("Cursor was issued for a different ordering")
+            value = payload["v"]
+            if payload.get("t") == "dt":
+                value = datetime.fromisoformat(value)
+            return value, int(payload["id"])
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        field = self.ordering.lstrip("-")
+        if isinstance(instance, dict):
+            value, last_id = instance[field], instance[self.tiebreak_field]
+        else:
+            value, last_id = getattr(instance, field), getattr(instance, self.tiebreak_field)
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encode_position(self.ordering, value, last_id)
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        return None
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,79 @@
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from api.serializers import UserSerializer
+from rides.fields import JSONTextField
+from rides.jsonfuncs import ISOTimestamp, JSONAgg, JSONBuildObject, JSONFloat
+from rides.models import RideEvent, User
+
+
+def user_object(foreign_key):
+    """
+    The user a ride's `foreign_key` points at, as a `UserSerializer`-shaped JSON object.
+
+    A primary-key subquery rather than a join, so the page query's `COUNT` (and its cache
+    entry) stays the same as the default engine's.
+    """
+    user = User.objects.filter(pk=OuterRef(foreign_key)).values(
+        payload=JSONBuildObject(**{name: F(name) for name in UserSerializer.Meta.fields})
+    )
+    return Subquery(user, output_field=JSONTextField())
+
+
+def ride_event_object():
+    """A `RideEvent` row as a `RideEventSerializer`-shaped JSON object."""
+    return JSONBuildObject(
+        id_ride_event=F("id_ride_event"),
+        id_ride=F("id_ride_id"),
+        description=F("description"),
+        kind=F("kind"),
+        created_at=ISOTimestamp("created_at"),
+    )
+
+
+def todays_ride_events_array(since):
+    """
+    The ride's events since `since`, newest first, as one JSON array per ride.
+
+    A correlated subquery: Postgres runs it once per returned ride (the same plan a
+    `LEFT JOIN LATERAL` would get), using the `(id_ride, created_at)` index on each partition.
+    """
+    events = (
+        RideEvent.objects.filter(id_ride=OuterRef("pk"), created_at__gte=since)
+        .order_by()
+        .values("id_ride")
+        .annotate(
+            events=JSONAgg(ride_event_object(), ordering=("-created_at", "-id_ride_event"))
+        )
+        .values("events")
+    )
+    return Coalesce(Subquery(events, output_field=JSONTextField()), Cast(Value("[]"), JSONTextField()))
+
+
+def ride_list_payload(since, fieldset=None):
+    """
+    One `RideListSerializer` item built by Postgres, as JSON text, with only the keys in
+    `fieldset` when given (leaving out a relation also leaves out its subquery).
+
+    Keys, nesting and number spellings match the serializer; only the whitespace differs.
+    """
+    expressions = {
+        "id_ride": F("id_ride"),
+        "status": F("status"),
+        "id_rider": F("id_rider_id"),
+        "id_driver": F("id_driver_id"),
+        "rider": user_object("id_rider"),
+        "driver": user_object("id_driver"),
+        "pickup_latitude": JSONFloat("pickup_latitude"),
+        "pickup_longitude": JSONFloat("pickup_longitude"),
+        "dropoff_latitude": JSONFloat("dropoff_latitude"),
+        "dropoff_longitude": JSONFloat("dropoff_longitude"),
+        "pickup_time": ISOTimestamp("pickup_time"),
+        "picked_up_at": ISOTimestamp("picked_up_at"),
+        "dropped_off_at": ISOTimestamp("dropped_off_at"),
+        "last_event_at": ISOTimestamp("last_event_at"),
+        "todays_ride_events": todays_ride_events_array(since),
+        "distance_to_pickup_meters": JSONFloat("distance_to_pickup_meters"),
+    }
+    names = expressions if fieldset is None else fieldset.names
+    return Cast(JSONBuildObject(**{name: expressions[name] for name in names}), TextField())
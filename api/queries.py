@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db.models import F, FloatField, Prefetch, Value
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import ValidationError
+
+from api.fieldsets import USER_RELATIONS
+from api.filters import RideFilter
+from api.payloads import ride_list_payload
+from rides.geo import CubeDistance, EarthDistance, LLToEarth
+from rides.models import Ride, RideEvent
+
+
+def ride_list_queryset(query_params, *, since, fieldset=None):
+    """
+    Rides with rider/driver (unless `RIDE_USER_PAYLOAD_CACHE` supplies them), events since
+    `since`, distance annotations and the requested ordering, as read by every ride
+    list/detail path (sync and async).
+
+    With a `RideFieldset`, relations and annotations it leaves out are not queried and
+    `.only()` loads just the columns it shows. Orderings always end with the `id_ride`
+    tiebreaker keyset pagination relies on.
+    """
+    join_users = not settings.RIDE_USER_PAYLOAD_CACHE
+    qs = Ride.objects.all()
+    if join_users:
+        # Otherwise riders and drivers come from `api.usercache`, by the FK ids on the ride row.
+        related = [fk for name, fk in USER_RELATIONS.items() if fieldset is None or name in fieldset]
+        if related:
+            qs = qs.select_related(*related)
+    if fieldset is not None:
+        qs = qs.only(*fieldset.only_fields(join_users=join_users))
+
+    if fieldset is None or "todays_ride_events" in fieldset:
+        todays_events_qs = (
+            RideEvent.objects.filter(created_at__gte=since)
+            .only("id_ride_event", "id_ride", "description", "kind", "created_at")
+            .order_by("-created_at", "-id_ride_event")
+        )
+        qs = qs.prefetch_related(
+            Prefetch("ride_events", queryset=todays_events_qs, to_attr="todays_ride_events")
+        )
+    with_distance = fieldset is None or "distance_to_pickup_meters" in fieldset
+
+    ordering = query_params.get("ordering")
+    lat = query_params.get("lat")
+    lon = query_params.get("lon")
+
+    if lat is not None and lon is not None:
+        try:
+            lat_f = float(lat)
+            lon_f = float(lon)
+        except ValueError as exc:
+            raise ValidationError({"lat": "Must be a number", "lon": "Must be a number"}) from exc
+
+        pickup_earth = F("pickup_earth")
+        input_earth = LLToEarth(Value(lat_f), Value(lon_f))
+        # Ordering key: same order as the distance, but served by the GiST index.
+        qs = qs.annotate(pickup_knn_distance=CubeDistance(pickup_earth, input_earth))
+        if with_distance:
+            qs = qs.annotate(distance_to_pickup_meters=EarthDistance(pickup_earth, input_earth))
+    elif with_distance:
+        qs = qs.annotate(distance_to_pickup_meters=Value(None, output_field=FloatField()))
+
+    if ordering in {"pickup_time", "-pickup_time"}:
+        qs = qs.order_by(ordering, "id_ride")
+    elif ordering in {"distance", "-distance"}:
+        if lat is None or lon is None:
+            raise ValidationError({"ordering": "Distance ordering requires lat and lon query params"})
+        direction = "-" if ordering.startswith("-") else ""
+        qs = qs.order_by(f"{direction}pickup_knn_distance", "id_ride")
+    else:
+        qs = qs.order_by("id_ride")
+
+    return qs
+
+
+def filter_rides(queryset, request):
+    """Apply `RideFilter` the way `DjangoFilterBackend` does, for callers outside a viewset."""
+    filterset = RideFilter(data=request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+def keyset_fields(queryset):
+    """Columns keyset pagination needs next to `.values()` rows to build its cursor."""
+    fields = ["id_ride", "pickup_time"]
+    if "pickup_knn_distance" in queryset.query.annotations:
+        fields.append("pickup_knn_distance")
+    return fields
+
+
+def ride_payload_rows(queryset, since, fieldset=None):
+    """
+    `queryset` as `{"payload": <ride JSON text>, <keyset fields>}` rows built by Postgres.
+
+    Joins and prefetches are dropped: the payload carries the nested users and events itself,
+    limited to `fieldset` when given.
+    """
+    return (
+        queryset.select_related(None)
+        .prefetch_related(None)
+        .annotate(payload=ride_list_payload(since, fieldset))
+        .values("payload", *keyset_fields(queryset))
+    )
@@ -0,0 +1,101 @@
+import math
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+# orjson and `json.dumps` disagree only on how floats below 1e-4 or from 1e16 up are spelled
+# ("0.00001" vs "1e-05", "1e16" vs "1e+16", "1.5e-7" vs "1.5e-07"). Output with such a number
+# is re-rendered with the stock encoder. Digits are folded to "0" first so a single substring
+# scan finds every "e<digit>"; a regex over the body costs more than orjson saves.
+FOLD_DIGITS = bytes.maketrans(b"123456789", b"000000000")
+
+
+def may_have_scientific_float(text):
+    return b"0.0000" in text or b"e-" in text or b"e0" in text.translate(FOLD_DIGITS)
+
+
+def outside_strings(text):
+    """
+    The parts of compact JSON `text` outside its strings (keys and values): numbers,
+    `true`/`false`/`null` and punctuation.
+
+    Escaped backslashes and quotes are dropped first, so every remaining quote opens or
+    closes a string.
+    """
+    return b"".join(text.replace(b"\\\\", b"").replace(b'\\"', b"").split(b'"')[::2])
+
+
+def has_scientific_float(text):
+    """
+    Whether compact JSON `text` has a number orjson may spell differently from `json.dumps`.
+
+    Strings that merely contain "e-" or "0.0000" (emails, descriptions) do not count; the
+    strings are only cut out once the quick scan finds a candidate anywhere in the body.
+    """
+    return may_have_scientific_float(text) and may_have_scientific_float(outside_strings(text))
+
+
+def finite_float(value):
+    """
+    `float(value)`, refusing NaN and infinities as DRF's strict JSON rendering does.
+
+    orjson silently writes them as `null`, so float fields convert through this instead of
+    leaving the check to the renderer (see `FastJSONRenderer`).
+    """
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return value
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` backed by orjson for the default compact, unicode output.
+
+    Falls back to the stock renderer for indented/ASCII output, for values orjson cannot
+    encode, and for the float spellings above, so responses are byte-for-byte the same.
+    The one exception is non-finite floats: the stock renderer (`STRICT_JSON`) raises
+    `ValueError`, orjson writes `null`. Finding them here would mean walking every response,
+    which costs as much as orjson saves, so the float fields that can hold them convert
+    through `finite_float` and raise before rendering.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if has_scientific_float(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict-javascript-subset escaping as JSONRenderer.
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+def render_with_results(data, results):
+    """
+    Render a paginated envelope whose `results` items are already JSON texts.
+
+    `results` must be the envelope's last key, as it is for every paginator in `api.pagination`.
+    """
+    if list(data)[-1] != "results":
+        raise ValueError("`results` must be the last key of the envelope.")
+
+    head = FastJSONRenderer().render({**data, "results": []})
+    return b"".join((head[:-2], ",".join(results).encode("utf-8"), b"]}"))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from ride_info.routers import choose_replica, current_read_alias
+from rides.cache import is_pinned_to_primary, pin_to_primary
+
+
+class ReplicaReadsMixin:
+    """
+    Serve the viewset's `replica_actions` from a read replica (`ride_info.routers`).
+
+    The replica is chosen after authentication, which stays on the primary so revocations
+    apply at once. A user's reads stay on the primary for `REPLICA_STICKY_SECONDS` after each
+    successful write they make, so they see their own changes. Responses to routable requests
+    carry the alias that served them in `X-Read-Database`.
+    """
+
+    replica_actions = frozenset({"list", "retrieve"})
+    read_alias_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or self.action not in self.replica_actions
+        ):
+            return
+        alias = None if is_pinned_to_primary(request.user.pk) else choose_replica()
+        self.read_alias_token = current_read_alias.set(alias)
+        self.headers["X-Read-Database"] = alias or "default"
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.read_alias_token is not None:
+            current_read_alias.reset(self.read_alias_token)
+            self.read_alias_token = None
+        elif (
+            settings.DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,7 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class AdminJWTScheme(SimpleJWTScheme):
+    """Document `AdminJWTAuthentication` as the bearer JWT scheme it extends."""
+
+    target_class = "api.authentication.AdminJWTAuthentication"
@@ -1,6 +1,12 @@
+from django.conf import settings
+from django.db import models
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
-from rides.models import Ride, RideEvent, User
+from api.fastpath import FastRepresentationMixin
+from api.renderers import finite_float
+from api.usercache import user_payloads
+from rides.models import DriverMonthlyTripSummary, Ride, RideEvent, User
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,6 +23,42 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ("id_user",)
 
 
+def load_user_payloads(user_ids):
+    serializer = UserSerializer()
+    users = User.objects.filter(pk__in=user_ids).only(*UserSerializer.Meta.fields)
+    return {user.pk: serializer.to_representation(user) for user in users}
+
+
+def rides_user_payloads(rides, foreign_keys):
+    """`UserSerializer` output for the users `rides` point at through `foreign_keys`, from `api.usercache`."""
+    user_ids = {getattr(ride, foreign_key) for ride in rides for foreign_key in foreign_keys}
+    user_ids.discard(None)
+    if not user_ids:
+        return {}
+    return user_payloads.get_many(user_ids, load_user_payloads)
+
+
+@extend_schema_field(UserSerializer)
+class CachedUserField(serializers.Field):
+    """A rider or driver, by the FK id the ride row carries, from the parent's `user_payloads`."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user_id):
+        return self.parent.user_payloads.get(user_id)
+
+
+class RideListListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if settings.RIDE_USER_PAYLOAD_CACHE:
+            data = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+            # One lookup (and at most one query) for the whole page.
+            self.child.user_payloads = rides_user_payloads(data, self.child.cached_user_sources())
+        return super().to_representation(data)
+
+
 class RideEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = RideEvent
@@ -24,12 +66,41 @@ class RideEventSerializer(serializers.ModelSerializer):
             "id_ride_event",
             "id_ride",
             "description",
+            "kind",
             "created_at",
         )
-        read_only_fields = ("id_ride_event",)
+        read_only_fields = ("id_ride_event", "kind")
+
+
+class RideEventBulkItemSerializer(serializers.Serializer):
+    """One item of a bulk ingestion batch; `id_ride` existence is checked for the whole batch at once."""
+
+    id_ride = serializers.IntegerField(min_value=1)
+    description = serializers.CharField(max_length=255)
+    created_at = serializers.DateTimeField()
+
+
+class FiniteFloatField(serializers.FloatField):
+    """A `FloatField` that refuses NaN and infinities, which JSON cannot carry, both ways."""
+
+    default_error_messages = {"not_finite": "A finite number is required."}
+
+    def to_internal_value(self, data):
+        try:
+            return finite_float(super().to_internal_value(data))
+        except ValueError:
+            self.fail("not_finite")
+
+    def to_representation(self, value):
+        return finite_float(value)
 
 
 class RideSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FloatField: FiniteFloatField,
+    }
+
     class Meta:
         model = Ride
         fields = (
@@ -42,11 +113,14 @@ class RideSerializer(serializers.ModelSerializer):
             "dropoff_latitude",
             "dropoff_longitude",
             "pickup_time",
+            "picked_up_at",
+            "dropped_off_at",
+            "last_event_at",
         )
-        read_only_fields = ("id_ride",)
+        read_only_fields = ("id_ride", "picked_up_at", "dropped_off_at", "last_event_at")
 
 
-class RideListSerializer(serializers.ModelSerializer):
+class RideListSerializer(FastRepresentationMixin, serializers.ModelSerializer):
     id_rider = serializers.IntegerField(source="id_rider_id", read_only=True)
     id_driver = serializers.IntegerField(source="id_driver_id", read_only=True)
     rider = UserSerializer(source="id_rider", read_only=True)
@@ -54,8 +128,11 @@ class RideListSerializer(serializers.ModelSerializer):
     todays_ride_events = RideEventSerializer(many=True, read_only=True)
     distance_to_pickup_meters = serializers.FloatField(read_only=True, allow_null=True)
 
+    user_payloads = None
+
     class Meta:
         model = Ride
+        list_serializer_class = RideListListSerializer
         fields = (
             "id_ride",
             "status",
@@ -68,7 +145,49 @@ class RideListSerializer(serializers.ModelSerializer):
             "dropoff_latitude",
             "dropoff_longitude",
             "pickup_time",
+            "picked_up_at",
+            "dropped_off_at",
+            "last_event_at",
             "todays_ride_events",
             "distance_to_pickup_meters",
         )
         read_only_fields = fields
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get("ride_fieldset")
+        if fieldset is not None:
+            # `api.fieldsets`; the queryset was limited to the same fields.
+            fields = {name: field for name, field in fields.items() if name in fieldset}
+        if settings.RIDE_USER_PAYLOAD_CACHE:
+            # The ride rows carry only the FK ids (see `ride_list_queryset`).
+            for name, source in (("rider", "id_rider_id"), ("driver", "id_driver_id")):
+                if name in fields:
+                    fields[name] = CachedUserField(source=source)
+        return fields
+
+    def cached_user_sources(self):
+        """The FK id attributes of the `CachedUserField`s this response includes."""
+        return [field.source for field in self.fields.values() if isinstance(field, CachedUserField)]
+
+    def to_representation(self, instance):
+        if settings.RIDE_USER_PAYLOAD_CACHE and not isinstance(self.parent, RideListListSerializer):
+            self.user_payloads = rides_user_payloads([instance], self.cached_user_sources())
+        return super().to_representation(instance)
+
+
+class TripReportSerializer(serializers.ModelSerializer):
+    month = serializers.DateField(format="%Y-%m", read_only=True)
+    id_driver = serializers.IntegerField(source="id_driver_id", read_only=True)
+    driver = serializers.CharField(source="driver_name", read_only=True)
+
+    class Meta:
+        model = DriverMonthlyTripSummary
+        fields = (
+            "month",
+            "id_driver",
+            "driver",
+            "trips_over_1h",
+            "refreshed_at",
+        )
+        read_only_fields = fields
@@ -0,0 +1,60 @@
+import threading
+
+import psycopg
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from rides.models import Ride, RideEvent, User
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=0)
+class RideEventBulkRaceTests(TransactionTestCase):
+    """A ride deleted while a batch is in flight is reported per item, not as a 500."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        rider = User.objects.create_user(email="rider@example.com")
+        self.kept, self.doomed = [
+            Ride.objects.create(
+                status="en-route",
+                id_rider=rider,
+                id_driver=rider,
+                pickup_latitude=40.7,
+                pickup_longitude=-74.0,
+                dropoff_latitude=40.75,
+                dropoff_longitude=-73.98,
+                pickup_time=timezone.now(),
+            )
+            for _ in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_ride_deleted_before_the_insert(self):
+        # The DELETE is not committed yet when the batch looks its rides up; it commits
+        # while the batch is in flight.
+        deleter = psycopg.connect(**connection.get_connection_params())
+        deleter.execute("DELETE FROM rides_ride WHERE id_ride = %s", [self.doomed.pk])
+        timer = threading.Timer(0.5, deleter.commit)
+        timer.start()
+        try:
+            response = self.client.post(
+                "/api/ride-events/bulk/",
+                [
+                    {"id_ride": self.kept.pk, "description": "Status changed to pickup", "created_at": timezone.now()},
+                    {"id_ride": self.doomed.pk, "description": "Status changed to pickup", "created_at": timezone.now()},
+                ],
+                format="json",
+            )
+        finally:
+            timer.join()
+            deleter.close()
+
+        self.assertEqual(response.status_code, 207, response.data)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1])
+        self.assertEqual(list(RideEvent.objects.values_list("id_ride", flat=True)), [self.kept.pk])
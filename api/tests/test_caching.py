@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.auth import AdminTokenObtainPairSerializer
+from rides.models import Ride, RideEvent, User
+
+# The ride columns event triggers write and the embedded users left out, so only ride writes
+# retire this response.
+LEAN_FIELDSET = "exclude=todays_ride_events,picked_up_at,dropped_off_at,last_event_at,rider,driver"
+
+
+def ride_payload(rider, **fields):
+    return {
+        "status": "en-route",
+        "id_rider": rider.pk,
+        "id_driver": rider.pk,
+        "pickup_latitude": 40.7,
+        "pickup_longitude": -74.0,
+        "dropoff_latitude": 40.75,
+        "dropoff_longitude": -73.98,
+        "pickup_time": timezone.now() - timedelta(hours=1),
+        **fields,
+    }
+
+
+class RideResponseCacheTestBase:
+    def create_ride(self):
+        self.admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        self.rider = User.objects.create_user(email="rider@example.com", first_name="Ada")
+        self.ride = Ride.objects.create(**{**ride_payload(self.rider), "id_rider": self.rider, "id_driver": self.rider})
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def assertCached(self, *urls):
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.assertEqual(self.get(url)["X-Cache"], "HIT")
+
+    def assertRetired(self, *urls):
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)["X-Cache"], "MISS")
+
+    def warm(self, *urls):
+        for url in urls:
+            self.get(url)
+        self.assertCached(*urls)
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=60, PAGINATION_COUNT_CACHE_TTL=0)
+class RideResponseCacheTests(RideResponseCacheTestBase, TestCase):
+    """Every write path retires the cached ride responses built from the data it changed."""
+
+    def setUp(self):
+        cache.clear()
+        self.create_ride()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.list_url = "/api/rides/"
+        self.detail_url = f"/api/rides/{self.ride.pk}/"
+        self.lean_url = f"/api/rides/?{LEAN_FIELDSET}"
+
+    def write(self, method, url, data=None, status=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def test_ride_writes(self):
+        self.warm(self.list_url, self.detail_url, self.lean_url)
+        self.write("patch", self.detail_url, {"status": "dropoff"}, status=200)
+        self.assertRetired(self.list_url, self.detail_url, self.lean_url)
+
+        self.warm(self.list_url, self.lean_url)
+        created = self.write("post", self.list_url, ride_payload(self.rider), status=201)
+        self.assertRetired(self.list_url, self.lean_url)
+        self.assertEqual(self.get(self.list_url).json()["count"], 2)
+
+        self.warm(self.list_url, self.lean_url)
+        self.write("delete", f"/api/rides/{created.json()['id_ride']}/", status=204)
+        self.assertRetired(self.list_url, self.lean_url)
+        self.assertEqual(self.get(self.list_url).json()["count"], 1)
+
+    def test_event_writes(self):
+        event = {"id_ride": self.ride.pk, "description": "Status changed to pickup", "created_at": timezone.now()}
+        self.warm(self.list_url, self.detail_url, self.lean_url)
+        created = self.write("post", "/api/ride-events/", event, status=201)
+        self.assertRetired(self.list_url, self.detail_url)
+        self.assertCached(self.lean_url)
+        self.assertEqual(len(self.get(self.detail_url).json()["todays_ride_events"]), 1)
+
+        self.warm(self.list_url, self.detail_url)
+        self.write("delete", f"/api/ride-events/{created.json()['id_ride_event']}/", status=204)
+        self.assertRetired(self.list_url, self.detail_url)
+        self.assertCached(self.lean_url)
+        self.assertEqual(self.get(self.detail_url).json()["todays_ride_events"], [])
+
+    def test_bulk_event_ingestion(self):
+        self.warm(self.list_url, self.detail_url, self.lean_url)
+        self.write(
+            "post",
+            "/api/ride-events/bulk/",
+            [{"id_ride": self.ride.pk, "description": "Status changed to pickup", "created_at": timezone.now()}],
+            status=201,
+        )
+        self.assertRetired(self.list_url, self.detail_url)
+        self.assertCached(self.lean_url)
+        self.assertIsNotNone(self.get(self.detail_url).json()["picked_up_at"])
+
+    def test_user_writes(self):
+        rider_filter_url = f"/api/rides/?{LEAN_FIELDSET}&rider_email=rider@example.com"
+        self.warm(self.list_url, self.detail_url, self.lean_url, rider_filter_url)
+        self.write("patch", f"/api/users/{self.rider.pk}/", {"first_name": "Grace"}, status=200)
+        self.assertRetired(self.list_url, self.detail_url, rider_filter_url)
+        self.assertCached(self.lean_url)
+        self.assertEqual(self.get(self.detail_url).json()["rider"]["first_name"], "Grace")
+
+        # Saves from anywhere else (the admin, the shell) go through the same signal.
+        self.warm(self.list_url, rider_filter_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rider.email = "ada@example.com"
+            self.rider.save()
+        self.assertRetired(self.list_url, rider_filter_url)
+        self.assertEqual(self.get(rider_filter_url).json()["count"], 0)
+        self.assertCached(self.lean_url)
+
+    def test_orm_saves(self):
+        self.warm(self.list_url, self.detail_url, self.lean_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ride.status = "dropoff"
+            self.ride.save()
+        self.assertRetired(self.list_url, self.detail_url, self.lean_url)
+
+        self.warm(self.list_url, self.detail_url, self.lean_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            RideEvent.objects.create(
+                id_ride=self.ride, description="Status changed to dropoff", created_at=timezone.now()
+            )
+        self.assertRetired(self.list_url, self.detail_url)
+        self.assertCached(self.lean_url)
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=60, PAGINATION_COUNT_CACHE_TTL=0)
+class AsyncBulkIngestionCacheTests(RideResponseCacheTestBase, TransactionTestCase):
+    """The async bulk endpoint writes on its own connection and bumps the events version itself."""
+
+    def setUp(self):
+        cache.clear()
+        self.create_ride()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.token = str(AdminTokenObtainPairSerializer.get_token(self.admin).access_token)
+
+    def test_bulk_event_ingestion(self):
+        list_url, lean_url = "/api/rides/", f"/api/rides/?{LEAN_FIELDSET}"
+        self.warm(list_url, lean_url)
+        response = self.client.post(
+            "/api/async/ride-events/bulk/",
+            [{"id_ride": self.ride.pk, "description": "Status changed to pickup", "created_at": timezone.now()}],
+            format="json",
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertRetired(list_url)
+        self.assertCached(lean_url)
+        self.assertEqual(len(self.get(list_url).json()["results"][0]["todays_ride_events"]), 1)
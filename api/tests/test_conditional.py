@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.conditional import TODAYS_EVENTS_WINDOW
+from api.viewsets import RideViewSet
+from rides.models import Ride, RideEvent, User
+
+
+# Cached page counts (`PAGINATION_COUNT_CACHE_TTL`) may lag the rows; the validators may not.
+@override_settings(RIDE_RESPONSE_CACHE_TTL=0, PAGINATION_COUNT_CACHE_TTL=0)
+class ConditionalGetTests(TestCase):
+    """Ride and ride event reads answer `If-None-Match` / `If-Modified-Since` with `304`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        cls.rider = User.objects.create_user(email="rider@example.com", first_name="Ada")
+        now = timezone.now()
+        cls.ride = Ride.objects.create(
+            status="en-route",
+            id_rider=cls.rider,
+            id_driver=cls.rider,
+            pickup_latitude=40.7,
+            pickup_longitude=-74.0,
+            dropoff_latitude=40.75,
+            dropoff_longitude=-73.98,
+            pickup_time=now - timedelta(hours=1),
+        )
+        cls.event = RideEvent.objects.create(
+            id_ride=cls.ride, description="Status changed to pickup", created_at=now - timedelta(minutes=30)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertNotModified(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304, response.content)
+        self.assertEqual(response.content, b"")
+
+    def assertModified(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_validators(self):
+        urls = [
+            "/api/rides/",
+            "/api/rides/?engine=db",
+            "/api/rides/?pagination=cursor",
+            f"/api/rides/{self.ride.pk}/",
+            "/api/ride-events/",
+            f"/api/ride-events/{self.event.pk}/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assertModified(url)
+                self.assertNotModified(url, if_none_match=response["ETag"])
+                self.assertModified(url, if_none_match='W/"something-else"')
+
+    def test_last_modified(self):
+        for url in [f"/api/rides/{self.ride.pk}/", f"/api/ride-events/{self.event.pk}/"]:
+            with self.subTest(url=url):
+                response = self.assertModified(url)
+                self.assertNotModified(url, if_modified_since=response["Last-Modified"])
+        self.assertFalse(self.assertModified("/api/rides/").has_header("Last-Modified"))
+
+    def test_writes_change_the_etag(self):
+        ride_urls = ["/api/rides/", "/api/rides/?engine=db", f"/api/rides/{self.ride.pk}/"]
+        writes = {
+            "ride": (lambda: Ride.objects.filter(pk=self.ride.pk).update(status="pickup"), ride_urls),
+            "event": (
+                lambda: RideEvent.objects.create(
+                    id_ride=self.ride, description="Running late", created_at=timezone.now()
+                ),
+                [*ride_urls, "/api/ride-events/"],
+            ),
+            "rider profile": (lambda: User.objects.filter(pk=self.rider.pk).update(first_name="Grace"), ride_urls),
+        }
+        for name, (write, urls) in writes.items():
+            etags = {url: self.assertModified(url)["ETag"] for url in urls}
+            write()
+            for url in urls:
+                with self.subTest(write=name, url=url):
+                    response = self.assertModified(url, if_none_match=etags[url])
+                    self.assertNotEqual(response["ETag"], etags[url])
+
+    def test_event_ageing_out_changes_the_ride(self):
+        # No write: a day later the event has only left the `todays_ride_events` window.
+        since = timezone.now() + timedelta(days=1) - TODAYS_EVENTS_WINDOW
+        for url in ["/api/rides/", f"/api/rides/{self.ride.pk}/"]:
+            with self.subTest(url=url):
+                etag = self.assertModified(url)["ETag"]
+                with mock.patch.object(RideViewSet, "get_todays_events_since", return_value=since):
+                    data = self.assertModified(url, if_none_match=etag).data
+                ride = data["results"][0] if "results" in data else data
+                self.assertEqual(ride["todays_ride_events"], [])
+
+    @override_settings(RIDE_RESPONSE_CACHE_TTL=60)
+    def test_cached_responses_answer_too(self):
+        url = "/api/rides/"
+        etag = self.assertModified(url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, if_none_match=etag)
@@ -0,0 +1,77 @@
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from rides.models import Ride, RideEvent, User
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=0)
+class RideListEngineTests(TestCase):
+    """`engine=db` pages carry the same items, spelled the same way, as `engine=orm` pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        rider = User.objects.create_user(email="rider@example.com", first_name="Ada", last_name="Rider")
+        driver = User.objects.create_user(email="driver@example.com", phone_number="+1 555 0100")
+        now = timezone.now()
+        coordinates = [
+            # Whole numbers, which Postgres prints without the `.0` Python writes.
+            (14.0, -74.0, 15.0, 0.0),
+            (40.712776, -74.005974, 40.758896, -73.98513),
+            # A value `json.dumps` writes in exponent form.
+            (0.00001, -0.000015, -33.8688, 151.2093),
+        ]
+        for i, (pickup_lat, pickup_lon, dropoff_lat, dropoff_lon) in enumerate(coordinates):
+            ride = Ride.objects.create(
+                status="en-route",
+                id_rider=rider,
+                id_driver=driver,
+                pickup_latitude=pickup_lat,
+                pickup_longitude=pickup_lon,
+                dropoff_latitude=dropoff_lat,
+                dropoff_longitude=dropoff_lon,
+                pickup_time=now - timedelta(minutes=i),
+            )
+            RideEvent.objects.bulk_create(
+                [
+                    RideEvent(id_ride=ride, description="Status changed to pickup", created_at=now - timedelta(hours=1)),
+                    RideEvent(id_ride=ride, description="Running late", created_at=now - timedelta(seconds=i)),
+                    RideEvent(id_ride=ride, description="Status changed to dropoff", created_at=now - timedelta(days=2)),
+                ]
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def results(self, query):
+        response = self.client.get(f"/api/rides/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        # Re-encoding keeps number spellings apart: `14` parses to an int, `14.0` to a float.
+        return json.dumps(json.loads(response.content)["results"])
+
+    def test_same_results(self):
+        queries = [
+            "",
+            "ordering=-pickup_time",
+            "ordering=distance&lat=14&lon=-74",
+            "ordering=-distance&lat=0&lon=0",
+            "pagination=cursor&page_size=2",
+            "fields=id_ride,pickup_latitude,rider",
+            "exclude=todays_ride_events",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                orm = self.results(query)
+                self.assertEqual(self.results(f"{query}&engine=db"), orm)
+
+    def test_number_spellings(self):
+        content = self.client.get("/api/rides/?engine=db").content
+        self.assertIn(b'"pickup_latitude" : 14.0, "pickup_longitude" : -74.0', content)
+        self.assertIn(b'"pickup_latitude" : 1e-05, "pickup_longitude" : -1.5e-05', content)
@@ -0,0 +1,53 @@
+import math
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from rides.models import Ride, User
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=0)
+class NonFiniteFloatTests(TestCase):
+    """NaN and infinities are not JSON: they fail the response instead of turning into `null`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        cls.rider = User.objects.create_user(email="rider@example.com")
+        cls.ride = Ride.objects.create(
+            status="en-route",
+            id_rider=cls.rider,
+            id_driver=cls.rider,
+            pickup_latitude=math.nan,
+            pickup_longitude=-74.0,
+            dropoff_latitude=40.75,
+            dropoff_longitude=-73.98,
+            pickup_time=timezone.now(),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(self.admin)
+
+    def test_reads_fail(self):
+        for url in ["/api/rides/", f"/api/rides/{self.ride.pk}/", "/api/rides/?engine=db"]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 500)
+
+    def test_writes_reject_them(self):
+        payload = {
+            "status": "en-route",
+            "id_rider": self.rider.pk,
+            "id_driver": self.rider.pk,
+            "pickup_latitude": "NaN",
+            "pickup_longitude": "Infinity",
+            "dropoff_latitude": 40.75,
+            "dropoff_longitude": -73.98,
+            "pickup_time": "2026-01-01T00:00:00Z",
+        }
+        response = self.client.post("/api/rides/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"pickup_latitude", "pickup_longitude"})
@@ -0,0 +1,151 @@
+import json
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from rides.models import Ride, User
+
+
+def query_param(url, name):
+    return parse_qs(urlparse(url).query)[name][0]
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=0, PAGINATION_COUNT_CACHE_TTL=0)
+class RidePaginationTestBase(TestCase):
+    ride_count = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        rider = User.objects.create_user(email="rider@example.com")
+        now = timezone.now()
+        cls.rides = [
+            Ride.objects.create(
+                status="en-route",
+                id_rider=rider,
+                id_driver=rider,
+                pickup_latitude=40.7 + i / 100,
+                pickup_longitude=-74.0,
+                dropoff_latitude=40.75,
+                dropoff_longitude=-73.98,
+                pickup_time=now - timedelta(minutes=i),
+            )
+            for i in range(cls.ride_count)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)
+
+
+@override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1)
+class EstimatedCountPaginationTests(RidePaginationTestBase):
+    """With an estimated count, `next` comes from the rows that exist, not from the estimate."""
+
+    def test_next_links_follow_the_rows(self):
+        data = self.get("/api/rides/?page_size=2")
+        self.assertTrue(data["count_is_estimate"])
+        self.assertEqual(query_param(data["next"], "page"), "2")
+        self.assertEqual(query_param(self.get("/api/rides/?page_size=2&page=2")["next"], "page"), "3")
+
+        last = self.get("/api/rides/?page_size=2&page=3")
+        self.assertEqual(len(last["results"]), 1)
+        self.assertIsNone(last["next"])
+
+    def test_full_last_page_has_no_next(self):
+        last = self.get("/api/rides/?page_size=5")
+        self.assertEqual(len(last["results"]), 5)
+        self.assertIsNone(last["next"])
+
+    def test_page_past_the_end(self):
+        data = self.get("/api/rides/?page_size=2&page=9")
+        self.assertEqual(data["results"], [])
+        self.assertIsNone(data["next"])
+        self.assertEqual(query_param(data["previous"], "page"), "8")
+
+    def test_engine_db(self):
+        self.assertIsNone(self.get("/api/rides/?page_size=5&engine=db")["next"])
+        self.assertEqual(query_param(self.get("/api/rides/?page_size=4&engine=db")["next"], "page"), "2")
+
+
+@override_settings(RIDE_RESPONSE_CACHE_TTL=0)
+class RideKeysetPaginationTests(TestCase):
+    """Following `next` cursors visits every ride once, in order, ties included."""
+
+    center = "lat=40.7&lon=-74.0"
+    # Pickup spots at increasing distance from `center`; rides sharing one tie on distance.
+    spots = [(40.7, -74.0), (40.71, -74.0), (40.8, -74.0)]
+    # (minutes after the first pickup, spot): several rides share a pickup time or a spot.
+    rides = [(0, 0), (0, 1), (0, 2), (5, 0), (5, 0), (5, 2), (10, 1), (10, 1), (15, 2)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", password="x", role=User.ROLE_ADMIN)
+        rider = User.objects.create_user(email="rider@example.com")
+        start = timezone.now().replace(microsecond=123456) - timedelta(hours=1)
+        cls.keys = {}
+        for minutes, spot in cls.rides:
+            lat, lon = cls.spots[spot]
+            ride = Ride.objects.create(
+                status="en-route",
+                id_rider=rider,
+                id_driver=rider,
+                pickup_latitude=lat,
+                pickup_longitude=lon,
+                dropoff_latitude=40.75,
+                dropoff_longitude=-73.98,
+                pickup_time=start + timedelta(minutes=minutes),
+            )
+            cls.keys[ride.pk] = (minutes, spot)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def expected(self, ordering):
+        sort_keys = {
+            "": lambda pk: pk,
+            "pickup_time": lambda pk: (self.keys[pk][0], pk),
+            "-pickup_time": lambda pk: (-self.keys[pk][0], pk),
+            "distance": lambda pk: (self.keys[pk][1], pk),
+            "-distance": lambda pk: (-self.keys[pk][1], pk),
+        }
+        return sorted(self.keys, key=sort_keys[ordering])
+
+    def walk(self, query):
+        url = f"/api/rides/?pagination=cursor&page_size=2&{query}"
+        seen = []
+        for _ in range(len(self.rides) + 1):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = json.loads(response.content)
+            self.assertLessEqual(len(data["results"]), 2)
+            seen.extend(ride["id_ride"] for ride in data["results"])
+            url = data["next"]
+            if url is None:
+                return seen
+        self.fail(f"Cursor pages never ended: {seen}")
+
+    def test_round_trips(self):
+        for ordering in ["", "pickup_time", "-pickup_time", "distance", "-distance"]:
+            for engine in ["orm", "db"]:
+                with self.subTest(ordering=ordering, engine=engine):
+                    query = f"ordering={ordering}&{self.center}&engine={engine}"
+                    self.assertEqual(self.walk(query), self.expected(ordering))
+
+    def test_cursor_from_another_ordering(self):
+        data = json.loads(self.client.get("/api/rides/?pagination=cursor&page_size=2&ordering=pickup_time").content)
+        cursor = query_param(data["next"], "cursor")
+        response = self.client.get(f"/api/rides/?pagination=cursor&ordering=-pickup_time&cursor={cursor}")
+        self.assertEqual(response.status_code, 404)
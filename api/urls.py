@@ -1,20 +1,28 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
 
-from api.auth import AdminTokenObtainPairView
-from api.viewsets import RideEventViewSet, RideViewSet, UserViewSet
-from api.views import health
+from api import async_views
+from api.auth import AdminTokenObtainPairView, AdminTokenRefreshView
+from api.viewsets import RideEventViewSet, RideViewSet, TripReportViewSet, UserViewSet
+from api.views import cache_stats, db_stats, health, metrics
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet, basename="user")
 router.register(r"rides", RideViewSet, basename="ride")
 router.register(r"ride-events", RideEventViewSet, basename="ride-event")
+router.register(r"reports/trips-over-1h", TripReportViewSet, basename="trip-report")
 
 urlpatterns = [
     path("health/", health, name="health"),
+    path("cache/stats/", cache_stats, name="cache_stats"),
+    path("db/stats/", db_stats, name="db_stats"),
+    path("metrics/", metrics, name="metrics"),
     path("auth/token/", AdminTokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("auth/token/refresh/", AdminTokenRefreshView.as_view(), name="token_refresh"),
+    path("async/rides/", async_views.ride_list, name="async_ride_list"),
+    path("async/rides/<int:pk>/", async_views.ride_detail, name="async_ride_detail"),
+    path("async/ride-events/bulk/", async_views.ride_event_bulk, name="async_ride_event_bulk"),
+    path("async/ride-events/stream/", async_views.ride_event_stream, name="async_ride_event_stream"),
 ]
 
 urlpatterns += router.urls
@@ -0,0 +1,126 @@
+"""
+Per-process LRU of serialized users, for ride responses under `RIDE_USER_PAYLOAD_CACHE`.
+
+The ride query then reads only `id_rider_id` / `id_driver_id`; the nested `rider` / `driver`
+objects are `UserSerializer` output kept here by user id, at most
+`RIDE_USER_PAYLOAD_CACHE_SIZE` of them. A page looks all its users up at once and loads the
+missing ones with a single query.
+
+Entries are checked against the shared user version (`rides.cache`), which every `User`
+save or delete bumps after it commits. A process that sees a version it did not bump itself
+drops all its entries; the process that made the write only evicts that user.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rides.cache import bump_user_version, get_user_version
+from rides.models import User
+
+
+class UserPayloadCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_many(self, user_ids, load):
+        """
+        `{user_id: payload}` for `user_ids`; `load(missing_ids)` returns the same mapping for
+        the ones not cached. Payloads are shared between responses and must not be mutated.
+        """
+        version = get_user_version()
+        payloads = {}
+        missing = []
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                    self._entries.clear()
+                self._version = version
+            for user_id in user_ids:
+                payload = self._entries.get(user_id)
+                if payload is None:
+                    missing.append(user_id)
+                else:
+                    self._entries.move_to_end(user_id)
+                    payloads[user_id] = payload
+            self.hits += len(payloads)
+            self.misses += len(missing)
+        if not missing:
+            return payloads
+
+        loaded = load(missing)
+        payloads.update(loaded)
+        with self._lock:
+            # Loaded under `version`; a newer one may already describe different rows.
+            if version == self._version:
+                self._entries.update(loaded)
+                overflow = len(self._entries) - settings.RIDE_USER_PAYLOAD_CACHE_SIZE
+                for _ in range(max(overflow, 0)):
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return payloads
+
+    def forget(self, user_id, version):
+        """Drop `user_id` after this process bumped the user version to `version`."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            # Only this process's own bump can be skipped over; any other change drops everything.
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.RIDE_USER_PAYLOAD_CACHE,
+                "size": len(self._entries),
+                "max_size": settings.RIDE_USER_PAYLOAD_CACHE_SIZE,
+                "user_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def render_metrics(self):
+        """The counters in the Prometheus text format, for `/api/metrics/`."""
+        stats = self.stats()
+        lines = [
+            "# HELP ride_info_user_payload_cache_size Users held by this process's payload cache.",
+            "# TYPE ride_info_user_payload_cache_size gauge",
+            f"ride_info_user_payload_cache_size {stats['size']}",
+            "# HELP ride_info_user_payload_cache_lookups_total User payload lookups by result.",
+            "# TYPE ride_info_user_payload_cache_lookups_total counter",
+            f'ride_info_user_payload_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+            f'ride_info_user_payload_cache_lookups_total{{result="miss"}} {stats["misses"]}',
+            "# HELP ride_info_user_payload_cache_evictions_total Users dropped to stay within RIDE_USER_PAYLOAD_CACHE_SIZE.",
+            "# TYPE ride_info_user_payload_cache_evictions_total counter",
+            f"ride_info_user_payload_cache_evictions_total {stats['evictions']}",
+            "# HELP ride_info_user_payload_cache_invalidations_total Times another process's user write emptied the cache.",
+            "# TYPE ride_info_user_payload_cache_invalidations_total counter",
+            f"ride_info_user_payload_cache_invalidations_total {stats['invalidations']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+user_payloads = UserPayloadCache()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_payload_changed(sender, instance, **kwargs):
+    # Saves and deletes of model instances; no code path updates users in bulk.
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_payloads.forget(user_id, bump_user_version()))
@@ -1,7 +1,43 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_GET
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from api.caching import response_cache_stats
+from api.connections import database_connection_stats
+from api.permissions import IsAdminRole
+from api.usercache import user_payloads
+from ride_info.instrumentation import registry
 
 
 @require_GET
 def health(request):
     return JsonResponse({"status": "ok"})
+
+
+@extend_schema(responses=OpenApiTypes.OBJECT)
+@api_view(["GET"])
+@permission_classes([IsAdminRole])
+def cache_stats(request):
+    return Response(response_cache_stats())
+
+
+@extend_schema(responses=OpenApiTypes.OBJECT)
+@api_view(["GET"])
+@permission_classes([IsAdminRole])
+def db_stats(request):
+    return Response(database_connection_stats())
+
+
+@require_GET
+def metrics(request):
+    """Prometheus scrape endpoint, authenticated with the static `METRICS_TOKEN`, not a JWT."""
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": 'Bearer realm="metrics"'})
+    return HttpResponse(registry.render() + user_payloads.render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
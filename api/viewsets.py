@@ -1,82 +1,344 @@
-from datetime import timedelta
 
-from django.db.models import F, FloatField, Prefetch, Value
-from django.db.models import Func
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.db.models import Prefetch, Value
+from django.db.models.functions import Concat
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from rest_framework import viewsets
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
-from api.filters import RideFilter
-from api.pagination import StandardResultsSetPagination
+from api.caching import cache_response
+from api.conditional import (
+    TODAYS_EVENTS_WINDOW,
+    conditional_get,
+    last_aged_out_at,
+    make_etag,
+    todays_event_count,
+    user_version,
+)
+from api.connections import distance_statement_timeout
+from api.exports import chunked, iter_csv, iter_ndjson
+from api.fieldsets import EVENT_FIELDS, USER_RELATIONS, RideFieldset
+from api.filters import RideFilter, TripReportFilter
+from api.ingestion import LOCK_RIDES_SQL, batch_result, drop_unknown_rides, validate_batch
+from api.pagination import EstimatedCountPagination, RideKeysetPagination, StandardResultsSetPagination
+from api.parsers import NDJSONParser
 from api.permissions import IsAdminRole
-from api.serializers import RideEventSerializer, RideListSerializer, RideSerializer, UserSerializer
-from rides.models import Ride, RideEvent, User
+from api.queries import keyset_fields, ride_list_queryset, ride_payload_rows
+from api.renderers import render_with_results
+from api.replicas import ReplicaReadsMixin
+from api.serializers import (
+    RideEventSerializer,
+    RideListSerializer,
+    RideSerializer,
+    TripReportSerializer,
+    UserSerializer,
+)
+from rides.cache import EVENTS, RIDES, USERS, bump_data_version
+from rides.models import DriverMonthlyTripSummary, Ride, RideEvent, User
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by("id_user")
     serializer_class = UserSerializer
     permission_classes = (IsAdminRole,)
 
 
-class RideViewSet(viewsets.ModelViewSet):
+class RideViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     serializer_class = RideSerializer
     permission_classes = (IsAdminRole,)
-    pagination_class = StandardResultsSetPagination
+    pagination_class = EstimatedCountPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RideFilter
+    replica_actions = frozenset({"list", "retrieve", "export"})
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            pagination_class = self.get_pagination_class()
+            self._paginator = None if pagination_class is None else pagination_class()
+        return self._paginator
+
+    def get_pagination_class(self):
+        request = getattr(self, "request", None)
+        if request is not None:
+            params = request.query_params
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                return RideKeysetPagination
+        return self.pagination_class
 
     def get_serializer_class(self):
         if self.action in {"list", "retrieve"}:
             return RideListSerializer
         return RideSerializer
 
+    def get_todays_events_since(self):
+        return timezone.now() - TODAYS_EVENTS_WINDOW
+
+    def get_fieldset(self):
+        """The `fields` / `exclude` / `expand` selection for list and detail responses, else `None`."""
+        if self.action not in {"list", "retrieve"}:
+            return None
+        if not hasattr(self, "_fieldset"):
+            self._fieldset = RideFieldset.from_query_params(self.request.query_params)
+        return self._fieldset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "ride_fieldset": self.get_fieldset()}
+
+    def get_data_scopes(self):
+        """
+        The data versions (`rides.cache`) a cached list/detail response is keyed on: rides
+        always, events and users only when the fieldset shows them (or `rider_email` filters
+        on users), so event ingestion leaves responses without events cached.
+        """
+        fieldset = self.get_fieldset()
+        scopes = [RIDES]
+        if any(name in fieldset for name in EVENT_FIELDS):
+            scopes.append(EVENTS)
+        if any(name in fieldset for name in USER_RELATIONS) or self.request.query_params.get("rider_email"):
+            scopes.append(USERS)
+        return scopes
+
     def get_queryset(self):
-        qs = Ride.objects.select_related("id_rider", "id_driver").all()
+        return ride_list_queryset(
+            self.request.query_params, since=self.get_todays_events_since(), fieldset=self.get_fieldset()
+        )
+
+    @cache_response
+    @distance_statement_timeout
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        engine = request.query_params.get("engine", "orm")
+        if engine == "db":
+            return self.list_from_database(request)
+        if engine != "orm":
+            raise ValidationError({"engine": "Must be one of: orm, db"})
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-        since = timezone.now() - timedelta(hours=24)
-        todays_events_qs = (
-            RideEvent.objects.filter(created_at__gte=since)
-            .only("id_ride_event", "id_ride", "description", "created_at")
-            .order_by("-created_at")
+    def get_conditional_validators(self, request, **kwargs):
+        """
+        ETag (and, for one ride, Last-Modified) from the ride's, rider's and driver's
+        `version` / `updated_at` and the events window.
+
+        A list page's ETag covers its envelope (count, links) and each ride's versions and
+        events in window, read by the page query without joins, prefetches or serialization.
+        The count is shared with the list itself (`EstimatedCountPagination`). Lists get no
+        Last-Modified: rides leaving a filter or being deleted leave no timestamp behind.
+        """
+        since = self.get_todays_events_since()
+
+        if self.action != "retrieve":
+            queryset = self.filter_queryset(self.get_queryset())
+            rows = self.paginate_queryset(
+                queryset.select_related(None)
+                .prefetch_related(None)
+                .annotate(
+                    todays_event_count=todays_event_count(since),
+                    rider_version=user_version("id_rider"),
+                    driver_version=user_version("id_driver"),
+                )
+                .values("version", "rider_version", "driver_version", "todays_event_count", *keyset_fields(queryset))
+            )
+            envelope = self.get_paginated_response([]).data
+            page = [
+                (row["id_ride"], row["version"], row["rider_version"], row["driver_version"], row["todays_event_count"])
+                for row in rows
+            ]
+            return make_etag(request.accepted_media_type, envelope, page), None
+
+        try:
+            row = (
+                self.filter_queryset(Ride.objects.filter(pk=kwargs["pk"]))
+                .annotate(todays_event_count=todays_event_count(since), last_aged_out_at=last_aged_out_at(since))
+                .values_list(
+                    "version",
+                    "id_rider__version",
+                    "id_driver__version",
+                    "updated_at",
+                    "id_rider__updated_at",
+                    "id_driver__updated_at",
+                    "todays_event_count",
+                    "last_aged_out_at",
+                )
+                .first()
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            row = None
+        if row is None:
+            # Let the action produce its 404.
+            return None, None
+
+        (
+            version,
+            rider_version,
+            driver_version,
+            updated_at,
+            rider_updated_at,
+            driver_updated_at,
+            event_count,
+            aged_out_at,
+        ) = row
+        last_modified = max(updated_at, rider_updated_at, driver_updated_at)
+        if aged_out_at is not None:
+            last_modified = max(last_modified, aged_out_at + TODAYS_EVENTS_WINDOW)
+        etag = make_etag(request.accepted_media_type, kwargs["pk"], version, rider_version, driver_version, event_count)
+        return etag, last_modified
+
+    def list_from_database(self, request):
+        """
+        `engine=db`: Postgres builds each ride's JSON, nested users and today's events
+        included, in the page query itself.
+
+        The JSON texts are spliced into the paginated envelope without creating model
+        instances. Filters, ordering, pagination and keys are the same as the default engine.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(
+            ride_payload_rows(queryset, self.get_todays_events_since(), self.get_fieldset())
         )
-        qs = qs.prefetch_related(
-            Prefetch("ride_events", queryset=todays_events_qs, to_attr="todays_ride_events")
+        envelope = self.get_paginated_response([]).data
+        return HttpResponse(
+            render_with_results(envelope, [row["payload"] for row in page]),
+            content_type="application/json",
         )
 
-        ordering = self.request.query_params.get("ordering")
-        lat = self.request.query_params.get("lat")
-        lon = self.request.query_params.get("lon")
-
-        if lat is not None and lon is not None:
-            try:
-                lat_f = float(lat)
-                lon_f = float(lon)
-            except ValueError as exc:
-                raise ValidationError({"lat": "Must be a number", "lon": "Must be a number"}) from exc
-
-            pickup_earth = Func(F("pickup_latitude"), F("pickup_longitude"), function="ll_to_earth")
-            input_earth = Func(Value(lat_f), Value(lon_f), function="ll_to_earth")
-            distance = Func(pickup_earth, input_earth, function="earth_distance", output_field=FloatField())
-            qs = qs.annotate(distance_to_pickup_meters=distance)
-        else:
-            qs = qs.annotate(distance_to_pickup_meters=Value(None, output_field=FloatField()))
-
-        if ordering in {"pickup_time", "-pickup_time"}:
-            qs = qs.order_by(ordering, "id_ride")
-        elif ordering in {"distance", "-distance"}:
-            if lat is None or lon is None:
-                raise ValidationError({"ordering": "Distance ordering requires lat and lon query params"})
-            direction = "-" if ordering.startswith("-") else ""
-            qs = qs.order_by(f"{direction}distance_to_pickup_meters", "id_ride")
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Stream every matching ride as NDJSON (`output=ndjson`, default) or CSV (`output=csv`).
+
+        Accepts the list endpoint's filters and ordering. Rows are read through a server-side
+        cursor in chunks, so memory stays flat and the first bytes are sent right away.
+        `include_events=true` adds each ride's full event history.
+        """
+        output = request.query_params.get("output", "ndjson")
+        if output not in {"ndjson", "csv"}:
+            raise ValidationError({"output": "Must be one of: ndjson, csv"})
+        include_events = request.query_params.get("include_events", "").lower() in {"1", "true", "yes"}
+
+        qs = (
+            self.filter_queryset(self.get_queryset())
+            .select_related(None)
+            .prefetch_related(None)
+            .defer("pickup_earth")
+        )
+        if include_events:
+            events_qs = RideEvent.objects.only(
+                "id_ride_event", "id_ride", "description", "kind", "created_at"
+            ).order_by("created_at", "id_ride_event")
+            qs = qs.prefetch_related(Prefetch("ride_events", queryset=events_qs, to_attr="export_events"))
+
+        # Pinned, since the rows are read while streaming, after the request's routing has ended.
+        rides = qs.using(qs.db).iterator(chunk_size=settings.RIDE_EXPORT_CHUNK_SIZE)
+        if output == "csv":
+            lines, content_type = iter_csv(rides, include_events), "text/csv; charset=utf-8"
         else:
-            qs = qs.order_by("id_ride")
+            lines, content_type = iter_ndjson(rides, include_events), "application/x-ndjson"
 
-        return qs
+        response = StreamingHttpResponse(chunked(lines), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="rides.{output}"'
+        return response
 
 
-class RideEventViewSet(viewsets.ModelViewSet):
+class RideEventViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = RideEvent.objects.select_related("id_ride").all().order_by("id_ride_event")
     serializer_class = RideEventSerializer
     permission_classes = (IsAdminRole,)
+    pagination_class = EstimatedCountPagination
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = make_etag(request.accepted_media_type, response.data)
+        return response
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_conditional_validators(self, request, **kwargs):
+        """
+        Validators for one event, from its ride's change tracking: any write to an event
+        bumps its ride's `version` / `updated_at`.
+
+        An event page is a single narrow query, as cheap as any validator query would be, so
+        `list` reads it once and takes the ETag from the page (envelope and results) instead.
+        """
+        if self.action != "retrieve":
+            return None, None
+
+        try:
+            row = (
+                RideEvent.objects.filter(pk=kwargs["pk"])
+                .values_list("id_ride__version", "id_ride__updated_at")
+                .first()
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            row = None
+        if row is None:
+            return None, None
+
+        version, updated_at = row
+        return make_etag(request.accepted_media_type, kwargs["pk"], version), updated_at
+
+    @action(detail=False, methods=["post"], url_path="bulk", parser_classes=(JSONParser, NDJSONParser))
+    def bulk(self, request):
+        """
+        Ingest a batch of events (JSON array or NDJSON) with one ride lookup and one INSERT.
+
+        The lookup and the INSERT share one transaction; invalid items, and items whose ride does
+        not exist, are reported by index.
+        Responds 201 when every item was written, 207 when some were rejected, 400 when none were valid.
+        """
+        validated, errors = validate_batch(request.data)
+
+        events = []
+        if validated:
+            with transaction.atomic():
+                # Locked until commit, so a ride deleted meanwhile is reported, not an IntegrityError.
+                with connection.cursor() as cursor:
+                    cursor.execute(LOCK_RIDES_SQL, [sorted({data["id_ride"] for _index, data in validated})])
+                    existing_ride_ids = {row[0] for row in cursor.fetchall()}
+                events = [
+                    RideEvent(
+                        id_ride_id=data["id_ride"], description=data["description"], created_at=data["created_at"]
+                    )
+                    for data in drop_unknown_rides(validated, existing_ride_ids, errors)
+                ]
+                if events:
+                    RideEvent.objects.bulk_create(events)
+                    bump_data_version(EVENTS)
+
+        body, response_status = batch_result([event.id_ride_event for event in events], errors)
+        return Response(body, status=response_status)
+
+
+class TripReportViewSet(ReplicaReadsMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Trips over 1 hour per month and driver, read from `DriverMonthlyTripSummary`.
+
+    The numbers are as fresh as the last `refresh_trip_report` run (see `refreshed_at`).
+    """
+
+    serializer_class = TripReportSerializer
+    permission_classes = (IsAdminRole,)
+    pagination_class = StandardResultsSetPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = TripReportFilter
+
+    def get_queryset(self):
+        return DriverMonthlyTripSummary.objects.annotate(
+            driver_name=Concat("id_driver__first_name", Value(" "), "id_driver__last_name"),
+        ).order_by("month", "id_driver")
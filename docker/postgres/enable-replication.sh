@@ -0,0 +1,5 @@
+#!/bin/sh
+# Runs once, when the `db` volume is initialized: lets the `db-replica` service stream WAL
+# with the primary's credentials.
+set -e
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,226 @@
+"""
+Per-request database and timing figures that are cheap enough to collect in production.
+
+Every Django connection gets an execute wrapper (installed on `connection_created`) that adds
+each statement's duration to the current request's `RequestStats`, found through a context
+variable, so it works for threads, pooled connections and `sync_to_async` alike. Outside a
+request (management commands, shells) the wrapper only does the lookup.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.db.backends.signals import connection_created
+
+current_stats = ContextVar("request_stats", default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+PHASES = ("db", "serialize", "render")
+
+FINGERPRINT_REPLACEMENTS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """
+    `(normalized sql, short id)`: literals and placeholders become `?`, `IN` lists collapse.
+
+    Cached because Django emits the same text for every execution of a query shape, and the
+    regexes cost more than the rest of the request bookkeeping together.
+    """
+    normalized = sql
+    for pattern, replacement in FINGERPRINT_REPLACEMENTS:
+        normalized = pattern.sub(replacement, normalized)
+    normalized = normalized.strip()
+    return normalized, hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class RequestStats:
+    slow_query_seconds: float
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    slow_queries: int = 0
+    db_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_sql: str = ""
+    # When the view started and returned, and the database time spent by then.
+    view_started: float | None = None
+    db_at_view_start: float = 0.0
+    view_finished: float | None = None
+    db_at_view_finish: float = 0.0
+
+    def record(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if seconds >= self.slow_query_seconds:
+            self.slow_queries += 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_sql = sql
+
+    def phases(self, finished):
+        """
+        Seconds per phase: `db`, `serialize` (the view's time outside the database, which for
+        list/detail endpoints is mostly serialization) and `render` (turning a DRF `Response`
+        into bytes, after the view returned).
+        """
+        serialize = render = 0.0
+        if self.view_started is not None:
+            if self.view_finished is None:
+                # Plain `HttpResponse`: the view rendered its own body.
+                serialize = finished - self.view_started - (self.db_seconds - self.db_at_view_start)
+            else:
+                serialize = self.view_finished - self.view_started - (self.db_at_view_finish - self.db_at_view_start)
+                render = finished - self.view_finished - (self.db_seconds - self.db_at_view_finish)
+        return {"db": self.db_seconds, "serialize": max(0.0, serialize), "render": max(0.0, render)}
+
+
+def record_query(sql, seconds):
+    """Count a statement run outside Django's connections (e.g. on the async pool)."""
+    stats = current_stats.get()
+    if stats is not None:
+        stats.record(sql, seconds)
+
+
+def query_recorder(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # `connection_created` fires on every (re)connect of the same wrapper object.
+    if query_recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_recorder)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid="ride_info.instrumentation.query_recorder")
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in labels)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{format_labels((*labels, ("le", bound)))}}} {cumulative}'
+        yield f'{name}_bucket{{{format_labels((*labels, ("le", "+Inf")))}}} {self.total}'
+        yield f"{name}_sum{{{format_labels(labels)}}} {self.sum}"
+        yield f"{name}_count{{{format_labels(labels)}}} {self.total}"
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.statuses = {}
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.slow_queries = 0
+
+
+class MetricsRegistry:
+    """In-process aggregates per `(view, method)`, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, method, status, seconds, stats, phases):
+        with self._lock:
+            metrics = self._views.get((view, method))
+            if metrics is None:
+                metrics = self._views[(view, method)] = ViewMetrics()
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.duration.observe(seconds)
+            metrics.queries.observe(stats.queries)
+            for phase, phase_seconds in phases.items():
+                metrics.phase_seconds[phase] += phase_seconds
+            metrics.slow_queries += stats.slow_queries
+
+    def render(self):
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                "# HELP ride_info_http_requests_total Requests by view, method and status.",
+                "# TYPE ride_info_http_requests_total counter",
+            ]
+            for (view, method), metrics in views:
+                for status, count in sorted(metrics.statuses.items()):
+                    labels = format_labels((("view", view), ("method", method), ("status", status)))
+                    lines.append(f"ride_info_http_requests_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP ride_info_http_request_duration_seconds Request wall time.",
+                "# TYPE ride_info_http_request_duration_seconds histogram",
+            ]
+            for (view, method), metrics in views:
+                lines += metrics.duration.lines(
+                    "ride_info_http_request_duration_seconds", (("view", view), ("method", method))
+                )
+
+            lines += [
+                "# HELP ride_info_http_request_queries SQL statements per request.",
+                "# TYPE ride_info_http_request_queries histogram",
+            ]
+            for (view, method), metrics in views:
+                lines += metrics.queries.lines("ride_info_http_request_queries", (("view", view), ("method", method)))
+
+            lines += [
+                "# HELP ride_info_http_request_phase_seconds_total Time spent per phase (db, serialize, render).",
+                "# TYPE ride_info_http_request_phase_seconds_total counter",
+            ]
+            for (view, method), metrics in views:
+                for phase, seconds in metrics.phase_seconds.items():
+                    labels = format_labels((("view", view), ("method", method), ("phase", phase)))
+                    lines.append(f"ride_info_http_request_phase_seconds_total{{{labels}}} {seconds}")
+
+            lines += [
+                "# HELP ride_info_slow_queries_total Statements slower than REQUEST_METRICS_SLOW_QUERY_MS.",
+                "# TYPE ride_info_slow_queries_total counter",
+            ]
+            for (view, method), metrics in views:
+                labels = format_labels((("view", view), ("method", method)))
+                lines.append(f"ride_info_slow_queries_total{{{labels}}} {metrics.slow_queries}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -1,20 +1,129 @@
 from __future__ import annotations
 
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
-from django.db import connection, reset_queries
 
+from ride_info.instrumentation import RequestStats, current_stats, fingerprint, registry
+
+logger = logging.getLogger("ride_info.requests")
+
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request query count, database time, slowest statement and phase timings, in production.
+
+    Adds `X-Query-Count` and (unless `REQUEST_METRICS_SERVER_TIMING` is off) `Server-Timing`
+    headers, feeds the `/api/metrics/` aggregates, and logs one JSON line per request on the
+    `ride_info.requests` logger: a `REQUEST_METRICS_LOG_SAMPLE_RATE` sample at INFO, plus every
+    request with a slow statement or too many statements at WARNING.
+
+    Streaming responses only account for the queries made before the body starts.
+    """
+
+    # Async-capable so ASGI requests to async views are not pushed onto a thread.
+    sync_capable = True
+    async_capable = True
 
-class QueryCountMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # The ASGI handler would run plain-function hooks through `sync_to_async`.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
 
     def __call__(self, request):
-        if settings.DEBUG:
-            reset_queries()
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-        response = self.get_response(request)
+        stats = RequestStats(slow_query_seconds=settings.REQUEST_METRICS_SLOW_QUERY_MS / 1000)
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, response, stats)
+        return response
 
-        if settings.DEBUG:
-            response.headers["X-Query-Count"] = str(len(connection.queries))
+    async def __acall__(self, request):
+        stats = RequestStats(slow_query_seconds=settings.REQUEST_METRICS_SLOW_QUERY_MS / 1000)
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, response, stats)
+        return response
 
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.view_started = time.perf_counter()
+            stats.db_at_view_start = stats.db_seconds
+
+    def process_template_response(self, request, response):
+        # Called between the view returning a DRF `Response` and its rendering.
+        stats = current_stats.get()
+        if stats is not None:
+            stats.view_finished = time.perf_counter()
+            stats.db_at_view_finish = stats.db_seconds
         return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return RequestMetricsMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def aprocess_template_response(self, request, response):
+        return RequestMetricsMiddleware.process_template_response(self, request, response)
+
+    def finish(self, request, response, stats):
+        finished = time.perf_counter()
+        seconds = finished - stats.started
+        phases = stats.phases(finished)
+        view = request.resolver_match.view_name if request.resolver_match else "unmatched"
+        method = request.method if request.method in KNOWN_METHODS else "other"
+        registry.observe(view, method, response.status_code, seconds, stats, phases)
+
+        response.headers["X-Query-Count"] = str(stats.queries)
+
+        slowest_sql, slowest_id = fingerprint(stats.slowest_sql) if stats.queries else (None, None)
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(stats, phases, seconds, slowest_id)
+
+        flagged = stats.slow_queries > 0 or stats.queries >= settings.REQUEST_METRICS_QUERY_COUNT_WARNING
+        if flagged or random.random() < settings.REQUEST_METRICS_LOG_SAMPLE_RATE:
+            record = {
+                "view": view,
+                "method": method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round(seconds * 1000, 2),
+                "queries": stats.queries,
+                "slow_queries": stats.slow_queries,
+                "db_ms": round(phases["db"] * 1000, 2),
+                "serialize_ms": round(phases["serialize"] * 1000, 2),
+                "render_ms": round(phases["render"] * 1000, 2),
+                "slowest_ms": round(stats.slowest_seconds * 1000, 2),
+                "slowest_id": slowest_id,
+                "slowest_sql": slowest_sql,
+            }
+            logger.log(logging.WARNING if flagged else logging.INFO, json.dumps(record))
+
+
+def server_timing(stats, phases, seconds, slowest_id):
+    metrics = [f'db;dur={phases["db"] * 1000:.2f};desc="{stats.queries} queries"']
+    if slowest_id:
+        # The statement itself goes to the log; the header carries its id to look it up.
+        metrics.append(f'slowest;dur={stats.slowest_seconds * 1000:.2f};desc="{slowest_id}"')
+    metrics += [
+        f'serialize;dur={phases["serialize"] * 1000:.2f}',
+        f'render;dur={phases["render"] * 1000:.2f}',
+        f"total;dur={seconds * 1000:.2f}",
+    ]
+    return ", ".join(metrics)
@@ -0,0 +1,139 @@
+"""
+Read-replica routing.
+
+Writes always go to the primary (`default`). Reads go to the replica chosen for the current
+request (see `api.replicas`), found through a context variable like the request metrics, and
+to the primary everywhere else: writes, sticky requests, management commands and shells.
+
+A replica is only chosen while its replay lag is under `REPLICA_MAX_LAG_SECONDS`; the lag is
+measured at most every `REPLICA_LAG_CHECK_INTERVAL` seconds per process, and a replica that
+cannot be reached, or is not streaming from the primary, counts as lagging until the next check.
+"""
+
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+current_read_alias = ContextVar("current_read_alias", default=None)
+
+# Zero while the replica has replayed everything it received (an idle primary sends nothing,
+# so the last replayed commit alone would make an idle replica look ever further behind).
+# Having replayed everything only means it is current while it is still receiving: a WAL
+# receiver that is not streaming, or has heard nothing from the primary (not even the
+# keepalives an idle primary sends every `wal_sender_timeout / 2`) for
+# `REPLICA_RECEIVER_TIMEOUT_SECONDS`, gives NULL, an unknown lag. The receiver's status comes
+# back too; it is NULL unless the database user has `pg_read_all_stats`.
+REPLICA_LAG_SQL = """
+SELECT
+    CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN receiver.status IS DISTINCT FROM 'streaming'
+            OR receiver.last_msg_receipt_time IS NULL
+            OR receiver.last_msg_receipt_time < now() - make_interval(secs => %s) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END,
+    receiver.status
+FROM (SELECT) AS one
+LEFT JOIN pg_stat_wal_receiver AS receiver ON true
+"""
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # `None` lets Django fall back to the hinted instance's database, so related objects
+        # fetched after the request (a streamed export's prefetches) follow their rows.
+        return current_read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class LagCheck:
+    """The last lag measurement of one replica, in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.lag_seconds = None
+        self.error = None
+
+    def due(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL
+
+
+_lag_checks = {}
+
+
+def lag_check(alias):
+    return _lag_checks.setdefault(alias, LagCheck())
+
+
+def measure_lag(alias):
+    check = lag_check(alias)
+    # One thread measures; the others use the previous figure meanwhile.
+    if not check.due() or not check.lock.acquire(blocking=False):
+        return check
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL, [settings.REPLICA_RECEIVER_TIMEOUT_SECONDS])
+            lag_seconds, receiver_status = cursor.fetchone()
+        if lag_seconds is not None:
+            check.lag_seconds, check.error = float(lag_seconds), None
+        elif receiver_status == "streaming":
+            timeout = settings.REPLICA_RECEIVER_TIMEOUT_SECONDS
+            check.lag_seconds, check.error = None, f"No message from the primary for over {timeout:g}s"
+        else:
+            check.lag_seconds, check.error = None, f"WAL receiver not streaming (status: {receiver_status or 'unknown'})"
+    except DatabaseError as exc:
+        check.lag_seconds, check.error = None, str(exc).strip() or exc.__class__.__name__
+        # Reconnect on the next check rather than reuse a broken connection.
+        connections[alias].close()
+    finally:
+        check.checked_at = time.monotonic()
+        check.lock.release()
+    return check
+
+
+def is_current(alias):
+    check = measure_lag(alias)
+    return check.lag_seconds is not None and check.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS
+
+
+def choose_replica():
+    """A random replica that is within `REPLICA_MAX_LAG_SECONDS`, or `None` for the primary."""
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if is_current(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+def read_alias():
+    """The database this request's reads go to."""
+    return current_read_alias.get() or DEFAULT_DB_ALIAS
+
+
+def replica_stats():
+    """The last lag measurement of each configured replica, in this process."""
+    now = time.monotonic()
+    stats = {}
+    for alias in settings.DATABASE_REPLICAS:
+        check = lag_check(alias)
+        stats[alias] = {
+            "host": settings.DATABASES[alias]["HOST"],
+            "port": settings.DATABASES[alias]["PORT"],
+            "lag_seconds": check.lag_seconds,
+            "current": check.lag_seconds is not None and check.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS,
+            "error": check.error,
+            "checked_seconds_ago": None if check.checked_at is None else round(now - check.checked_at, 2),
+        }
+    return stats
@@ -37,7 +37,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "ride_info.middleware.QueryCountMiddleware",
+    "ride_info.middleware.RequestMetricsMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -61,6 +61,17 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "ride_info.wsgi.application"
 
+# Connection reuse. DATABASE_POOL=true shares a psycopg pool between a process's threads
+# (the option for threaded servers such as runserver, which close a thread's connection when
+# its request ends); otherwise each thread keeps its connection for DATABASE_CONN_MAX_AGE seconds.
+DATABASE_POOL = env.bool("DATABASE_POOL", default=False)
+DATABASE_POOL_MIN_SIZE = env.int("DATABASE_POOL_MIN_SIZE", default=4)
+DATABASE_POOL_MAX_SIZE = env.int("DATABASE_POOL_MAX_SIZE", default=20)
+# Seconds a request may wait for a free pooled connection before failing.
+DATABASE_POOL_TIMEOUT = env.float("DATABASE_POOL_TIMEOUT", default=10.0)
+# Behind PgBouncer in transaction mode: no server-side cursors (they outlive a transaction).
+DATABASE_PGBOUNCER = env.bool("DATABASE_PGBOUNCER", default=False)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -69,8 +80,47 @@ DATABASES = {
         "PASSWORD": env("POSTGRES_PASSWORD"),
         "HOST": env("POSTGRES_HOST", default="db"),
         "PORT": env("POSTGRES_PORT", default="5432"),
+        # Django rejects persistent connections together with its pool.
+        "CONN_MAX_AGE": 0 if DATABASE_POOL else env.int("DATABASE_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": env.bool("DATABASE_CONN_HEALTH_CHECKS", default=True),
+        "DISABLE_SERVER_SIDE_CURSORS": DATABASE_PGBOUNCER,
+        "OPTIONS": {},
     }
 }
+if DATABASE_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": DATABASE_POOL_MIN_SIZE,
+        "max_size": DATABASE_POOL_MAX_SIZE,
+        "timeout": DATABASE_POOL_TIMEOUT,
+    }
+
+# Read replicas, as "host[:port]" entries; each becomes an alias (replica1, replica2, ...) with
+# the primary's credentials and connection settings. Empty keeps every query on the primary.
+DATABASE_REPLICA_HOSTS = env.list("DATABASE_REPLICA_HOSTS", default=[])
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(DATABASE_REPLICA_HOSTS, start=1):
+    replica_hostname, _, replica_port = replica_host.partition(":")
+    replica_alias = f"replica{number}"
+    DATABASES[replica_alias] = {
+        **DATABASES["default"],
+        "HOST": replica_hostname,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+        # Test runs read their writes back from the test database itself.
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(replica_alias)
+DATABASE_ROUTERS = ["ride_info.routers.ReplicaRouter"]
+# Seconds a user's reads stay on the primary after they write, so they see their own changes.
+REPLICA_STICKY_SECONDS = env.int("REPLICA_STICKY_SECONDS", default=15)
+# Replicas further behind than this many seconds are skipped until they catch up.
+REPLICA_MAX_LAG_SECONDS = env.float("REPLICA_MAX_LAG_SECONDS", default=10.0)
+# Seconds between replica lag measurements, per process.
+REPLICA_LAG_CHECK_INTERVAL = env.float("REPLICA_LAG_CHECK_INTERVAL", default=5.0)
+# A replica whose WAL receiver has heard nothing from the primary for this many seconds counts
+# as lagging. Keep it above half the primary's `wal_sender_timeout` (60s by default), the gap
+# between keepalives on an idle primary.
+REPLICA_RECEIVER_TIMEOUT_SECONDS = env.float("REPLICA_RECEIVER_TIMEOUT_SECONDS", default=45.0)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,9 +152,112 @@ SIMPLE_JWT = {
     "USER_ID_FIELD": "id_user",
 }
 
+# "stateless" authenticates API requests from the token's role/auth_version claims without
+# loading the user; "database" loads the user on every request (see api/authentication.py).
+JWT_AUTH_MODE = env("JWT_AUTH_MODE", default="stateless")
+# Seconds a user's auth version is cached in stateless mode. Saves through the ORM clear it
+# at once; this bounds how long a change made with raw SQL takes to revoke tokens.
+JWT_AUTH_VERSION_CACHE_TTL = env.int("JWT_AUTH_VERSION_CACHE_TTL", default=30)
+
+# Redis (or any Redis-compatible server) when REDIS_URL is set, so every worker shares one
+# cache; otherwise a per-process local-memory cache, which is also what tests run against.
+# Deployments with more than one worker process need REDIS_URL: the data version, user version,
+# cached auth versions and primary pins (rides/cache.py) only reach other workers through the
+# shared cache. Without it, one worker's writes leave the others serving stale responses and
+# users, accepting revoked tokens and reading from replicas. Server startup logs a warning.
+REDIS_URL = env("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a rendered ride list/detail response is served from the cache; 0 disables.
+# Writes retire entries immediately (see rides/cache.py), so this only bounds memory.
+RIDE_RESPONSE_CACHE_TTL = env.int("RIDE_RESPONSE_CACHE_TTL", default=60)
+# Opt-in: decimal places lat/lon are rounded to for cached distance queries (4 is about 11 m),
+# in the cache key and in the query alike. Unset, coordinates are used and keyed as sent.
+RIDE_RESPONSE_CACHE_COORDINATE_DECIMALS = env.int("RIDE_RESPONSE_CACHE_COORDINATE_DECIMALS", default=None)
+
+# Ride list/detail take rider/driver objects from a per-process LRU of serialized users
+# (api/usercache.py) instead of joining the users table into every ride query.
+RIDE_USER_PAYLOAD_CACHE = env.bool("RIDE_USER_PAYLOAD_CACHE", default=False)
+# Users each process keeps serialized; the least recently used are evicted beyond it.
+RIDE_USER_PAYLOAD_CACHE_SIZE = env.int("RIDE_USER_PAYLOAD_CACHE_SIZE", default=10000)
+
+# Paginated lists use the planner's row estimate instead of COUNT(*) at or above this size.
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = env.int("PAGINATION_COUNT_ESTIMATE_THRESHOLD", default=100000)
+# Seconds a (possibly estimated) count is reused for the same filtered query; 0 disables.
+PAGINATION_COUNT_CACHE_TTL = env.int("PAGINATION_COUNT_CACHE_TTL", default=30)
+
+# Maximum number of events accepted by one POST /api/ride-events/bulk/ request.
+RIDE_EVENT_BULK_MAX_ITEMS = env.int("RIDE_EVENT_BULK_MAX_ITEMS", default=5000)
+
+# Rides fetched per server-side cursor round trip by GET /api/rides/export/.
+RIDE_EXPORT_CHUNK_SIZE = env.int("RIDE_EXPORT_CHUNK_SIZE", default=2000)
+
+# psycopg async pool used by the /api/async/ views under ASGI (one pool per process).
+ASYNC_DB_POOL_MIN_SIZE = env.int("ASYNC_DB_POOL_MIN_SIZE", default=2)
+ASYNC_DB_POOL_MAX_SIZE = env.int("ASYNC_DB_POOL_MAX_SIZE", default=20)
+# Seconds a request may wait for a free pooled connection before failing.
+ASYNC_DB_POOL_TIMEOUT = env.float("ASYNC_DB_POOL_TIMEOUT", default=30.0)
+
+# Live ride event stream (GET /api/async/ride-events/stream/, ASGI only). Seconds between
+# keep-alive comments on an idle stream; each stream also re-checks its token this often.
+RIDE_EVENT_STREAM_KEEPALIVE_SECONDS = env.float("RIDE_EVENT_STREAM_KEEPALIVE_SECONDS", default=15.0)
+# Events a subscriber may fall behind by before its stream is ended (clients resume from
+# Last-Event-ID).
+RIDE_EVENT_STREAM_QUEUE_SIZE = env.int("RIDE_EVENT_STREAM_QUEUE_SIZE", default=1000)
+# Most missed events replayed by one resumed stream; a client further behind resumes again.
+RIDE_EVENT_STREAM_REPLAY_LIMIT = env.int("RIDE_EVENT_STREAM_REPLAY_LIMIT", default=1000)
+# Where each ASGI process's LISTEN connection goes; defaults to POSTGRES_HOST/POSTGRES_PORT.
+# LISTEN needs a session of its own, so behind PgBouncer in transaction mode point it at
+# Postgres directly.
+RIDE_EVENT_STREAM_DATABASE_HOST = env("RIDE_EVENT_STREAM_DATABASE_HOST", default="")
+RIDE_EVENT_STREAM_DATABASE_PORT = env("RIDE_EVENT_STREAM_DATABASE_PORT", default="")
+
+# Request instrumentation (ride_info/middleware.py). Server-Timing exposes per-phase timings
+# to API clients; turn it off if that is unwanted.
+REQUEST_METRICS_SERVER_TIMING = env.bool("REQUEST_METRICS_SERVER_TIMING", default=True)
+# Fraction of requests logged as JSON on the `ride_info.requests` logger.
+REQUEST_METRICS_LOG_SAMPLE_RATE = env.float("REQUEST_METRICS_LOG_SAMPLE_RATE", default=0.01)
+# Requests with a statement at least this slow, or at least this many statements (likely
+# N+1), are always logged, at WARNING.
+REQUEST_METRICS_SLOW_QUERY_MS = env.int("REQUEST_METRICS_SLOW_QUERY_MS", default=500)
+REQUEST_METRICS_QUERY_COUNT_WARNING = env.int("REQUEST_METRICS_QUERY_COUNT_WARNING", default=20)
+# Bearer token for GET /api/metrics/ (Prometheus text format); the endpoint is off when empty.
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "ride_info.requests": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Per-statement cap, in milliseconds, for distance-ordered ride lists (sync and async);
+# 0 disables. Applied with SET LOCAL inside the request's transaction, so it is PgBouncer-safe.
+RIDE_DISTANCE_STATEMENT_TIMEOUT_MS = env.int("RIDE_DISTANCE_STATEMENT_TIMEOUT_MS", default=5000)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.AdminJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
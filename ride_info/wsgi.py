@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ride_info.settings")
 
 application = get_wsgi_application()
+
+# Only servers run several workers; management commands and tests stay quiet.
+from rides.cache import warn_if_cache_is_local  # noqa: E402
+
+warn_if_cache_is_local()
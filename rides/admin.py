@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
-from rides.models import Ride, RideEvent, User
+from rides.models import DriverMonthlyTripSummary, Ride, RideEvent, User
 
 
 @admin.register(User)
@@ -43,6 +43,14 @@ class RideAdmin(admin.ModelAdmin):
 
 @admin.register(RideEvent)
 class RideEventAdmin(admin.ModelAdmin):
-    list_display = ("id_ride_event", "id_ride", "description", "created_at")
-    list_filter = ("created_at",)
+    list_display = ("id_ride_event", "id_ride", "description", "kind", "created_at")
+    list_filter = ("kind", "created_at")
     search_fields = ("description",)
+
+
+@admin.register(DriverMonthlyTripSummary)
+class DriverMonthlyTripSummaryAdmin(admin.ModelAdmin):
+    list_display = ("month", "id_driver", "trips_over_1h", "refreshed_at")
+    list_filter = ("month",)
+    # Rows are rebuilt by `refresh_trip_report`; edits would be overwritten.
+    readonly_fields = ("month", "id_driver", "trips_over_1h", "refreshed_at")
@@ -0,0 +1,134 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+DATA_VERSION_KEY = "rides:data-version:{}"
+# What each data version covers: ride rows, their events (and the ride columns event triggers
+# derive from them), and users.
+RIDES = "rides"
+EVENTS = "events"
+USERS = "users"
+DATA_SCOPES = (RIDES, EVENTS, USERS)
+USER_VERSION_KEY = "rides:user-version"
+AUTH_VERSION_KEY = "rides:auth-version:{}"
+PRIMARY_PIN_KEY = "rides:primary-pin:{}"
+
+logger = logging.getLogger(__name__)
+
+
+def warn_if_cache_is_local() -> None:
+    """
+    Log a warning when the default cache lives in this process. Called by the WSGI and ASGI
+    entry points.
+
+    The versions and pins below are how one worker's writes reach the others, so with several
+    workers and a local-memory cache each one misses the others' writes (see `REDIS_URL`).
+    """
+    if settings.CACHES["default"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache":
+        logger.warning(
+            "The cache is local to this process (REDIS_URL is not set). With more than one worker, "
+            "cached responses, user payloads, auth versions and primary pins go stale across workers."
+        )
+
+
+def get_data_versions(scopes=DATA_SCOPES) -> dict:
+    """
+    Current version of each of `scopes` of the ride data, in one cache round trip.
+
+    Cached API responses are keyed on the versions of the data they show, so bumping one
+    retires every entry built from that data at once without having to find them, and leaves
+    the rest alone.
+    """
+    keys = {scope: DATA_VERSION_KEY.format(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    return {scope: found[key] if key in found else _get_version(key) for scope, key in keys.items()}
+
+
+def _get_version(key) -> int:
+    version = cache.get(key)
+    if version is None:
+        # Seeded from the clock so a version lost to eviction or a restart never
+        # comes back to a number older entries were stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(*scopes) -> None:
+    """
+    Retire cached responses built from `scopes` (default: all) after a write; deferred until
+    the write commits.
+    """
+    keys = [DATA_VERSION_KEY.format(scope) for scope in scopes or DATA_SCOPES]
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def _bump(keys) -> None:
+    for key in keys:
+        _incr_version(key)
+
+
+def _incr_version(key) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.get(key)
+
+
+async def abump_data_version(*scopes) -> None:
+    """`bump_data_version()` for async code writing outside Django's transactions; call it after the commit."""
+    for scope in scopes or DATA_SCOPES:
+        key = DATA_VERSION_KEY.format(scope)
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+
+
+def get_user_version() -> int:
+    """
+    Current version of the users as a whole, bumped on every `User` save or delete.
+
+    Kept apart from the `users` data version, which bulk paths bump without naming a user:
+    per-process copies of user records (`api.usercache`) count on each bump here being one
+    known user's write (see `UserPayloadCache.forget`).
+    """
+    return _get_version(USER_VERSION_KEY)
+
+
+def bump_user_version() -> int:
+    """Bump the user version now (call it after the write commits); returns the new version."""
+    return _incr_version(USER_VERSION_KEY)
+
+
+def auth_version_key(user_id) -> str:
+    """Cache key for the `auth_version` access tokens of `user_id` are checked against."""
+    return AUTH_VERSION_KEY.format(user_id)
+
+
+def forget_auth_version(user_id) -> None:
+    """Make token checks re-read a user's auth version; deferred until the write commits."""
+    transaction.on_commit(lambda: cache.delete(auth_version_key(user_id)))
+
+
+def primary_pin_key(user_id) -> str:
+    """Cache key marking that `user_id` wrote recently, so their reads skip the replicas."""
+    return PRIMARY_PIN_KEY.format(user_id)
+
+
+def pin_to_primary(user_id) -> None:
+    """Keep `user_id`'s reads on the primary for `REPLICA_STICKY_SECONDS`; deferred until the write commits."""
+    transaction.on_commit(lambda: cache.set(primary_pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS))
+
+
+async def apin_to_primary(user_id) -> None:
+    """`pin_to_primary()` for async code writing outside Django's transactions; call it after the commit."""
+    await cache.aset(primary_pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user_id) -> bool:
+    return cache.get(primary_pin_key(user_id), False)
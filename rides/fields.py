@@ -0,0 +1,65 @@
+from django.db import models
+
+
+class CubeField(models.Field):
+    """A value of the `cube` extension type (a point or box in n dimensions)."""
+
+    description = "Cube (n-dimensional point or box)"
+
+    def db_type(self, connection):
+        return "cube"
+
+
+class EarthField(CubeField):
+    """
+    A point on the `earthdistance` sphere (the `earth` domain over `cube`).
+
+    Values are read back as Postgres' text form, e.g. `(-3152331.5, 5276493.6, 1589618.4)`.
+    """
+
+    description = "Earth-centred point (earthdistance)"
+
+    def db_type(self, connection):
+        return "earth"
+
+
+class JSONTextField(models.Field):
+    """
+    Postgres `json` (not `jsonb`), used as the output type of SQL-built JSON expressions.
+
+    `json` keeps keys in the order they were built, which `jsonb` does not. Cast to text
+    before selecting to get the document as a string.
+    """
+
+    description = "JSON document (key order preserved)"
+
+    def db_type(self, connection):
+        return "json"
+
+
+class TransactionIdField(models.Field):
+    """
+    A Postgres `xid8`: a 64-bit transaction id, which never wraps around.
+
+    Read back as an `int`. Postgres has no operators between `xid8` and integer types, so
+    values are sent as text, which it casts.
+    """
+
+    description = "Transaction id (xid8)"
+
+    def db_type(self, connection):
+        return "xid8"
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else int(value)
+
+    def get_prep_value(self, value):
+        return None if value is None else str(value)
+
+
+class CurrentTransactionId(models.Func):
+    """`pg_current_xact_id()`: the current transaction's id, assigned on first use."""
+
+    function = "pg_current_xact_id"
+    arity = 0
+    output_field = TransactionIdField()
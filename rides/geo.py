@@ -0,0 +1,104 @@
+import math
+
+from django.db.models import BooleanField, FloatField, Func, Value
+
+from rides.fields import CubeField, EarthField
+
+# Radius used by the earthdistance extension's `earth()` function.
+EARTH_RADIUS_METERS = 6378168.0
+
+
+class LLToEarth(Func):
+    function = "ll_to_earth"
+    output_field = EarthField()
+
+
+class EarthDistance(Func):
+    function = "earth_distance"
+    output_field = FloatField()
+
+
+class EarthBox(Func):
+    """`earth_box(point, radius)`: the cube enclosing every point within `radius` metres."""
+
+    function = "earth_box"
+    output_field = CubeField()
+
+
+class Float8Array(Func):
+    template = "ARRAY[%(expressions)s]::float8[]"
+    output_field = FloatField()
+
+
+class Cube(Func):
+    """`cube(lower_corner, upper_corner)` built from two `(x, y, z)` tuples."""
+
+    function = "cube"
+    output_field = CubeField()
+
+    def __init__(self, lower, upper, **extra):
+        super().__init__(
+            Float8Array(*(Value(float(v)) for v in lower)),
+            Float8Array(*(Value(float(v)) for v in upper)),
+            **extra,
+        )
+
+
+class CubeContains(Func):
+    """`a @> b`: cube containment, answerable by a GiST index on `b`."""
+
+    template = "(%(expressions)s)"
+    arg_joiner = " @> "
+    output_field = BooleanField()
+
+
+class CubeDistance(Func):
+    """
+    `a <-> b` from the `cube` extension: straight-line (chord) distance between two points.
+
+    Chord length grows monotonically with great-circle distance, so ordering by it matches
+    ordering by `earth_distance`, but unlike a function call it is an operator that a GiST
+    index on the left-hand expression can answer as a nearest-neighbour (KNN) scan.
+    """
+
+    template = "(%(expressions)s)"
+    arg_joiner = " <-> "
+    output_field = FloatField()
+
+
+def ll_to_xyz(lat, lon):
+    """Python counterpart of `ll_to_earth`."""
+    lat_r = math.radians(lat)
+    lon_r = math.radians(lon)
+    return (
+        EARTH_RADIUS_METERS * math.cos(lat_r) * math.cos(lon_r),
+        EARTH_RADIUS_METERS * math.cos(lat_r) * math.sin(lon_r),
+        EARTH_RADIUS_METERS * math.sin(lat_r),
+    )
+
+
+def bounding_cube(min_lat, min_lon, max_lat, max_lon, padding=1.0):
+    """
+    Corners of the smallest axis-aligned cube containing a lat/lon rectangle on the sphere.
+
+    `min_lon > max_lon` means the rectangle crosses the antimeridian. Each coordinate is a
+    product of cosines/sines that peaks either at a rectangle edge, at the equator, or at a
+    multiple of 90 degrees of longitude, so evaluating those candidates gives exact bounds.
+    """
+    if max_lon < min_lon:
+        max_lon += 360.0
+
+    lats = [min_lat, max_lat]
+    if min_lat < 0.0 < max_lat:
+        lats.append(0.0)
+
+    lons = [min_lon, max_lon]
+    quarter = math.floor(min_lon / 90.0) + 1
+    while quarter * 90.0 < max_lon:
+        lons.append(quarter * 90.0)
+        quarter += 1
+
+    points = [ll_to_xyz(lat, lon) for lat in lats for lon in lons]
+    lower = tuple(min(axis) - padding for axis in zip(*points))
+    upper = tuple(max(axis) + padding for axis in zip(*points))
+    return lower, upper
@@ -0,0 +1,53 @@
+from django.contrib.postgres.aggregates.mixins import OrderableAggMixin
+from django.db.models import Aggregate, Func, TextField, Value
+
+from rides.fields import JSONTextField
+
+
+class JSONBuildObject(Func):
+    """`json_build_object(key, value, ...)` from keyword arguments, keeping their order."""
+
+    function = "json_build_object"
+    output_field = JSONTextField()
+
+    def __init__(self, **fields):
+        expressions = []
+        for key, value in fields.items():
+            expressions.extend((Value(key), value))
+        super().__init__(*expressions)
+
+
+class JSONAgg(OrderableAggMixin, Aggregate):
+    """`json_agg(expression ORDER BY ...)`; NULL (not `[]`) when there are no rows."""
+
+    function = "json_agg"
+    template = "%(function)s(%(expressions)s %(ordering)s)"
+    output_field = JSONTextField()
+
+
+class ISOTimestamp(Func):
+    """
+    A `timestamptz` as the string DRF's `DateTimeField` renders with `TIME_ZONE = "UTC"`.
+
+    `2026-02-12T08:30:00.250000Z`, with the fraction dropped when it is zero, like
+    `datetime.isoformat()`.
+    """
+
+    template = "replace(to_char(%(expressions)s AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.US'), '.000000', '') || 'Z'"
+    arity = 1
+    output_field = TextField()
+
+
+class JSONFloat(Func):
+    """
+    A `float8` as the JSON number `json.dumps` writes: a whole value keeps its `.0` (`14.0`,
+    where Postgres prints `14`).
+
+    Every other finite value Postgres already spells the same, shortest round-trip digits and
+    `1e-05` exponents included, up to 1e15, which no coordinate or distance in metres reaches.
+    NaN and infinities are not JSON, so the query fails on them, as the serializer does.
+    """
+
+    template = "regexp_replace((%(expressions)s)::double precision::text, '^(-?[0-9]+)$', '\\1.0')::json"
+    arity = 1
+    output_field = JSONTextField()
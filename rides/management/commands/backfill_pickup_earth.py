@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max
+
+from rides.cache import RIDES, bump_data_version
+from rides.geo import LLToEarth
+from rides.models import Ride
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate Ride.pickup_earth for rows written before the column existed. "
+        "Walks the primary key in small batches, each committed on its own, so row locks stay short."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to limit replication/IO pressure.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = int(options["batch_size"])
+        pause = float(options["sleep"])
+
+        if batch_size <= 0:
+            self.stdout.write(self.style.WARNING("--batch-size must be positive; nothing to do."))
+            return
+
+        max_id = Ride.objects.aggregate(max_id=Max("id_ride"))["max_id"]
+        if max_id is None:
+            self.stdout.write(self.style.WARNING("No rides found; nothing to do."))
+            return
+
+        updated_total = 0
+        lower = 0
+        while lower < max_id:
+            upper = lower + batch_size
+            # Autocommit: every batch is its own short transaction.
+            updated_total += Ride.objects.filter(
+                id_ride__gt=lower,
+                id_ride__lte=upper,
+                pickup_earth__isnull=True,
+            ).update(pickup_earth=LLToEarth(F("pickup_latitude"), F("pickup_longitude")))
+            lower = upper
+
+            if pause:
+                time.sleep(pause)
+
+        if updated_total:
+            # Distances read pickup_earth; QuerySet.update() sends no model signals.
+            bump_data_version(RIDES)
+
+        self.stdout.write(self.style.SUCCESS(f"Backfill complete: rides_updated={updated_total}"))
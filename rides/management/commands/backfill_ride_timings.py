@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+
+from rides.cache import EVENTS, bump_data_version
+from rides.models import Ride, RideEvent
+
+# The event update trigger recomputes each touched ride's timings as well.
+EVENT_KIND_SQL = """
+UPDATE rides_rideevent
+SET kind = rides_rideevent_kind(description)
+WHERE id_ride_event > %s AND id_ride_event <= %s
+  AND kind IS DISTINCT FROM rides_rideevent_kind(description)
+"""
+
+# Rides only written when a value actually changes, so versions (and ETags) of rides that
+# were already correct stay put.
+RIDE_TIMINGS_SQL = """
+UPDATE rides_ride r SET
+    picked_up_at = t.picked_up_at,
+    dropped_off_at = t.dropped_off_at,
+    last_event_at = t.last_event_at
+FROM (
+    SELECT
+        ride.id_ride,
+        (SELECT MIN(e.created_at) FROM rides_rideevent e WHERE e.id_ride = ride.id_ride AND e.kind = 'pickup') AS picked_up_at,
+        (SELECT MAX(e.created_at) FROM rides_rideevent e WHERE e.id_ride = ride.id_ride AND e.kind = 'dropoff') AS dropped_off_at,
+        (SELECT MAX(e.created_at) FROM rides_rideevent e WHERE e.id_ride = ride.id_ride) AS last_event_at
+    FROM rides_ride ride
+    WHERE ride.id_ride > %s AND ride.id_ride <= %s
+) t
+WHERE r.id_ride = t.id_ride
+  AND (r.picked_up_at, r.dropped_off_at, r.last_event_at)
+      IS DISTINCT FROM (t.picked_up_at, t.dropped_off_at, t.last_event_at)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate RideEvent.kind and Ride.picked_up_at / dropped_off_at / last_event_at for rows "
+        "written before migration 0007. Walks primary keys in small batches, each committed on its own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to limit replication/IO pressure.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = int(options["batch_size"])
+        pause = float(options["sleep"])
+
+        if batch_size <= 0:
+            self.stdout.write(self.style.WARNING("--batch-size must be positive; nothing to do."))
+            return
+
+        # Kinds first: the ride pass reads them.
+        max_event_id = RideEvent.objects.aggregate(max_id=Max("id_ride_event"))["max_id"] or 0
+        events_updated = self.run_batches(EVENT_KIND_SQL, max_event_id, batch_size, pause)
+
+        max_ride_id = Ride.objects.aggregate(max_id=Max("id_ride"))["max_id"] or 0
+        rides_updated = self.run_batches(RIDE_TIMINGS_SQL, max_ride_id, batch_size, pause)
+
+        if events_updated or rides_updated:
+            # Raw UPDATEs send no model signals. Event kinds and the ride timings derived
+            # from them are both event data.
+            bump_data_version(EVENTS)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backfill complete: ride_events_updated={events_updated} rides_updated={rides_updated}"
+            )
+        )
+
+    def run_batches(self, sql, max_id, batch_size, pause):
+        updated_total = 0
+        lower = 0
+        while lower < max_id:
+            upper = lower + batch_size
+            # Autocommit: every batch is its own short transaction.
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [lower, upper])
+                updated_total += cursor.rowcount
+            lower = upper
+
+            if pause:
+                time.sleep(pause)
+        return updated_total
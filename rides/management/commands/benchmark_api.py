@@ -0,0 +1,430 @@
+import io
+import json
+import logging
+import re
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+
+from api.auth import AdminTokenObtainPairSerializer
+from api.pagination import encode_position
+from rides.models import Ride, RideEvent, User
+
+BENCHMARK_EMAIL = "benchmark-admin@example.com"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# Queries per request with the response, count and auth version caches off, i.e. the most a
+# request can cost: authentication (1) and the page (the page query, plus EXPLAIN and COUNT(*)
+# on numbered pages and the events prefetch for `engine=orm`) and the ETag's validator page
+# query, which shares the page's count. Distance orderings add the `SET LOCAL statement_timeout`
+# statement.
+RIDE_LIST_BUDGETS = {
+    ("orm", "page"): 6,
+    ("orm", "cursor"): 4,
+    ("db", "page"): 5,
+    ("db", "cursor"): 3,
+}
+RIDE_ORDERINGS = ("id", "pickup_time", "-pickup_time", "distance", "-distance")
+RIDE_PAGINATIONS = ("page", "cursor", "cursor-next", "cursor-deep")
+# The keyset cursor's ordering key per `ordering` param, for cursors built from `deep_position`.
+RIDE_CURSOR_ORDERINGS = {"id": "id_ride", "pickup_time": "pickup_time", "-pickup_time": "-pickup_time"}
+RIDE_ENGINES = ("orm", "db")
+SPATIAL_FILTERS = ("radius_m", "bbox")
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    path: str
+    budget: int
+    body: dict | None = None
+    # Time the page the first response links to as `next` instead of the first page.
+    follow_next: bool = False
+    # For a page far down a keyset listing: that listing's first page, which it should not
+    # cost more than.
+    first_page: str | None = None
+
+
+def ride_list_scenarios(page_size, center, rider_email, deep_position):
+    lat, lon = center
+    filters = {
+        "none": {},
+        "status": {"status": "pickup"},
+        "rider_email": {"rider_email": rider_email},
+        "radius_m": {"radius_m": "3000"},
+        "bbox": {"bbox": f"{lat - 0.03},{lon - 0.03},{lat + 0.03},{lon + 0.03}"},
+    }
+    for filter_name, filter_params in filters.items():
+        for ordering in RIDE_ORDERINGS:
+            for pagination in RIDE_PAGINATIONS:
+                for engine in RIDE_ENGINES:
+                    # Deep pages are held to their first page's cost only where the cursor seeks.
+                    # Distance cursors do not: nearest-first walks the KNN index from the center
+                    # however deep the cursor is, and `-distance` sorts every match, so their
+                    # cost grows with depth (see the README). Spatial filters start from the
+                    # GiST index, so what they filter out depends on the area, not the depth.
+                    if pagination == "cursor-deep" and (
+                        ordering not in RIDE_CURSOR_ORDERINGS or filter_name in SPATIAL_FILTERS
+                    ):
+                        continue
+                    params = {**filter_params, "page_size": page_size, "engine": engine}
+                    if ordering != "id":
+                        params["ordering"] = ordering
+                    if "distance" in ordering or "radius_m" in filter_params:
+                        params.update(lat=lat, lon=lon)
+                    paging = "page" if pagination == "page" else "cursor"
+                    if paging == "cursor":
+                        params["pagination"] = "cursor"
+                    budget = RIDE_LIST_BUDGETS[(engine, paging)] + ("distance" in ordering)
+                    path = first_page = f"/api/rides/?{urlencode(params)}"
+                    if pagination == "cursor-deep":
+                        pickup_time, ride_id = deep_position
+                        value = ride_id if ordering == "id" else pickup_time
+                        cursor = encode_position(RIDE_CURSOR_ORDERINGS[ordering], value, ride_id)
+                        path = f"{first_page}&{urlencode({'cursor': cursor})}"
+                    yield Scenario(
+                        name=f"rides filter={filter_name} ordering={ordering} pagination={pagination} engine={engine}",
+                        method="GET",
+                        path=path,
+                        budget=budget,
+                        follow_next=pagination == "cursor-next",
+                        first_page=first_page if pagination == "cursor-deep" else None,
+                    )
+
+
+def scenarios(page_size, center, rider_email, ride_id, ride_event_id, deep_position):
+    yield from ride_list_scenarios(page_size, center, rider_email, deep_position)
+    # What a map client asks for: no users, events or distances, so no join and no prefetch.
+    map_params = {"page_size": page_size, "fields": "id_ride,status,pickup_latitude,pickup_longitude"}
+    yield Scenario(
+        "rides fields=map pagination=page",
+        "GET",
+        f"/api/rides/?{urlencode(map_params)}",
+        RIDE_LIST_BUDGETS[("orm", "page")] - 1,
+    )
+    yield Scenario(
+        "rides fields=map pagination=cursor",
+        "GET",
+        f"/api/rides/?{urlencode({**map_params, 'pagination': 'cursor'})}",
+        RIDE_LIST_BUDGETS[("orm", "cursor")] - 1,
+    )
+    yield Scenario("ride detail", "GET", f"/api/rides/{ride_id}/", 4)
+    yield Scenario("ride events page=1", "GET", f"/api/ride-events/?page_size={page_size}", 4)
+    yield Scenario("ride events page=2", "GET", f"/api/ride-events/?page_size={page_size}&page=2", 4)
+    yield Scenario("ride event detail", "GET", f"/api/ride-events/{ride_event_id}/", 3)
+    # The user lookup, then `auth_version` re-read after a possible password rehash.
+    yield Scenario(
+        "auth token",
+        "POST",
+        "/api/auth/token/",
+        2,
+        body={"email": BENCHMARK_EMAIL, "password": BENCHMARK_PASSWORD},
+    )
+
+
+def seed(rides, *, events_per_ride, drivers, riders):
+    """Replace the rides and events with a fresh `seed_data --bulk` dataset; returns seconds taken."""
+    with connection.cursor() as cursor:
+        cursor.execute("TRUNCATE rides_rideevent, rides_ride RESTART IDENTITY CASCADE")
+    started = time.perf_counter()
+    call_command(
+        "seed_data",
+        bulk=True,
+        force=True,
+        rides=rides,
+        events_per_ride=events_per_ride,
+        drivers=drivers,
+        riders=riders,
+        batch_size=min(rides, 10000),
+        stdout=io.StringIO(),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return time.perf_counter() - started
+
+
+def scenario_targets():
+    """The ride, event, position and rider the scenarios point at, picked from the seeded data."""
+    ride = Ride.objects.order_by("id_ride").first()
+    ride_event = RideEvent.objects.order_by("id_ride_event").first()
+    # The busiest rider, so the rider filter returns full pages where the data allows.
+    rider_email = (
+        Ride.objects.values_list("id_rider__email", flat=True)
+        .annotate(rides=Count("id_ride"))
+        .order_by("-rides")
+        .first()
+    )
+    # 90% of the way through the rides by pickup time, for the `cursor-deep` pages.
+    deep_ride = Ride.objects.order_by("pickup_time", "id_ride").values("pickup_time", "id_ride")[
+        Ride.objects.count() * 9 // 10
+    ]
+    return {
+        "center": (round(float(ride.pickup_latitude), 4), round(float(ride.pickup_longitude), 4)),
+        "rider_email": rider_email,
+        "ride_id": ride.pk,
+        "ride_event_id": ride_event.pk,
+        "deep_position": (deep_ride["pickup_time"], deep_ride["id_ride"]),
+    }
+
+
+def next_page_path(response):
+    """Path and query of the page a list response links to as `next`, or `None` on the last page."""
+    next_url = json.loads(response.content).get("next")
+    if next_url is None:
+        return None
+    parts = urlsplit(next_url)
+    return f"{parts.path}?{parts.query}"
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def git_revision():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API in-process at several dataset sizes: every ride list filter, ordering, "
+        "pagination and engine combination, ride events, detail and token endpoints. Asserts "
+        "per-request query budgets and records p50/p95 latency and rows/sec as JSON. Seeds a "
+        "separate test database with seed_data; the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="1000,10000",
+            help="Comma-separated ride counts to seed and benchmark, smallest first.",
+        )
+        parser.add_argument("--events-per-ride", type=int, default=4)
+        parser.add_argument("--drivers", type=int, default=50)
+        parser.add_argument("--riders", type=int, default=500)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per scenario.")
+        parser.add_argument("--only", help="Regular expression; run only scenarios whose name matches.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument(
+            "--compare",
+            help="Results JSON from an earlier run; report query count and p95 changes against it.",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="With --compare, fail when a scenario's p95 grew by more than this many percent.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database between runs (it is reseeded per scale either way).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted({int(value) for value in options["scales"].split(",") if value.strip()})
+        except ValueError as exc:
+            raise CommandError("--scales must be comma-separated integers.") from exc
+        if not scales or scales[0] <= 0:
+            raise CommandError("--scales must be positive.")
+        if options["iterations"] <= 0:
+            raise CommandError("--iterations must be positive.")
+        only = re.compile(options["only"]) if options["only"] else None
+        previous = self.load_results(options["compare"]) if options["compare"] else None
+
+        results = {
+            "revision": git_revision(),
+            "started_at": datetime.now(dt_timezone.utc).isoformat(),
+            "iterations": options["iterations"],
+            "page_size": options["page_size"],
+            "events_per_ride": options["events_per_ride"],
+            "scales": [],
+        }
+        failures = []
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options["keepdb"])
+        request_logger = logging.getLogger("ride_info.requests")
+        request_log_level = request_logger.level
+        try:
+            # Measure the queries every request could cost, not cache hits; keep the
+            # per-request metrics log out of the report. Replicas would not see the test database.
+            request_logger.setLevel(logging.ERROR)
+            with override_settings(
+                RIDE_RESPONSE_CACHE_TTL=0,
+                PAGINATION_COUNT_CACHE_TTL=0,
+                JWT_AUTH_VERSION_CACHE_TTL=0,
+                DATABASE_REPLICAS=[],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                for rides in scales:
+                    seconds = seed(
+                        rides,
+                        events_per_ride=options["events_per_ride"],
+                        drivers=options["drivers"],
+                        riders=options["riders"],
+                    )
+                    self.stdout.write(f"Seeded {rides} rides in {seconds:.1f}s")
+                    scale = self.run_scale(rides, options, only)
+                    results["scales"].append(scale)
+                    failures += [f"{rides} rides: {failure}" for failure in scale["failures"]]
+        finally:
+            request_logger.setLevel(request_log_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        if previous is not None:
+            failures += self.compare(previous, results, options["max_regression"])
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if failures:
+            raise CommandError("Benchmark failed:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All query budgets met."))
+
+    def run_scale(self, rides, options, only):
+        admin, _ = User.objects.update_or_create(
+            email=BENCHMARK_EMAIL, defaults={"role": User.ROLE_ADMIN, "is_active": True}
+        )
+        admin.set_password(BENCHMARK_PASSWORD)
+        admin.save(update_fields=["password"])
+        # The password change bumped `auth_version` in the database; tokens must carry it.
+        admin.refresh_from_db(fields=["auth_version"])
+
+        targets = scenario_targets()
+
+        scale = {
+            "rides": rides,
+            "ride_events": RideEvent.objects.count(),
+            "scenarios": [],
+            "failures": [],
+        }
+        for scenario in scenarios(options["page_size"], **targets):
+            if only is not None and not only.search(scenario.name):
+                continue
+            outcome = self.run_scenario(scenario, admin, options)
+            if outcome is None:
+                self.stdout.write(f"{rides:>9} {scenario.name:<78} skipped: the first page is the only one")
+                continue
+            scale["scenarios"].append(outcome)
+            scale["failures"] += outcome["failures"]
+            self.stdout.write(
+                f"{rides:>9} {scenario.name:<78} queries={outcome['queries']}/{scenario.budget} "
+                f"p50={outcome['p50_ms']:8.2f}ms p95={outcome['p95_ms']:8.2f}ms "
+                f"rows/s={outcome['rows_per_sec']:10.1f}"
+            )
+        return scale
+
+    def run_scenario(self, scenario, admin, options):
+        token = AdminTokenObtainPairSerializer.get_token(admin).access_token
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        def send(path):
+            if scenario.method == "POST":
+                return client.post(path, scenario.body, content_type="application/json")
+            return client.get(path)
+
+        path = scenario.path
+        if scenario.follow_next:
+            path = next_page_path(send(path))
+            if path is None:
+                return None
+
+        for _ in range(options["warmup"]):
+            send(path)
+
+        failures = []
+        latencies = []
+        query_counts = set()
+        statuses = set()
+        response = None
+        for _ in range(options["iterations"]):
+            started = time.perf_counter()
+            response = send(path)
+            latencies.append(time.perf_counter() - started)
+            query_counts.add(int(response["X-Query-Count"]))
+            statuses.add(response.status_code)
+
+        body = json.loads(response.content) if response.content else {}
+        rows = len(body["results"]) if isinstance(body, dict) and "results" in body else 1
+        queries = max(query_counts)
+        if statuses != {200}:
+            failures.append(f"{scenario.name}: status {sorted(statuses)}")
+        if queries > scenario.budget:
+            failures.append(f"{scenario.name}: {queries} queries, budget {scenario.budget}")
+        if len(query_counts) > 1:
+            failures.append(f"{scenario.name}: query count varies between requests {sorted(query_counts)}")
+
+        latencies.sort()
+        total = sum(latencies)
+        return {
+            "name": scenario.name,
+            "path": path,
+            "status": sorted(statuses),
+            "queries": queries,
+            "budget": scenario.budget,
+            "rows": rows,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "rows_per_sec": rows * len(latencies) / total if total else 0.0,
+            "failures": failures,
+        }
+
+    def load_results(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read --compare results: {exc}") from exc
+
+    def compare(self, previous, results, max_regression):
+        before = {
+            (scale["rides"], scenario["name"]): scenario
+            for scale in previous["scales"]
+            for scenario in scale["scenarios"]
+        }
+        self.stdout.write(f"Compared with {previous.get('revision') or 'previous run'}:")
+        failures = []
+        for scale in results["scales"]:
+            for scenario in scale["scenarios"]:
+                old = before.get((scale["rides"], scenario["name"]))
+                if old is None:
+                    continue
+                label = f"{scale['rides']} rides: {scenario['name']}"
+                if scenario["queries"] != old["queries"]:
+                    self.stdout.write(f"  {label}: queries {old['queries']} -> {scenario['queries']}")
+                    if scenario["queries"] > old["queries"]:
+                        failures.append(f"{label}: queries {old['queries']} -> {scenario['queries']}")
+                change = (scenario["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+                if abs(change) >= 10:
+                    self.stdout.write(
+                        f"  {label}: p95 {old['p95_ms']:.2f}ms -> {scenario['p95_ms']:.2f}ms ({change:+.0f}%)"
+                    )
+                if max_regression is not None and change > max_regression:
+                    failures.append(f"{label}: p95 {change:+.0f}% (limit {max_regression:+.0f}%)")
+        return failures
@@ -0,0 +1,117 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+from api.serializers import RideListSerializer
+from rides.models import Ride, RideEvent, User
+
+
+class StockRideListSerializer(RideListSerializer):
+    """`RideListSerializer` with DRF's own field-by-field `to_representation`."""
+
+    to_representation = serializers.ModelSerializer.to_representation
+
+
+def build_page(rng, page_size, events_per_ride, now):
+    users = [
+        User(
+            id_user=i + 1,
+            role=rng.choice([User.ROLE_ADMIN, User.ROLE_USER]),
+            first_name="User",
+            last_name=f"user{i + 1}",
+            email=f"user{i + 1}@example.com",
+            phone_number="+63 900 000 0000",
+        )
+        for i in range(20)
+    ]
+
+    rides = []
+    for i in range(page_size):
+        ride = Ride(
+            id_ride=i + 1,
+            status=rng.choice(["en-route", "pickup", "dropoff"]),
+            id_rider=rng.choice(users),
+            id_driver=rng.choice(users),
+            pickup_latitude=14.5995 + rng.uniform(-0.03, 0.03),
+            pickup_longitude=120.9842 + rng.uniform(-0.03, 0.03),
+            dropoff_latitude=14.5995 + rng.uniform(-0.06, 0.06),
+            dropoff_longitude=120.9842 + rng.uniform(-0.06, 0.06),
+            pickup_time=now - timedelta(hours=rng.uniform(0, 72)),
+            picked_up_at=now - timedelta(hours=rng.uniform(0, 24)),
+            last_event_at=now - timedelta(hours=rng.uniform(0, 1)),
+        )
+        ride.distance_to_pickup_meters = rng.uniform(0, 5000) if i % 2 else None
+        ride.todays_ride_events = [
+            RideEvent(
+                id_ride_event=i * events_per_ride + j + 1,
+                id_ride_id=ride.id_ride,
+                description="Status changed to pickup",
+                kind=RideEvent.KIND_PICKUP,
+                created_at=now - timedelta(hours=rng.uniform(0, 24)),
+            )
+            for j in range(events_per_ride)
+        ]
+        rides.append(ride)
+    return rides
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-page Ride list serialization time between DRF's field-by-field path "
+        "and the compiled fast path, asserting byte-identical JSON. Needs no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--events-per-ride", type=int, default=2)
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1337)
+
+    def handle(self, *args, **options):
+        page_size = int(options["page_size"])
+        iterations = int(options["iterations"])
+        if page_size <= 0 or iterations <= 0:
+            raise CommandError("--page-size and --iterations must be positive.")
+
+        page = build_page(
+            random.Random(int(options["seed"])),
+            page_size,
+            int(options["events_per_ride"]),
+            timezone.now(),
+        )
+
+        stock = self.render(StockRideListSerializer, JSONRenderer, page)
+        fast = self.render(RideListSerializer, FastJSONRenderer, page)
+        if stock != fast:
+            raise CommandError("Fast path output differs from the DRF output.")
+        self.stdout.write(f"Output identical: {len(fast)} bytes for {page_size} rides.")
+
+        results = {}
+        for label, serializer_class, renderer_class in (
+            ("drf", StockRideListSerializer, JSONRenderer),
+            ("fast serializer", RideListSerializer, JSONRenderer),
+            ("fast serializer + orjson", RideListSerializer, FastJSONRenderer),
+        ):
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                self.render(serializer_class, renderer_class, page)
+                timings.append((time.perf_counter() - started) * 1000)
+            results[label] = statistics.median(timings)
+
+        baseline = results["drf"]
+        for label, median_ms in results.items():
+            self.stdout.write(
+                f"{label:<26} median={median_ms:8.3f} ms/page  speedup={baseline / median_ms:5.1f}x"
+            )
+
+    def render(self, serializer_class, renderer_class, page):
+        data = {"count": len(page), "next": None, "previous": None, "results": serializer_class(page, many=True).data}
+        return renderer_class().render(data)
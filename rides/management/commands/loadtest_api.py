@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns `(status, keep_alive)`. The body is discarded."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return status, False
+
+    return status, headers.get("connection", "").lower() != "close"
+
+
+class Target:
+    def __init__(self, url, token, cache_bust):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise CommandError(f"Only plain http:// URLs are supported: {url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path + (f"?{parts.query}" if parts.query else "")
+        self.token = token
+        self.cache_bust = cache_bust
+
+    def request_bytes(self, number):
+        path = self.path
+        if self.cache_bust:
+            path += ("&" if "?" in path else "?") + f"_loadtest={number}"
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Accept: application/json",
+        ]
+        if self.token:
+            lines.append(f"Authorization: Bearer {self.token}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def run_target(target, *, total, concurrency, timeout):
+    numbers = itertools.count()
+    latencies = []
+    statuses = Counter()
+    in_flight = 0
+    peak_in_flight = 0
+
+    async def worker():
+        nonlocal in_flight, peak_in_flight
+        reader = writer = None
+        while (number := next(numbers)) < total:
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(target.host, target.port)
+                writer.write(target.request_bytes(number))
+                await writer.drain()
+                status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+                statuses[type(exc).__name__] += 1
+                keep_alive = False
+            else:
+                statuses[status] += 1
+                latencies.append(time.perf_counter() - started)
+            finally:
+                in_flight -= 1
+            if not keep_alive and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 400)
+    return {
+        "url": target.url,
+        "requests": total,
+        "ok": ok,
+        "errors": total - ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "elapsed_s": elapsed,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "peak_in_flight": peak_in_flight,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test one or more API URLs with many concurrent keep-alive connections and compare "
+        "throughput and latency, e.g. the WSGI `web` service against the ASGI `asgi` service."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            action="append",
+            required=True,
+            help="Full http:// URL to GET; repeat to compare several endpoints or deployments.",
+        )
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per URL.")
+        parser.add_argument("--concurrency", type=int, default=100, help="Concurrent connections per URL.")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each response.")
+        parser.add_argument("--token", help="JWT access token sent as `Authorization: Bearer`.")
+        parser.add_argument("--email", help="Obtain a token from the first URL's /api/auth/token/ instead.")
+        parser.add_argument("--password")
+        parser.add_argument(
+            "--cache-bust",
+            action="store_true",
+            help="Add a unique query parameter to every request so response caches never answer.",
+        )
+
+    def handle(self, *args, **options):
+        total = int(options["requests"])
+        concurrency = int(options["concurrency"])
+        if total <= 0 or concurrency <= 0:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        token = options["token"]
+        if token is None and options["email"]:
+            token = self.obtain_token(options["url"][0], options["email"], options["password"] or "")
+
+        results = []
+        for url in options["url"]:
+            target = Target(url, token, options["cache_bust"])
+            result = asyncio.run(
+                run_target(target, total=total, concurrency=min(concurrency, total), timeout=options["timeout"])
+            )
+            results.append(result)
+            self.stdout.write(
+                f"{url}\n"
+                f"  requests={result['requests']} ok={result['ok']} errors={result['errors']} "
+                f"statuses={result['statuses']} peak_in_flight={result['peak_in_flight']}\n"
+                f"  rps={result['rps']:.1f} p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+                f"p99={result['p99_ms']:.1f}ms mean={result['mean_ms']:.1f}ms"
+            )
+
+        if len(results) > 1:
+            baseline = results[0]
+            self.stdout.write(self.style.SUCCESS("Relative to the first URL:"))
+            for result in results[1:]:
+                throughput = result["rps"] / baseline["rps"] if baseline["rps"] else 0.0
+                self.stdout.write(
+                    f"  {result['url']}: throughput x{throughput:.2f}, "
+                    f"p95 {result['p95_ms']:.1f}ms vs {baseline['p95_ms']:.1f}ms"
+                )
+
+    def obtain_token(self, url, email, password):
+        parts = urlsplit(url)
+        request = Request(
+            f"{parts.scheme}://{parts.netloc}/api/auth/token/",
+            data=json.dumps({"email": email, "password": password}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urlopen(request, timeout=10) as response:
+                return json.load(response)["access"]
+        except OSError as exc:
+            raise CommandError(f"Could not obtain a token: {exc}") from exc
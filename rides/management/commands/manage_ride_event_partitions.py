@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from rides.cache import EVENTS, bump_data_version
+
+PARTITION_NAME_RE = re.compile(r"^rides_rideevent_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def add_months(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + (month_start.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the monthly RideEvent partitions: create upcoming months ahead of time and "
+        "detach (or drop) months older than the retention window. Safe to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Create partitions for the current month and this many months after it.",
+        )
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            default=None,
+            help="Detach partitions that end before the start of this many months ago. Omit to keep everything.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop expired partitions instead of leaving them detached for archiving.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        months_ahead = int(options["months_ahead"])
+        retain_months = options["retain_months"]
+        drop = bool(options["drop"])
+        dry_run = bool(options["dry_run"])
+
+        if months_ahead < 0:
+            raise CommandError("--months-ahead must be zero or positive.")
+        if retain_months is not None and retain_months < 1:
+            raise CommandError("--retain-months must be at least 1.")
+
+        today = timezone.now().date()
+        current_month = date(today.year, today.month, 1)
+
+        existing = self.existing_partitions()
+        created = []
+        for offset in range(months_ahead + 1):
+            month_start = add_months(current_month, offset)
+            name = f"rides_rideevent_p{month_start:%Y%m}"
+            if name in existing:
+                continue
+            created.append(name)
+            if not dry_run:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT rides_rideevent_ensure_partition(%s)", [month_start])
+
+        expired = []
+        if retain_months is not None:
+            cutoff = add_months(current_month, -retain_months)
+            for name, month_start in sorted(existing.items()):
+                if add_months(month_start, 1) <= cutoff:
+                    expired.append(name)
+                    if not dry_run:
+                        self.expire_partition(name, drop=drop)
+
+        prefix = "[dry-run] " if dry_run else ""
+        action = "dropped" if drop else "detached"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}Partitions created={created or '-'} {action}={expired or '-'}"
+            )
+        )
+
+    def existing_partitions(self) -> dict[str, date]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'rides_rideevent'::regclass
+                """
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = {}
+        for name in names:
+            match = PARTITION_NAME_RE.match(name)
+            if match:
+                partitions[name] = date(int(match["year"]), int(match["month"]), 1)
+        return partitions
+
+    @transaction.atomic
+    def expire_partition(self, name: str, *, drop: bool) -> None:
+        quoted = connection.ops.quote_name(name)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE rides_rideevent DETACH PARTITION {quoted}")
+            if drop:
+                cursor.execute(f"DROP TABLE {quoted}")
+        # Detached events disappear from the API without any model signal.
+        bump_data_version(EVENTS)
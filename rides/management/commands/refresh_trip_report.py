@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rides.reports import DEFAULT_OVERLAP, refresh_trip_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the pre-aggregated trips-over-1-hour report, recomputing only the months "
+        "touched by ride events added since the last run. Safe to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild every month from the whole event history (after deletes or edits to old events).",
+        )
+        parser.add_argument(
+            "--overlap",
+            type=int,
+            default=DEFAULT_OVERLAP,
+            help="Re-read this many event ids below the watermark to catch events committed out of id order.",
+        )
+
+    def handle(self, *args, **options):
+        overlap = int(options["overlap"])
+        if overlap < 0:
+            raise CommandError("--overlap must be zero or positive.")
+
+        started = time.monotonic()
+        result = refresh_trip_report(full=bool(options["full"]), overlap=overlap)
+        elapsed = time.monotonic() - started
+
+        months = ", ".join(f"{month:%Y-%m}" for month in result.months) or "-"
+        mode = "full" if result.full else "incremental"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Trip report refreshed ({mode}): events=({result.since}, {result.until}] "
+                f"months={months} rows={result.rows} elapsed={elapsed:.2f}s"
+            )
+        )
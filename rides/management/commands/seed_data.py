@@ -1,15 +1,164 @@
 from __future__ import annotations
 
+import multiprocessing
 import random
+import time
 from datetime import timedelta
 
 from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
 from django.utils import timezone
 
+from rides.cache import bump_data_version
 from rides.models import Ride, RideEvent
 
+STATUSES = ["en-route", "pickup", "dropoff"]
+EXTRA_EVENT_DESCRIPTIONS = [
+    "Status changed to en-route",
+    "Status changed to pickup",
+    "Status changed to dropoff",
+    "Driver arrived",
+    "Rider picked up",
+    "Rider dropped off",
+]
+RIDE_COLUMNS = (
+    "id_ride",
+    "status",
+    "id_rider",
+    "id_driver",
+    "pickup_latitude",
+    "pickup_longitude",
+    "dropoff_latitude",
+    "dropoff_longitude",
+    "pickup_time",
+)
+
+
+def build_ride(rng, i, *, now, center_lat, center_lon, riders, drivers, events_per_ride):
+    """Return `(ride_fields, [(description, created_at), ...])` for the i-th sample ride."""
+    pickup_lat = center_lat + rng.uniform(-0.03, 0.03)
+    pickup_lon = center_lon + rng.uniform(-0.03, 0.03)
+    dropoff_lat = center_lat + rng.uniform(-0.06, 0.06)
+    dropoff_lon = center_lon + rng.uniform(-0.06, 0.06)
+
+    pickup_time = now - timedelta(hours=rng.uniform(0, 72))
+    if i == 0:
+        pickup_time = now - timedelta(hours=6)
+    status = rng.choice(STATUSES)
+
+    ride = {
+        "status": status,
+        "id_rider": rng.choice(riders),
+        "id_driver": rng.choice(drivers),
+        "pickup_latitude": pickup_lat,
+        "pickup_longitude": pickup_lon,
+        "dropoff_latitude": dropoff_lat,
+        "dropoff_longitude": dropoff_lon,
+        "pickup_time": pickup_time,
+    }
+
+    events = []
+    # Ensure at least one event within last 24 hours to exercise `todays_ride_events`.
+    if i == 0:
+        pickup_event_at = pickup_time + timedelta(minutes=1)
+        dropoff_event_at = pickup_time + timedelta(hours=2, minutes=5)
+
+        if pickup_event_at > now:
+            pickup_event_at = now - timedelta(minutes=10)
+        if dropoff_event_at > now:
+            dropoff_event_at = now - timedelta(minutes=1)
+
+        events.append(("Status changed to pickup", pickup_event_at))
+        events.append(("Status changed to dropoff", dropoff_event_at))
+    else:
+        events.append(("Status changed to pickup", now - timedelta(hours=rng.uniform(0.1, 20))))
+
+    for _ in range(max(events_per_ride - 1, 0)):
+        created_at = now - timedelta(hours=rng.uniform(0, 120))
+        events.append((rng.choice(EXTRA_EVENT_DESCRIPTIONS), created_at))
+
+    return ride, events
+
+
+def seed_batch(job):
+    """
+    Generate and write one batch of rides + events in its own transaction.
+
+    Each batch draws from `Random(f"{seed}:{batch_index}")`, so the generated data depends
+    only on `--seed` and `--batch-size`, not on the number of workers or their scheduling.
+    """
+    batch_index = job["batch_index"]
+    first = job["first"]
+    count = job["count"]
+    rng = random.Random(f"{job['seed']}:{batch_index}")
+
+    built = [
+        build_ride(
+            rng,
+            first + offset,
+            now=job["now"],
+            center_lat=job["center_lat"],
+            center_lon=job["center_lon"],
+            riders=job["riders"],
+            drivers=job["drivers"],
+            events_per_ride=job["events_per_ride"],
+        )
+        for offset in range(count)
+    ]
+
+    with transaction.atomic():
+        if job["method"] == "copy":
+            events_written = copy_batch(built)
+        else:
+            events_written = bulk_create_batch(built)
+
+    return count, events_written
+
+
+def copy_batch(built):
+    with connection.cursor() as cursor:
+        # Reserve ride ids up front so events can reference them inside the same COPY stream.
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence('rides_ride', 'id_ride')) FROM generate_series(1, %s)",
+            [len(built)],
+        )
+        ride_ids = [row[0] for row in cursor.fetchall()]
+
+        with cursor.copy(f"COPY rides_ride ({', '.join(RIDE_COLUMNS)}) FROM STDIN") as copy:
+            for ride_id, (ride, _events) in zip(ride_ids, built):
+                copy.write_row((ride_id, *(ride[column] for column in RIDE_COLUMNS[1:])))
+
+        events_written = 0
+        with cursor.copy("COPY rides_rideevent (id_ride, description, created_at) FROM STDIN") as copy:
+            for ride_id, (_ride, events) in zip(ride_ids, built):
+                for description, created_at in events:
+                    copy.write_row((ride_id, description, created_at))
+                    events_written += 1
+
+    return events_written
+
+
+def bulk_create_batch(built):
+    rides = Ride.objects.bulk_create(
+        [
+            Ride(
+                **{key: value for key, value in ride.items() if key not in {"id_rider", "id_driver"}},
+                id_rider_id=ride["id_rider"],
+                id_driver_id=ride["id_driver"],
+            )
+            for ride, _events in built
+        ]
+    )
+    events = [
+        RideEvent(id_ride_id=ride.id_ride, description=description, created_at=created_at)
+        for ride, (_ride, ride_events) in zip(rides, built)
+        for description, created_at in ride_events
+    ]
+    RideEvent.objects.bulk_create(events)
+    return len(events)
+
 
 class Command(BaseCommand):
     help = "Seed the local database with sample Users, Rides, and RideEvents."
@@ -27,8 +176,25 @@ class Command(BaseCommand):
             action="store_true",
             help="Create additional sample data even if rides already exist.",
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="High-volume mode: write rides/events in batches, committing after each batch.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rides per batch in --bulk mode.")
+        parser.add_argument(
+            "--method",
+            choices=["copy", "bulk_create"],
+            default="copy",
+            help="How --bulk mode writes rows: Postgres COPY (fastest) or Django bulk_create.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Parallel worker processes for --bulk mode, each with its own database connection.",
+        )
 
-    @transaction.atomic
     def handle(self, *args, **options):
         ride_count = int(options["rides"])
         events_per_ride = int(options["events_per_ride"])
@@ -51,115 +217,46 @@ class Command(BaseCommand):
             )
             return
 
-        rng = random.Random(seed)
-        User = get_user_model()
+        # Every seeded user shares the same password: hash it once, not once per user.
+        password_hash = make_password("password")
+
+        with transaction.atomic():
+            drivers = self.ensure_users("driver", drivers_count, password_hash)
+            riders = self.ensure_users("rider", riders_count, password_hash)
 
-        def make_email(prefix: str, i: int) -> str:
-            return f"{prefix}{i}@example.com"
-
-        def ensure_user(email: str, role: str) -> object:
-            user, created = User.objects.get_or_create(
-                email=email,
-                defaults={
-                    "role": role,
-                    "first_name": prefix_title(role),
-                    "last_name": str(email.split("@")[0]),
-                    "is_staff": role == "admin",
-                },
+        if options["bulk"]:
+            self.seed_bulk(
+                options,
+                ride_count=ride_count,
+                riders=[user.id_user for user in riders],
+                drivers=[user.id_user for user in drivers],
             )
-            if created:
-                user.set_password("password")
-                user.save(update_fields=["password"])
-            return user
-
-        def prefix_title(role: str) -> str:
-            if role == "admin":
-                return "Admin"
-            if role == "user":
-                return "User"
-            return "Person"
-
-        drivers = [ensure_user(make_email("driver", i + 1), "user") for i in range(drivers_count)]
-        riders = [ensure_user(make_email("rider", i + 1), "user") for i in range(riders_count)]
-
-        statuses = ["en-route", "pickup", "dropoff"]
+            return
+
+        rng = random.Random(seed)
         now = timezone.now()
 
         created_rides = []
         created_events = 0
 
-        for i in range(ride_count):
-            pickup_lat = center_lat + rng.uniform(-0.03, 0.03)
-            pickup_lon = center_lon + rng.uniform(-0.03, 0.03)
-            dropoff_lat = center_lat + rng.uniform(-0.06, 0.06)
-            dropoff_lon = center_lon + rng.uniform(-0.06, 0.06)
-
-            pickup_time = now - timedelta(hours=rng.uniform(0, 72))
-            if i == 0:
-                pickup_time = now - timedelta(hours=6)
-            status = rng.choice(statuses)
-
-            ride = Ride.objects.create(
-                status=status,
-                id_rider=rng.choice(riders),
-                id_driver=rng.choice(drivers),
-                pickup_latitude=pickup_lat,
-                pickup_longitude=pickup_lon,
-                dropoff_latitude=dropoff_lat,
-                dropoff_longitude=dropoff_lon,
-                pickup_time=pickup_time,
-            )
-            created_rides.append(ride)
-
-            # Ensure at least one event within last 24 hours to exercise `todays_ride_events`.
-            if i == 0:
-                pickup_event_at = pickup_time + timedelta(minutes=1)
-                dropoff_event_at = pickup_time + timedelta(hours=2, minutes=5)
-
-                if pickup_event_at > now:
-                    pickup_event_at = now - timedelta(minutes=10)
-                if dropoff_event_at > now:
-                    dropoff_event_at = now - timedelta(minutes=1)
-
-                RideEvent.objects.create(
-                    id_ride=ride,
-                    description="Status changed to pickup",
-                    created_at=pickup_event_at,
+        with transaction.atomic():
+            for i in range(ride_count):
+                ride_fields, events = build_ride(
+                    rng,
+                    i,
+                    now=now,
+                    center_lat=center_lat,
+                    center_lon=center_lon,
+                    riders=riders,
+                    drivers=drivers,
+                    events_per_ride=events_per_ride,
                 )
-                created_events += 1
+                ride = Ride.objects.create(**ride_fields)
+                created_rides.append(ride)
 
-                RideEvent.objects.create(
-                    id_ride=ride,
-                    description="Status changed to dropoff",
-                    created_at=dropoff_event_at,
-                )
-                created_events += 1
-            else:
-                RideEvent.objects.create(
-                    id_ride=ride,
-                    description="Status changed to pickup",
-                    created_at=now - timedelta(hours=rng.uniform(0.1, 20)),
-                )
-                created_events += 1
-
-            for _ in range(max(events_per_ride - 1, 0)):
-                age_hours = rng.uniform(0, 120)
-                created_at = now - timedelta(hours=age_hours)
-                RideEvent.objects.create(
-                    id_ride=ride,
-                    description=rng.choice(
-                        [
-                            "Status changed to en-route",
-                            "Status changed to pickup",
-                            "Status changed to dropoff",
-                            "Driver arrived",
-                            "Rider picked up",
-                            "Rider dropped off",
-                        ]
-                    ),
-                    created_at=created_at,
-                )
-                created_events += 1
+                for description, created_at in events:
+                    RideEvent.objects.create(id_ride=ride, description=description, created_at=created_at)
+                    created_events += 1
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -167,3 +264,94 @@ class Command(BaseCommand):
                 f"drivers={len(drivers)} riders={len(riders)}"
             )
         )
+
+    def ensure_users(self, prefix: str, count: int, password_hash: str) -> list:
+        User = get_user_model()
+        emails = [f"{prefix}{i + 1}@example.com" for i in range(count)]
+        User.objects.bulk_create(
+            [
+                User(
+                    email=email,
+                    password=password_hash,
+                    role=User.ROLE_USER,
+                    first_name="User",
+                    last_name=email.split("@")[0],
+                )
+                for email in emails
+            ],
+            ignore_conflicts=True,
+        )
+        users_by_email = User.objects.in_bulk(emails, field_name="email")
+        return [users_by_email[email] for email in emails]
+
+    def seed_bulk(self, options, *, ride_count, riders, drivers):
+        batch_size = int(options["batch_size"])
+        workers = int(options["workers"])
+        method = options["method"]
+
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+        if workers <= 0:
+            raise CommandError("--workers must be positive.")
+
+        now = timezone.now()
+        self.ensure_event_partitions(now - timedelta(hours=120), now)
+
+        jobs = [
+            {
+                "batch_index": batch_index,
+                "first": first,
+                "count": min(batch_size, ride_count - first),
+                "seed": int(options["seed"]),
+                "now": now,
+                "center_lat": float(options["center_lat"]),
+                "center_lon": float(options["center_lon"]),
+                "riders": riders,
+                "drivers": drivers,
+                "events_per_ride": int(options["events_per_ride"]),
+                "method": method,
+            }
+            for batch_index, first in enumerate(range(0, ride_count, batch_size))
+        ]
+
+        started = time.monotonic()
+        rides_written = 0
+        events_written = 0
+
+        def report(result):
+            nonlocal rides_written, events_written
+            rides_written += result[0]
+            events_written += result[1]
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f"rides={rides_written}/{ride_count} ride_events={events_written} "
+                f"elapsed={elapsed:.1f}s rows/sec={(rides_written + events_written) / elapsed:,.0f}"
+            )
+
+        if workers == 1:
+            for job in jobs:
+                report(seed_batch(job))
+        else:
+            # Forked workers must not share the parent's socket; each opens its own connection.
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                for result in pool.imap_unordered(seed_batch, jobs):
+                    report(result)
+
+        # COPY and bulk_create send no model signals.
+        bump_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seed complete: rides={rides_written} ride_events={events_written} "
+                f"drivers={len(drivers)} riders={len(riders)} method={method} workers={workers}"
+            )
+        )
+
+    def ensure_event_partitions(self, oldest, newest):
+        """Create the monthly RideEvent partitions up front so bulk rows skip the default partition."""
+        month = oldest.date().replace(day=1)
+        with connection.cursor() as cursor:
+            while month <= newest.date():
+                cursor.execute("SELECT rides_rideevent_ensure_partition(%s)", [month])
+                month = (month + timedelta(days=32)).replace(day=1)
@@ -0,0 +1,255 @@
+import json
+import logging
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from api.auth import AdminTokenObtainPairSerializer
+from ride_info.instrumentation import fingerprint
+from rides.management.commands.benchmark_api import (
+    BENCHMARK_EMAIL,
+    next_page_path,
+    scenario_targets,
+    scenarios,
+    seed,
+)
+from rides.models import User
+
+# Sequential scans the API accepts by design: patterns for the scenario name, the relation and
+# the statement, and why.
+EXPECTED_SEQ_SCANS = (
+    (
+        re.compile(r"filter=(none|status) ordering=-distance "),
+        re.compile(r"rides_ride|rides_user"),
+        re.compile(r""),
+        "farthest-first has no index order, so every candidate ride (and for engine=orm its rider) "
+        "is read and sorted; RIDE_DISTANCE_STATEMENT_TIMEOUT_MS caps it",
+    ),
+    (
+        re.compile(r""),
+        re.compile(r".*"),
+        re.compile(r'^SELECT COUNT\(\*\) AS "__count" FROM "\w+"$'),
+        "exact count of a whole table, only run below PAGINATION_COUNT_ESTIMATE_THRESHOLD",
+    ),
+)
+
+
+def expected_seq_scan(scenario_name, relation, sql):
+    for scenario_pattern, relation_pattern, sql_pattern, reason in EXPECTED_SEQ_SCANS:
+        if (
+            scenario_pattern.search(scenario_name)
+            and relation_pattern.fullmatch(relation)
+            and sql_pattern.search(sql)
+        ):
+            return reason
+    return None
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def rows_removed(plan):
+    """
+    Rows the plan's index scans read and then discarded with a `Filter`, in total. Sequential
+    scans discard rows too, but those already fail (or are expected) on their own.
+    """
+    return sum(
+        node.get("Rows Removed by Filter", 0) for node in plan_nodes(plan) if node["Node Type"] != "Seq Scan"
+    )
+
+
+def relation_sizes():
+    """Estimated rows per table and partition, from the statistics `ANALYZE` left behind."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+        return {name: int(rows) for name, rows in cursor.fetchall()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN (ANALYZE, BUFFERS) on every statement the ride list (each filter, ordering, "
+        "pagination and engine), ride detail and ride event endpoints execute, and fail when a "
+        "plan reads a large table or partition with a sequential scan, or when a page deep into "
+        "a keyset listing filters out more rows than its first page. Seeds a separate test "
+        "database with seed_data unless --existing is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rides", type=int, default=100000, help="Rides to seed.")
+        parser.add_argument("--events-per-ride", type=int, default=4)
+        parser.add_argument("--drivers", type=int, default=50)
+        parser.add_argument(
+            "--riders",
+            type=int,
+            default=20000,
+            help="Riders to seed; enough that the users table is itself worth indexing.",
+        )
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=10000,
+            help="Sequential scans only fail on tables/partitions estimated at this many rows or more.",
+        )
+        parser.add_argument(
+            "--max-filtered-rows",
+            type=int,
+            default=1000,
+            help="Rows a deep keyset page may filter out beyond what its listing's first page does.",
+        )
+        parser.add_argument("--only", help="Regular expression; check only scenarios whose name matches.")
+        parser.add_argument("--show-plans", action="store_true", help="Print the plan of each failing statement.")
+        parser.add_argument(
+            "--existing",
+            action="store_true",
+            help="Check against the configured database and its data instead of a seeded test database.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database between runs (it is reseeded either way).",
+        )
+
+    def handle(self, *args, **options):
+        only = re.compile(options["only"]) if options["only"] else None
+
+        if options["existing"]:
+            failures = self.verify(options, only)
+        else:
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False, keepdb=options["keepdb"]
+            )
+            try:
+                seconds = seed(
+                    options["rides"],
+                    events_per_ride=options["events_per_ride"],
+                    drivers=options["drivers"],
+                    riders=options["riders"],
+                )
+                # A fresh visibility map, as autovacuum would leave it, so index-only scans count.
+                with connection.cursor() as cursor:
+                    cursor.execute("VACUUM ANALYZE")
+                self.stdout.write(f"Seeded {options['rides']} rides in {seconds:.1f}s")
+                failures = self.verify(options, only)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        if failures:
+            raise CommandError("Query plan checks failed:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("No sequential scans on large relations; deep pages seek."))
+
+    def verify(self, options, only):
+        request_logger = logging.getLogger("ride_info.requests")
+        request_log_level = request_logger.level
+        admin, _ = User.objects.update_or_create(
+            email=BENCHMARK_EMAIL, defaults={"role": User.ROLE_ADMIN, "is_active": True}
+        )
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {AdminTokenObtainPairSerializer.get_token(admin).access_token}")
+        sizes = relation_sizes()
+
+        failures = []
+        try:
+            request_logger.setLevel(logging.ERROR)
+            # Plans for what every request can run, not for cache hits, all on the connection
+            # the statements are captured and explained on.
+            with override_settings(
+                RIDE_RESPONSE_CACHE_TTL=0,
+                PAGINATION_COUNT_CACHE_TTL=0,
+                JWT_AUTH_VERSION_CACHE_TTL=0,
+                DATABASE_REPLICAS=[],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                for scenario in scenarios(options["page_size"], **scenario_targets()):
+                    if scenario.method != "GET" or (only is not None and not only.search(scenario.name)):
+                        continue
+                    failures += self.check_scenario(client, scenario, sizes, options)
+        finally:
+            request_logger.setLevel(request_log_level)
+        return failures
+
+    def check_scenario(self, client, scenario, sizes, options):
+        path = scenario.path
+        if scenario.follow_next:
+            path = next_page_path(client.get(path))
+            if path is None:
+                self.stdout.write(f"skip {scenario.name}: the first page is the only one")
+                return []
+
+        status_code, explained = self.explain_request(client, path)
+        if status_code != 200:
+            return [f"{scenario.name}: status {status_code}"]
+
+        failures = []
+        expected = set()
+        statements = milliseconds = hit = read = removed = 0
+        for sql, plan in explained:
+            statements += 1
+            removed += rows_removed(plan["Plan"])
+            milliseconds += plan["Execution Time"]
+            hit += plan["Plan"].get("Shared Hit Blocks", 0)
+            read += plan["Plan"].get("Shared Read Blocks", 0)
+
+            unexpected = False
+            for node in plan_nodes(plan["Plan"]):
+                relation = node.get("Relation Name")
+                if node["Node Type"] != "Seq Scan" or sizes.get(relation, 0) < options["min_rows"]:
+                    continue
+                reason = expected_seq_scan(scenario.name, relation, sql)
+                if reason is not None:
+                    expected.add(f"Seq Scan on {relation}: {reason}")
+                    continue
+                unexpected = True
+                failure = (
+                    f"{scenario.name}: Seq Scan on {relation} (~{sizes[relation]} rows) "
+                    f"in statement {fingerprint(sql)[1]}"
+                )
+                # The conditional-GET validators and the page run some statements twice.
+                if failure not in failures:
+                    failures.append(failure)
+            if unexpected and options["show_plans"]:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+                    text = "\n".join(f"    {line}" for (line,) in cursor.fetchall())
+                self.stdout.write(f"  {fingerprint(sql)[0]}\n{text}")
+
+        if scenario.first_page is not None:
+            # A seek starts the index range at the cursor; a filter would walk every earlier row.
+            _status_code, first_page = self.explain_request(client, scenario.first_page)
+            first_page_removed = sum(rows_removed(plan["Plan"]) for _sql, plan in first_page)
+            if removed > first_page_removed + options["max_filtered_rows"]:
+                failures.append(
+                    f"{scenario.name}: filtered out {removed} rows, the first page {first_page_removed}"
+                )
+
+        status = "FAIL" if failures else "ok  "
+        self.stdout.write(
+            f"{status} {scenario.name:<78} statements={statements} exec={milliseconds:8.2f}ms "
+            f"buffers hit={hit} read={read} filtered={removed}"
+        )
+        for note in sorted(expected):
+            self.stdout.write(f"       expected {note}")
+        return failures
+
+    def explain_request(self, client, path):
+        """The response status and `(sql, plan)` of each read statement the request ran."""
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(path)
+        explained = []
+        for query in captured.captured_queries:
+            # Only reads; the count estimator's own EXPLAIN and `set_config()` are skipped too.
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or sql.startswith("SELECT set_config("):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+            explained.append((sql, json.loads(plan)[0] if isinstance(plan, str) else plan[0]))
+        return response.status_code, explained
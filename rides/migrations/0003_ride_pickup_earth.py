@@ -0,0 +1,49 @@
+import rides.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("rides", "0002_postgres_distance_extensions_and_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="pickup_earth",
+            field=rides.fields.EarthField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                """
+                CREATE OR REPLACE FUNCTION rides_ride_set_pickup_earth() RETURNS trigger AS $$
+                BEGIN
+                    NEW.pickup_earth := ll_to_earth(NEW.pickup_latitude, NEW.pickup_longitude);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+                """,
+                """
+                CREATE TRIGGER rides_ride_pickup_earth_trg
+                BEFORE INSERT OR UPDATE OF pickup_latitude, pickup_longitude ON rides_ride
+                FOR EACH ROW EXECUTE FUNCTION rides_ride_set_pickup_earth();
+                """,
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS rides_ride_pickup_earth_trg ON rides_ride;",
+                "DROP FUNCTION IF EXISTS rides_ride_set_pickup_earth();",
+            ],
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX CONCURRENTLY IF NOT EXISTS rides_ride_pickup_earth_col_idx ON rides_ride USING gist (pickup_earth);",
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS rides_ride_pickup_earth_col_idx;",
+        ),
+        # Distance queries now read the stored column; the expression index is dead weight on writes.
+        migrations.RunSQL(
+            sql="DROP INDEX CONCURRENTLY IF EXISTS rides_ride_pickup_earth_idx;",
+            reverse_sql="CREATE INDEX CONCURRENTLY IF NOT EXISTS rides_ride_pickup_earth_idx ON rides_ride USING gist (ll_to_earth(pickup_latitude, pickup_longitude));",
+        ),
+    ]
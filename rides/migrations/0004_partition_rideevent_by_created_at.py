@@ -0,0 +1,143 @@
+from django.db import migrations
+
+# Creates the monthly partition holding `month_start` if it is missing. Rows for that month
+# that already landed in the default partition are moved into the new partition first.
+ENSURE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION rides_rideevent_ensure_partition(month_start date) RETURNS text AS $$
+DECLARE
+    lower_bound timestamptz := date_trunc('month', month_start)::timestamp AT TIME ZONE 'UTC';
+    upper_bound timestamptz := (date_trunc('month', month_start) + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+    partition_name text := format('rides_rideevent_p%s', to_char(month_start, 'YYYYMM'));
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM rides_rideevent_default
+        WHERE created_at >= lower_bound AND created_at < upper_bound
+    ) THEN
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE rides_rideevent INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            partition_name
+        );
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM rides_rideevent_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            lower_bound, upper_bound, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE rides_rideevent ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, lower_bound, upper_bound
+        );
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF rides_rideevent FOR VALUES FROM (%L) TO (%L)',
+            partition_name, lower_bound, upper_bound
+        );
+    END IF;
+
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDEXES = [
+    "ALTER TABLE rides_rideevent ADD CONSTRAINT rides_rideevent_pkey PRIMARY KEY (id_ride_event, created_at);",
+    "CREATE INDEX rides_rideevent_created_at_d730290a ON rides_rideevent (created_at);",
+    "CREATE INDEX rides_rideevent_id_ride_a6adce71 ON rides_rideevent (id_ride);",
+    "CREATE INDEX rides_rideevent_ride_created_idx ON rides_rideevent (id_ride, created_at DESC);",
+    "ALTER TABLE rides_rideevent ADD CONSTRAINT rides_rideevent_id_ride_a6adce71_fk_rides_ride_id_ride "
+    "FOREIGN KEY (id_ride) REFERENCES rides_ride (id_ride) DEFERRABLE INITIALLY DEFERRED;",
+]
+
+FORWARD = [
+    # Block writers (readers keep going) while the rows are copied over.
+    "LOCK TABLE rides_rideevent IN EXCLUSIVE MODE;",
+    """
+    CREATE TABLE rides_rideevent_partitioned (
+        id_ride_event bigint NOT NULL,
+        description varchar(255) NOT NULL,
+        created_at timestamptz NOT NULL,
+        id_ride bigint NOT NULL
+    ) PARTITION BY RANGE (created_at);
+    """,
+    "ALTER TABLE rides_rideevent RENAME TO rides_rideevent_unpartitioned;",
+    "ALTER TABLE rides_rideevent_partitioned RENAME TO rides_rideevent;",
+    "CREATE TABLE rides_rideevent_default PARTITION OF rides_rideevent DEFAULT;",
+    ENSURE_PARTITION_FUNCTION,
+    """
+    DO $$
+    DECLARE
+        month_start date;
+    BEGIN
+        SELECT date_trunc('month', LEAST(MIN(created_at), now()) AT TIME ZONE 'UTC')::date
+        INTO month_start
+        FROM rides_rideevent_unpartitioned;
+
+        WHILE month_start <= (now() AT TIME ZONE 'UTC' + interval '2 months')::date LOOP
+            PERFORM rides_rideevent_ensure_partition(month_start);
+            month_start := (month_start + interval '1 month')::date;
+        END LOOP;
+    END;
+    $$;
+    """,
+    """
+    INSERT INTO rides_rideevent (id_ride_event, description, created_at, id_ride)
+    SELECT id_ride_event, description, created_at, id_ride FROM rides_rideevent_unpartitioned;
+    """,
+    # Also drops the identity sequence, freeing its name for the new one.
+    "DROP TABLE rides_rideevent_unpartitioned;",
+    # Partitioned tables cannot have identity columns before Postgres 17; use an owned sequence.
+    "CREATE SEQUENCE rides_rideevent_id_ride_event_seq OWNED BY rides_rideevent.id_ride_event;",
+    "SELECT setval('rides_rideevent_id_ride_event_seq', COALESCE(MAX(id_ride_event), 0) + 1, false) FROM rides_rideevent;",
+    "ALTER TABLE rides_rideevent ALTER COLUMN id_ride_event SET DEFAULT nextval('rides_rideevent_id_ride_event_seq');",
+    *INDEXES,
+]
+
+BACKWARD = [
+    "LOCK TABLE rides_rideevent IN EXCLUSIVE MODE;",
+    "ALTER TABLE rides_rideevent RENAME TO rides_rideevent_partitioned;",
+    "ALTER TABLE rides_rideevent_partitioned DROP CONSTRAINT rides_rideevent_pkey;",
+    "ALTER TABLE rides_rideevent_partitioned DROP CONSTRAINT rides_rideevent_id_ride_a6adce71_fk_rides_ride_id_ride;",
+    "DROP INDEX rides_rideevent_created_at_d730290a, rides_rideevent_id_ride_a6adce71, rides_rideevent_ride_created_idx;",
+    """
+    CREATE TABLE rides_rideevent (
+        id_ride_event bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+        description varchar(255) NOT NULL,
+        created_at timestamptz NOT NULL,
+        id_ride bigint NOT NULL
+    );
+    """,
+    """
+    INSERT INTO rides_rideevent (id_ride_event, description, created_at, id_ride)
+    SELECT id_ride_event, description, created_at, id_ride FROM rides_rideevent_partitioned;
+    """,
+    "DROP TABLE rides_rideevent_partitioned CASCADE;",
+    "DROP FUNCTION IF EXISTS rides_rideevent_ensure_partition(date);",
+    "SELECT setval(pg_get_serial_sequence('rides_rideevent', 'id_ride_event'), COALESCE(MAX(id_ride_event), 0) + 1, false) FROM rides_rideevent;",
+    *(
+        statement.replace("PRIMARY KEY (id_ride_event, created_at)", "PRIMARY KEY (id_ride_event)")
+        for statement in INDEXES
+    ),
+]
+
+
+class Migration(migrations.Migration):
+    """
+    Move `rides_rideevent` to native range partitioning on `created_at`, one partition per month.
+
+    Postgres requires the partition key in every unique constraint, so the physical primary
+    key becomes `(id_ride_event, created_at)`; `id_ride_event` stays unique because it comes
+    from a single sequence, and Django keeps treating it as the primary key. The copy runs
+    under a write lock, so schedule this migration in a maintenance window on large tables.
+    Future partitions are created by the `manage_ride_event_partitions` command.
+    """
+
+    dependencies = [
+        ("rides", "0003_ride_pickup_earth"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=FORWARD, reverse_sql=BACKWARD),
+    ]
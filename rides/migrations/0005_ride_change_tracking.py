@@ -0,0 +1,124 @@
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+# Everything that shows up in a ride's API representation funnels into one UPDATE of the
+# ride row, and that UPDATE bumps `version` / `updated_at`:
+# - direct ride writes (ORM, admin, QuerySet.update(), raw SQL);
+# - RideEvent inserts/updates/deletes, once per statement so COPY and bulk_create batches
+#   touch each ride once;
+# - edits to the rider's or driver's profile fields.
+TRIGGERS_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION rides_ride_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := OLD.version + 1;
+        NEW.updated_at := now();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_ride_touch_trg
+    BEFORE UPDATE ON rides_ride
+    FOR EACH ROW EXECUTE FUNCTION rides_ride_touch();
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_touch_rides() RETURNS trigger AS $$
+    BEGIN
+        -- Lock in id order first so concurrent batches over overlapping rides cannot deadlock.
+        PERFORM 1 FROM rides_ride
+        WHERE id_ride IN (SELECT id_ride FROM changed_events)
+        ORDER BY id_ride
+        FOR UPDATE;
+
+        UPDATE rides_ride SET updated_at = now()
+        WHERE id_ride IN (SELECT id_ride FROM changed_events);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_rideevent_insert_touch_trg
+    AFTER INSERT ON rides_rideevent REFERENCING NEW TABLE AS changed_events
+    FOR EACH STATEMENT EXECUTE FUNCTION rides_rideevent_touch_rides();
+    """,
+    # An update can move an event to another ride, so both the old and the new ride change.
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_touch_rides_on_update() RETURNS trigger AS $$
+    BEGIN
+        PERFORM 1 FROM rides_ride
+        WHERE id_ride IN (SELECT id_ride FROM old_events UNION SELECT id_ride FROM new_events)
+        ORDER BY id_ride
+        FOR UPDATE;
+
+        UPDATE rides_ride SET updated_at = now()
+        WHERE id_ride IN (SELECT id_ride FROM old_events UNION SELECT id_ride FROM new_events);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_rideevent_update_touch_trg
+    AFTER UPDATE ON rides_rideevent REFERENCING OLD TABLE AS old_events NEW TABLE AS new_events
+    FOR EACH STATEMENT EXECUTE FUNCTION rides_rideevent_touch_rides_on_update();
+    """,
+    """
+    CREATE TRIGGER rides_rideevent_delete_touch_trg
+    AFTER DELETE ON rides_rideevent REFERENCING OLD TABLE AS changed_events
+    FOR EACH STATEMENT EXECUTE FUNCTION rides_rideevent_touch_rides();
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rides_user_touch_rides() RETURNS trigger AS $$
+    BEGIN
+        UPDATE rides_ride SET updated_at = now() WHERE id_rider = NEW.id_user;
+        UPDATE rides_ride SET updated_at = now() WHERE id_driver = NEW.id_user;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    # Only the fields rides embed; logins and password changes leave rides alone.
+    """
+    CREATE TRIGGER rides_user_touch_rides_trg
+    AFTER UPDATE OF role, first_name, last_name, email, phone_number ON rides_user
+    FOR EACH ROW
+    WHEN (
+        (OLD.role, OLD.first_name, OLD.last_name, OLD.email, OLD.phone_number)
+        IS DISTINCT FROM (NEW.role, NEW.first_name, NEW.last_name, NEW.email, NEW.phone_number)
+    )
+    EXECUTE FUNCTION rides_user_touch_rides();
+    """,
+]
+
+DROP_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS rides_user_touch_rides_trg ON rides_user;",
+    "DROP FUNCTION IF EXISTS rides_user_touch_rides();",
+    "DROP TRIGGER IF EXISTS rides_rideevent_delete_touch_trg ON rides_rideevent;",
+    "DROP TRIGGER IF EXISTS rides_rideevent_update_touch_trg ON rides_rideevent;",
+    "DROP FUNCTION IF EXISTS rides_rideevent_touch_rides_on_update();",
+    "DROP TRIGGER IF EXISTS rides_rideevent_insert_touch_trg ON rides_rideevent;",
+    "DROP FUNCTION IF EXISTS rides_rideevent_touch_rides();",
+    "DROP TRIGGER IF EXISTS rides_ride_touch_trg ON rides_ride;",
+    "DROP FUNCTION IF EXISTS rides_ride_touch();",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0004_partition_rideevent_by_created_at"),
+    ]
+
+    operations = [
+        # Constant/stable database defaults: existing rows are not rewritten, and COPY/raw
+        # inserts that leave the columns out still get values.
+        migrations.AddField(
+            model_name="ride",
+            name="updated_at",
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="version",
+            field=models.PositiveIntegerField(db_default=1, editable=False),
+        ),
+        migrations.RunSQL(sql=TRIGGERS_SQL, reverse_sql=DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:23
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0005_ride_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportWatermark',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DriverMonthlyTripSummary',
+            fields=[
+                ('id_driver_monthly_trip_summary', models.BigAutoField(primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('trips_over_1h', models.PositiveIntegerField()),
+                ('refreshed_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+                ('id_driver', models.ForeignKey(db_column='id_driver', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'id_driver'), name='rides_tripsummary_month_driver_uniq')],
+            },
+        ),
+    ]
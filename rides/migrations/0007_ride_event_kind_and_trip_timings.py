@@ -0,0 +1,195 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# `kind` is derived from the description on every insert/update, whichever path writes it.
+KIND_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_kind(description text) RETURNS text AS $$
+        SELECT CASE description
+            WHEN 'Status changed to en-route' THEN 'en-route'
+            WHEN 'Status changed to pickup' THEN 'pickup'
+            WHEN 'Status changed to dropoff' THEN 'dropoff'
+            ELSE 'other'
+        END
+    $$ LANGUAGE sql IMMUTABLE;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_set_kind() RETURNS trigger AS $$
+    BEGIN
+        NEW.kind := rides_rideevent_kind(NEW.description);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_rideevent_kind_trg
+    BEFORE INSERT OR UPDATE ON rides_rideevent
+    FOR EACH ROW EXECUTE FUNCTION rides_rideevent_set_kind();
+    """,
+]
+
+DROP_KIND_SQL = [
+    "DROP TRIGGER IF EXISTS rides_rideevent_kind_trg ON rides_rideevent;",
+    "DROP FUNCTION IF EXISTS rides_rideevent_set_kind();",
+    "DROP FUNCTION IF EXISTS rides_rideevent_kind(text);",
+]
+
+# The statement-level event triggers from migration 0005 already lock and update every
+# affected ride; they now set the trip timings in that same UPDATE. Inserts can only move
+# the timings outward, so they fold in the new rows; updates and deletes recompute the
+# affected rides from their remaining events.
+TIMINGS_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION rides_ride_refresh_timings(ride_ids bigint[]) RETURNS void AS $$
+        UPDATE rides_ride r SET
+            updated_at = now(),
+            picked_up_at = (
+                SELECT MIN(e.created_at) FROM rides_rideevent e
+                WHERE e.id_ride = r.id_ride AND e.kind = 'pickup'
+            ),
+            dropped_off_at = (
+                SELECT MAX(e.created_at) FROM rides_rideevent e
+                WHERE e.id_ride = r.id_ride AND e.kind = 'dropoff'
+            ),
+            last_event_at = (
+                SELECT MAX(e.created_at) FROM rides_rideevent e
+                WHERE e.id_ride = r.id_ride
+            )
+        WHERE r.id_ride = ANY(ride_ids);
+    $$ LANGUAGE sql;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_touch_rides() RETURNS trigger AS $$
+    BEGIN
+        -- Lock in id order first so concurrent batches over overlapping rides cannot deadlock.
+        PERFORM 1 FROM rides_ride
+        WHERE id_ride IN (SELECT id_ride FROM changed_events)
+        ORDER BY id_ride
+        FOR UPDATE;
+
+        IF TG_OP = 'INSERT' THEN
+            UPDATE rides_ride r SET
+                updated_at = now(),
+                picked_up_at = LEAST(r.picked_up_at, c.picked_up_at),
+                dropped_off_at = GREATEST(r.dropped_off_at, c.dropped_off_at),
+                last_event_at = GREATEST(r.last_event_at, c.last_event_at)
+            FROM (
+                SELECT
+                    id_ride,
+                    MIN(created_at) FILTER (WHERE kind = 'pickup') AS picked_up_at,
+                    MAX(created_at) FILTER (WHERE kind = 'dropoff') AS dropped_off_at,
+                    MAX(created_at) AS last_event_at
+                FROM changed_events
+                GROUP BY id_ride
+            ) c
+            WHERE r.id_ride = c.id_ride;
+        ELSE
+            PERFORM rides_ride_refresh_timings(ARRAY(SELECT DISTINCT id_ride FROM changed_events));
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_touch_rides_on_update() RETURNS trigger AS $$
+    BEGIN
+        PERFORM 1 FROM rides_ride
+        WHERE id_ride IN (SELECT id_ride FROM old_events UNION SELECT id_ride FROM new_events)
+        ORDER BY id_ride
+        FOR UPDATE;
+
+        PERFORM rides_ride_refresh_timings(
+            ARRAY(SELECT id_ride FROM old_events UNION SELECT id_ride FROM new_events)
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+]
+
+# Migration 0005's versions.
+RESTORE_TOUCH_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_touch_rides() RETURNS trigger AS $$
+    BEGIN
+        -- Lock in id order first so concurrent batches over overlapping rides cannot deadlock.
+        PERFORM 1 FROM rides_ride
+        WHERE id_ride IN (SELECT id_ride FROM changed_events)
+        ORDER BY id_ride
+        FOR UPDATE;
+
+        UPDATE rides_ride SET updated_at = now()
+        WHERE id_ride IN (SELECT id_ride FROM changed_events);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_touch_rides_on_update() RETURNS trigger AS $$
+    BEGIN
+        PERFORM 1 FROM rides_ride
+        WHERE id_ride IN (SELECT id_ride FROM old_events UNION SELECT id_ride FROM new_events)
+        ORDER BY id_ride
+        FOR UPDATE;
+
+        UPDATE rides_ride SET updated_at = now()
+        WHERE id_ride IN (SELECT id_ride FROM old_events UNION SELECT id_ride FROM new_events);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    "DROP FUNCTION IF EXISTS rides_ride_refresh_timings(bigint[]);",
+]
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("rides", "0006_trip_duration_report"),
+    ]
+
+    operations = [
+        # Nullable / constant-default columns: no table rewrite. Existing rows are filled in
+        # by the `backfill_ride_timings` command.
+        migrations.AddField(
+            model_name="ride",
+            name="picked_up_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="dropped_off_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="last_event_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="rideevent",
+            name="kind",
+            field=models.CharField(
+                choices=[("en-route", "en-route"), ("pickup", "pickup"), ("dropoff", "dropoff"), ("other", "other")],
+                db_default="other",
+                editable=False,
+                max_length=20,
+            ),
+        ),
+        migrations.RunSQL(sql=KIND_SQL, reverse_sql=DROP_KIND_SQL),
+        migrations.RunSQL(sql=TIMINGS_SQL, reverse_sql=RESTORE_TOUCH_SQL),
+        AddIndexConcurrently(
+            model_name="ride",
+            index=models.Index(
+                fields=["picked_up_at"],
+                include=("dropped_off_at", "id_driver"),
+                name="rides_ride_picked_up_cover_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="ride",
+            index=models.Index(fields=["last_event_at"], name="rides_ride_last_event_at_idx"),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+# Any change that should end existing sessions bumps `auth_version`, whichever path writes it
+# (admin, ORM, `QuerySet.update()` or raw SQL). GREATEST() keeps a save from a stale model
+# instance from rolling the version back and reviving revoked tokens.
+AUTH_VERSION_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION rides_user_bump_auth_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.auth_version := GREATEST(NEW.auth_version, OLD.auth_version);
+        IF (NEW.role, NEW.is_active, NEW.password) IS DISTINCT FROM (OLD.role, OLD.is_active, OLD.password) THEN
+            NEW.auth_version := NEW.auth_version + 1;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_user_bump_auth_version_trg
+    BEFORE UPDATE ON rides_user
+    FOR EACH ROW
+    EXECUTE FUNCTION rides_user_bump_auth_version();
+    """,
+]
+
+DROP_AUTH_VERSION_SQL = [
+    "DROP TRIGGER IF EXISTS rides_user_bump_auth_version_trg ON rides_user;",
+    "DROP FUNCTION IF EXISTS rides_user_bump_auth_version();",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0007_ride_event_kind_and_trip_timings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="auth_version",
+            field=models.PositiveIntegerField(db_default=1, editable=False),
+        ),
+        migrations.RunSQL(sql=AUTH_VERSION_SQL, reverse_sql=DROP_AUTH_VERSION_SQL),
+    ]
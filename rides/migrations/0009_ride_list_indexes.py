@@ -0,0 +1,84 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("rides", "0008_user_auth_version"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="ride",
+            index=models.Index(
+                Upper("status"),
+                models.F("pickup_time"),
+                models.F("id_ride"),
+                include=("status",),
+                name="rides_ride_status_pickup_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="ride",
+            index=models.Index(fields=["pickup_time", "id_ride"], name="rides_ride_pickup_time_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(Upper("email"), name="rides_user_email_upper_idx"),
+        ),
+        # Postgres cannot build an index on a partitioned table concurrently; this locks writes
+        # to `rides_rideevent` while each partition is indexed.
+        migrations.AddIndex(
+            model_name="rideevent",
+            index=models.Index(
+                fields=["id_ride", "-created_at"],
+                include=("id_ride_event", "kind", "description"),
+                name="rides_rideevent_ride_cover_idx",
+            ),
+        ),
+        # Superseded by the indexes above: the plain `status` indexes cannot serve the iexact
+        # filter, `(pickup_time, id_ride)` starts with `pickup_time`, and the covering event
+        # index has the same keys as `rides_rideevent_ride_created_idx` (migration 0004).
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="ride",
+                    name="status",
+                    field=models.CharField(max_length=50),
+                ),
+                migrations.AlterField(
+                    model_name="ride",
+                    name="pickup_time",
+                    field=models.DateTimeField(),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql="DROP INDEX CONCURRENTLY IF EXISTS rides_ride_status_ee8a2b45;",
+                    reverse_sql="CREATE INDEX CONCURRENTLY IF NOT EXISTS rides_ride_status_ee8a2b45 ON rides_ride (status);",
+                ),
+                migrations.RunSQL(
+                    sql="DROP INDEX CONCURRENTLY IF EXISTS rides_ride_status_ee8a2b45_like;",
+                    reverse_sql=(
+                        "CREATE INDEX CONCURRENTLY IF NOT EXISTS rides_ride_status_ee8a2b45_like "
+                        "ON rides_ride (status varchar_pattern_ops);"
+                    ),
+                ),
+                migrations.RunSQL(
+                    sql="DROP INDEX CONCURRENTLY IF EXISTS rides_ride_pickup_time_cda49154;",
+                    reverse_sql=(
+                        "CREATE INDEX CONCURRENTLY IF NOT EXISTS rides_ride_pickup_time_cda49154 "
+                        "ON rides_ride (pickup_time);"
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="DROP INDEX IF EXISTS rides_rideevent_ride_created_idx;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS rides_rideevent_ride_created_idx ON rides_rideevent (id_ride, created_at DESC);",
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Every committed insert into `rides_rideevent` announces the new ids on the
+# `rides_rideevent` channel, for the live event stream (`api.eventstream`). One statement
+# (a bulk batch, a COPY) sends comma-separated ids in chunks of 300, which keeps each payload
+# under NOTIFY's 8000-byte limit. Postgres delivers notifications only at commit and in
+# commit order, so listeners never see rolled-back events.
+NOTIFY_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION rides_rideevent_notify() RETURNS trigger AS $$
+    DECLARE
+        ids text;
+    BEGIN
+        FOR ids IN
+            SELECT string_agg(id_ride_event::text, ',' ORDER BY id_ride_event)
+            FROM (
+                SELECT id_ride_event, (row_number() OVER (ORDER BY id_ride_event) - 1) / 300 AS chunk
+                FROM new_events
+            ) numbered
+            GROUP BY chunk
+            ORDER BY chunk
+        LOOP
+            PERFORM pg_notify('rides_rideevent', ids);
+        END LOOP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_rideevent_notify_trg
+    AFTER INSERT ON rides_rideevent REFERENCING NEW TABLE AS new_events
+    FOR EACH STATEMENT EXECUTE FUNCTION rides_rideevent_notify();
+    """,
+]
+
+DROP_NOTIFY_SQL = [
+    "DROP TRIGGER IF EXISTS rides_rideevent_notify_trg ON rides_rideevent;",
+    "DROP FUNCTION IF EXISTS rides_rideevent_notify();",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0009_ride_list_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=NOTIFY_SQL, reverse_sql=DROP_NOTIFY_SQL),
+    ]
@@ -0,0 +1,96 @@
+import rides.fields
+from django.db import migrations, models
+
+# Notifications now lead with the inserting statement's snapshot: `<pg_snapshot>/<id>,<id>,...`.
+# Together with `inserted_xid`, it tells a reconnecting stream which transactions it has seen,
+# since ids are not handed out in commit order. Chunks shrink to 250 ids to leave room for it
+# under NOTIFY's 8000-byte limit. A snapshot too long to send (thousands of writers in
+# flight) is cut down to its `xmin`, which treats them all as unseen.
+NOTIFY_SQL = """
+CREATE OR REPLACE FUNCTION rides_rideevent_notify() RETURNS trigger AS $$
+DECLARE
+    snapshot pg_snapshot := pg_current_snapshot();
+    position text := snapshot::text;
+    ids text;
+BEGIN
+    IF length(position) > 2000 THEN
+        position := pg_snapshot_xmin(snapshot)::text || ':' || pg_snapshot_xmin(snapshot)::text || ':';
+    END IF;
+    FOR ids IN
+        SELECT string_agg(id_ride_event::text, ',' ORDER BY id_ride_event)
+        FROM (
+            SELECT id_ride_event, (row_number() OVER (ORDER BY id_ride_event) - 1) / 250 AS chunk
+            FROM new_events
+        ) numbered
+        GROUP BY chunk
+        ORDER BY chunk
+    LOOP
+        PERFORM pg_notify('rides_rideevent', position || '/' || ids);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_NOTIFY_SQL = """
+CREATE OR REPLACE FUNCTION rides_rideevent_notify() RETURNS trigger AS $$
+DECLARE
+    ids text;
+BEGIN
+    FOR ids IN
+        SELECT string_agg(id_ride_event::text, ',' ORDER BY id_ride_event)
+        FROM (
+            SELECT id_ride_event, (row_number() OVER (ORDER BY id_ride_event) - 1) / 300 AS chunk
+            FROM new_events
+        ) numbered
+        GROUP BY chunk
+        ORDER BY chunk
+    LOOP
+        PERFORM pg_notify('rides_rideevent', ids);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0010_ride_event_notify"),
+    ]
+
+    operations = [
+        # A volatile default on ADD COLUMN would rewrite every partition; added without one,
+        # the column is NULL on existing rows at no cost, and the default applies from then on.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name="rideevent",
+                    name="inserted_xid",
+                    field=rides.fields.TransactionIdField(
+                        db_default=rides.fields.CurrentTransactionId(), editable=False, null=True
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        "ALTER TABLE rides_rideevent ADD COLUMN inserted_xid xid8;",
+                        "ALTER TABLE rides_rideevent ALTER COLUMN inserted_xid SET DEFAULT pg_current_xact_id();",
+                    ],
+                    reverse_sql="ALTER TABLE rides_rideevent DROP COLUMN inserted_xid;",
+                ),
+            ],
+        ),
+        # Locks writes to `rides_rideevent` while each partition is indexed, as in 0009; the
+        # partial index skips the existing rows' NULLs.
+        migrations.AddIndex(
+            model_name="rideevent",
+            index=models.Index(
+                condition=models.Q(inserted_xid__isnull=False),
+                fields=["inserted_xid"],
+                name="rides_rideevent_xid_idx",
+            ),
+        ),
+        migrations.RunSQL(sql=NOTIFY_SQL, reverse_sql=PREVIOUS_NOTIFY_SQL),
+    ]
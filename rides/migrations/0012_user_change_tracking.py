@@ -0,0 +1,76 @@
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+# Profile edits used to touch every ride of the rider or driver (0005), one row update per
+# ride, under a lock, in the editing transaction. They now bump the user's own `version` /
+# `updated_at`, which a ride's detail validators read next to the ride's. Only the fields
+# rides embed count, whichever path writes them; the columns are set here from the old row,
+# so a save from a stale model instance cannot roll them back.
+USER_TOUCH_SQL = [
+    "DROP TRIGGER IF EXISTS rides_user_touch_rides_trg ON rides_user;",
+    "DROP FUNCTION IF EXISTS rides_user_touch_rides();",
+    """
+    CREATE OR REPLACE FUNCTION rides_user_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := OLD.version;
+        NEW.updated_at := OLD.updated_at;
+        IF (NEW.role, NEW.first_name, NEW.last_name, NEW.email, NEW.phone_number)
+            IS DISTINCT FROM (OLD.role, OLD.first_name, OLD.last_name, OLD.email, OLD.phone_number) THEN
+            NEW.version := OLD.version + 1;
+            NEW.updated_at := now();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_user_touch_trg
+    BEFORE UPDATE ON rides_user
+    FOR EACH ROW
+    EXECUTE FUNCTION rides_user_touch();
+    """,
+]
+
+DROP_USER_TOUCH_SQL = [
+    "DROP TRIGGER IF EXISTS rides_user_touch_trg ON rides_user;",
+    "DROP FUNCTION IF EXISTS rides_user_touch();",
+    """
+    CREATE OR REPLACE FUNCTION rides_user_touch_rides() RETURNS trigger AS $$
+    BEGIN
+        UPDATE rides_ride SET updated_at = now() WHERE id_rider = NEW.id_user;
+        UPDATE rides_ride SET updated_at = now() WHERE id_driver = NEW.id_user;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER rides_user_touch_rides_trg
+    AFTER UPDATE OF role, first_name, last_name, email, phone_number ON rides_user
+    FOR EACH ROW
+    WHEN (
+        (OLD.role, OLD.first_name, OLD.last_name, OLD.email, OLD.phone_number)
+        IS DISTINCT FROM (NEW.role, NEW.first_name, NEW.last_name, NEW.email, NEW.phone_number)
+    )
+    EXECUTE FUNCTION rides_user_touch_rides();
+    """,
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0011_ride_event_inserted_xid"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="version",
+            field=models.PositiveIntegerField(db_default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.RunSQL(sql=USER_TOUCH_SQL, reverse_sql=DROP_USER_TOUCH_SQL),
+    ]
@@ -0,0 +1,22 @@
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+# Every ride event rewrites the ride's `last_event_at` (0007), and an index on a column an
+# UPDATE changes rules out a heap-only tuple update: each event then adds an entry to every
+# index on rides_ride. No query filters or sorts on `last_event_at`, so the index only cost
+# writes.
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("rides", "0012_user_change_tracking"),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name="ride",
+            name="rides_ride_last_event_at_idx",
+        ),
+    ]
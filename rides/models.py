@@ -1,7 +1,9 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.db.models.functions import Now, Upper
 from django.utils import timezone
 
+from rides.fields import CurrentTransactionId, EarthField, TransactionIdField
 from rides.managers import UserManager
 
 
@@ -24,12 +26,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
+    # Embedded in access tokens; a database trigger bumps it when the role, is_active or
+    # password changes, which revokes every token issued before (see api/authentication.py).
+    auth_version = models.PositiveIntegerField(db_default=1, editable=False)
+    # Bumped by a database trigger when a field rides embed changes; part of the ride
+    # detail validators (see api/viewsets.py).
+    version = models.PositiveIntegerField(db_default=1, editable=False)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # `rider_email` (iexact) compiles to `UPPER(email::text) = UPPER(...)`, which the
+            # unique index on `email` cannot answer.
+            models.Index(Upper("email"), name="rides_user_email_upper_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.email
 
@@ -40,7 +56,7 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Ride(models.Model):
     id_ride = models.BigAutoField(primary_key=True)
-    status = models.CharField(max_length=50, db_index=True)
+    status = models.CharField(max_length=50)
 
     id_rider = models.ForeignKey(
         User,
@@ -59,13 +75,64 @@ class Ride(models.Model):
     pickup_longitude = models.FloatField()
     dropoff_latitude = models.FloatField()
     dropoff_longitude = models.FloatField()
-    pickup_time = models.DateTimeField(db_index=True)
+    pickup_time = models.DateTimeField()
+    # `ll_to_earth(pickup_latitude, pickup_longitude)`, maintained by a database trigger
+    # (see migration 0003) so distance queries read it instead of recomputing it per row.
+    pickup_earth = EarthField(null=True, editable=False)
+    # Change tracking for ETag / Last-Modified, maintained by database triggers (see
+    # migration 0005): any write to the ride or its events bumps both, whichever path it
+    # comes from. Profile edits bump the rider's/driver's own (see migration 0012).
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+    version = models.PositiveIntegerField(db_default=1, editable=False)
+    # Trip timings folded in from the ride's events by the same triggers (see migration 0007):
+    # first pickup, last dropoff and newest event of any kind. Deliberately unindexed (see
+    # migration 0013): every event rewrites `last_event_at`, and no query filters on it.
+    picked_up_at = models.DateTimeField(null=True, editable=False)
+    dropped_off_at = models.DateTimeField(null=True, editable=False)
+    last_event_at = models.DateTimeField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # The `status` filter is iexact (`UPPER(status::text) = UPPER(...)`); rides with one
+            # status then come back in `pickup_time` / keyset order. The raw column is included
+            # so the page count can be an index-only scan.
+            models.Index(
+                Upper("status"), "pickup_time", "id_ride", include=["status"], name="rides_ride_status_pickup_idx"
+            ),
+            # `ordering=pickup_time` and its cursor condition, ties broken by `id_ride`.
+            models.Index(fields=["pickup_time", "id_ride"], name="rides_ride_pickup_time_id_idx"),
+            # Covers the trip-duration report: a month's rides straight from the index.
+            models.Index(
+                fields=["picked_up_at"],
+                include=["dropped_off_at", "id_driver"],
+                name="rides_ride_picked_up_cover_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Ride {self.id_ride}"
 
 
 class RideEvent(models.Model):
+    """
+    Append-only ride history.
+
+    The table is range-partitioned by month on `created_at` (migration 0004), so its physical
+    primary key is `(id_ride_event, created_at)`; `id_ride_event` alone is still unique.
+    """
+
+    KIND_EN_ROUTE = "en-route"
+    KIND_PICKUP = "pickup"
+    KIND_DROPOFF = "dropoff"
+    KIND_OTHER = "other"
+
+    KIND_CHOICES = [
+        (KIND_EN_ROUTE, "en-route"),
+        (KIND_PICKUP, "pickup"),
+        (KIND_DROPOFF, "dropoff"),
+        (KIND_OTHER, "other"),
+    ]
+
     id_ride_event = models.BigAutoField(primary_key=True)
     id_ride = models.ForeignKey(
         Ride,
@@ -74,7 +141,72 @@ class RideEvent(models.Model):
         db_column="id_ride",
     )
     description = models.CharField(max_length=255)
+    # Derived from `description` ("Status changed to <kind>") by a database trigger on every
+    # write path (see migration 0007); everything else is `other`.
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, db_default=KIND_OTHER, editable=False)
     created_at = models.DateTimeField(db_index=True)
+    # The transaction that inserted the event, so the live event stream can resume in commit
+    # order (see api/eventstream.py). Set by the column default on every write path; NULL on
+    # events older than migration 0011.
+    inserted_xid = TransactionIdField(db_default=CurrentTransactionId(), null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # A page's events inside the `todays_ride_events` window (and their per-ride count),
+            # read from the index alone.
+            models.Index(
+                fields=["id_ride", "-created_at"],
+                include=["id_ride_event", "kind", "description"],
+                name="rides_rideevent_ride_cover_idx",
+            ),
+            # Events of transactions that may have committed after a stream's last one.
+            models.Index(
+                fields=["inserted_xid"],
+                condition=models.Q(inserted_xid__isnull=False),
+                name="rides_rideevent_xid_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"RideEvent {self.id_ride_event}"
+
+
+class DriverMonthlyTripSummary(models.Model):
+    """
+    Pre-aggregated "trips over 1 hour" report, one row per (month, driver).
+
+    A ride belongs to the month of its first `Status changed to pickup` event and counts when
+    its last `Status changed to dropoff` event came more than an hour later. Rows are written
+    only by the `refresh_trip_report` command; (month, driver) pairs without such trips have
+    no row.
+    """
+
+    id_driver_monthly_trip_summary = models.BigAutoField(primary_key=True)
+    month = models.DateField()
+    id_driver = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_column="id_driver",
+    )
+    trips_over_1h = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["month", "id_driver"], name="rides_tripsummary_month_driver_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.month:%Y-%m} driver {self.id_driver_id}: {self.trips_over_1h}"
+
+
+class ReportWatermark(models.Model):
+    """Highest `id_ride_event` a pre-aggregated report has already folded in."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.last_event_id}"
@@ -0,0 +1,115 @@
+"""
+Incremental maintenance of the "trips over 1 hour" report (`DriverMonthlyTripSummary`).
+
+The report is the README's bonus query materialized per (month, driver), computed from the
+trigger-maintained `Ride.picked_up_at` / `dropped_off_at` columns. Rather than re-aggregating
+every ride, a refresh only recomputes the months that new pickup/dropoff events can have
+changed:
+
+1. Find the rides with such events above the stored `id_ride_event` watermark.
+2. Collect the months of every pickup event of those rides. A ride is reported under its
+   earliest pickup, so both the month it was counted in before and the month it counts in
+   now are among them.
+3. Replace those months' rows with a fresh aggregate, in one transaction with the watermark.
+
+Event ids are handed out before their transactions commit, so an event can become visible
+after a larger id was already processed. Every refresh therefore re-reads an `overlap` of
+ids below the watermark; recomputing a month is idempotent, so this only costs time.
+
+Events are append-only in normal operation. Deleting rides or events, editing an event's
+description, or reassigning a ride's driver is not seen by the watermark; run a full
+refresh afterwards.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from rides.models import DriverMonthlyTripSummary, ReportWatermark
+
+WATERMARK_NAME = "trips_over_1h"
+DEFAULT_OVERLAP = 10000
+
+SUMMARY_TABLE = DriverMonthlyTripSummary._meta.db_table
+
+# Months (UTC) whose rows new events since %(since)s can have changed.
+TOUCHED_MONTHS_SQL = """
+SELECT DISTINCT date_trunc('month', e.created_at AT TIME ZONE 'UTC')::date
+FROM rides_rideevent e
+WHERE e.kind = 'pickup'
+  AND e.id_ride IN (
+    SELECT DISTINCT n.id_ride
+    FROM rides_rideevent n
+    WHERE n.id_ride_event > %(since)s
+      AND n.id_ride_event <= %(until)s
+      AND n.kind IN ('pickup', 'dropoff')
+  )
+"""
+
+# Reads the trigger-maintained `Ride.picked_up_at` / `dropped_off_at`; a month is one range
+# of the covering `(picked_up_at) INCLUDE (dropped_off_at, id_driver)` index.
+REFRESH_MONTHS_SQL = f"""
+INSERT INTO {SUMMARY_TABLE} (month, id_driver, trips_over_1h)
+SELECT m.month, r.id_driver, COUNT(*)
+FROM unnest(%(months)s::date[]) AS m(month)
+JOIN rides_ride r
+  ON r.picked_up_at >= m.month::timestamp AT TIME ZONE 'UTC'
+ AND r.picked_up_at < (m.month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+WHERE r.dropped_off_at - r.picked_up_at > INTERVAL '1 hour'
+GROUP BY m.month, r.id_driver
+"""
+
+REFRESH_ALL_SQL = f"""
+INSERT INTO {SUMMARY_TABLE} (month, id_driver, trips_over_1h)
+SELECT date_trunc('month', r.picked_up_at AT TIME ZONE 'UTC')::date AS month, r.id_driver, COUNT(*)
+FROM rides_ride r
+WHERE r.dropped_off_at - r.picked_up_at > INTERVAL '1 hour'
+GROUP BY 1, r.id_driver
+"""
+
+
+@dataclass
+class RefreshResult:
+    since: int
+    until: int
+    months: list[date]
+    rows: int
+    full: bool = False
+
+
+def refresh_trip_report(*, full: bool = False, overlap: int = DEFAULT_OVERLAP) -> RefreshResult:
+    """Bring `DriverMonthlyTripSummary` up to date with the events committed so far."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Serialize refreshes: two runs replacing the same month would collide on the unique key.
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [SUMMARY_TABLE])
+
+        watermark, _ = ReportWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        cursor.execute("SELECT COALESCE(MAX(id_ride_event), 0) FROM rides_rideevent")
+        until = cursor.fetchone()[0]
+
+        if full:
+            since = 0
+            cursor.execute(f"DELETE FROM {SUMMARY_TABLE}")
+            cursor.execute(REFRESH_ALL_SQL)
+            rows = cursor.rowcount
+            cursor.execute(f"SELECT DISTINCT month FROM {SUMMARY_TABLE} ORDER BY month")
+            months = [row[0] for row in cursor.fetchall()]
+        else:
+            since = max(watermark.last_event_id - overlap, 0)
+            cursor.execute(TOUCHED_MONTHS_SQL, {"since": since, "until": until})
+            months = sorted(row[0] for row in cursor.fetchall())
+            rows = 0
+            if months:
+                cursor.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE month = ANY(%s::date[])", [months])
+                cursor.execute(REFRESH_MONTHS_SQL, {"months": months})
+                rows = cursor.rowcount
+
+        watermark.last_event_id = max(until, watermark.last_event_id)
+        watermark.refreshed_at = timezone.now()
+        watermark.save(update_fields=["last_event_id", "refreshed_at"])
+
+    return RefreshResult(since=since, until=until, months=months, rows=rows, full=full)
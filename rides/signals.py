@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rides.cache import EVENTS, RIDES, USERS, bump_data_version, forget_auth_version
+from rides.models import Ride, RideEvent, User
+
+
+DATA_SCOPE_BY_MODEL = {Ride: RIDES, RideEvent: EVENTS, User: USERS}
+
+
+@receiver(post_save, sender=Ride)
+@receiver(post_delete, sender=Ride)
+@receiver(post_save, sender=RideEvent)
+@receiver(post_delete, sender=RideEvent)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def ride_data_changed(sender, **kwargs):
+    # Covers the viewsets, the admin and anything else that saves model instances.
+    # `bulk_create`, `QuerySet.update()` and raw SQL send no signals; those paths
+    # call `bump_data_version()` themselves.
+    bump_data_version(DATA_SCOPE_BY_MODEL[sender])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_credentials_changed(sender, instance, **kwargs):
+    # The database trigger has already bumped `auth_version` if it had to; drop the cached
+    # copy so revoked tokens stop working now rather than after JWT_AUTH_VERSION_CACHE_TTL.
+    forget_auth_version(instance.pk)
@@ -0,0 +1,196 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from rides.models import Ride, RideEvent, User
+
+
+class TriggerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rider = User.objects.create_user(email="rider@example.com", first_name="Ada")
+        cls.driver = User.objects.create_user(email="driver@example.com")
+        cls.start = timezone.now() - timedelta(hours=3)
+
+    def create_ride(self):
+        return Ride.objects.create(
+            status="en-route",
+            id_rider=self.rider,
+            id_driver=self.driver,
+            pickup_latitude=40.7,
+            pickup_longitude=-74.0,
+            dropoff_latitude=40.75,
+            dropoff_longitude=-73.98,
+            pickup_time=self.start,
+        )
+
+    def event(self, ride, description, minutes):
+        return RideEvent(id_ride=ride, description=description, created_at=self.start + timedelta(minutes=minutes))
+
+    def ride_columns(self, ride):
+        return Ride.objects.values("version", "picked_up_at", "dropped_off_at", "last_event_at").get(pk=ride.pk)
+
+
+class RideVersionTests(TriggerTestCase):
+    """Every write to a ride bumps its `version`, whichever path it comes from (migration 0005)."""
+
+    def test_writes_bump_the_version(self):
+        ride = self.create_ride()
+        self.assertEqual(self.ride_columns(ride)["version"], 1)
+
+        ride.status = "pickup"
+        ride.save()
+        self.assertEqual(self.ride_columns(ride)["version"], 2)
+
+        Ride.objects.filter(pk=ride.pk).update(status="dropoff")
+        self.assertEqual(self.ride_columns(ride)["version"], 3)
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE rides_ride SET status = 'done' WHERE id_ride = %s", [ride.pk])
+        self.assertEqual(self.ride_columns(ride)["version"], 4)
+
+    def test_stale_instance_does_not_roll_the_version_back(self):
+        ride = self.create_ride()
+        stale = Ride.objects.get(pk=ride.pk)
+        ride.save()
+        ride.save()
+        stale.save()
+        self.assertEqual(self.ride_columns(ride)["version"], 4)
+
+    def test_one_bump_per_event_statement(self):
+        ride, other = self.create_ride(), self.create_ride()
+        RideEvent.objects.bulk_create([self.event(ride, "Running late", minute) for minute in range(3)])
+        self.assertEqual(self.ride_columns(ride)["version"], 2)
+        self.assertEqual(self.ride_columns(other)["version"], 1)
+
+        event = RideEvent.objects.filter(id_ride=ride).first()
+        event.description = "Stuck in traffic"
+        event.save()
+        self.assertEqual(self.ride_columns(ride)["version"], 3)
+
+        event.delete()
+        self.assertEqual(self.ride_columns(ride)["version"], 4)
+
+
+class RideEventKindTests(TriggerTestCase):
+    """`kind` follows the description on insert and update (migration 0007)."""
+
+    def test_kind(self):
+        ride = self.create_ride()
+        RideEvent.objects.bulk_create(
+            [
+                self.event(ride, "Status changed to en-route", 0),
+                self.event(ride, "Status changed to pickup", 1),
+                self.event(ride, "Status changed to dropoff", 2),
+                self.event(ride, "status changed to pickup", 3),
+                self.event(ride, "Running late", 4),
+            ]
+        )
+        self.assertEqual(
+            list(RideEvent.objects.filter(id_ride=ride).order_by("created_at").values_list("kind", flat=True)),
+            ["en-route", "pickup", "dropoff", "other", "other"],
+        )
+
+        RideEvent.objects.filter(id_ride=ride, description="Running late").update(
+            description="Status changed to pickup"
+        )
+        redescribed = RideEvent.objects.get(id_ride=ride, created_at=self.start + timedelta(minutes=4))
+        self.assertEqual(redescribed.kind, "pickup")
+
+
+class RideTimingTests(TriggerTestCase):
+    """`picked_up_at`, `dropped_off_at` and `last_event_at` follow the ride's events (migration 0007)."""
+
+    def test_inserts_fold_in(self):
+        ride = self.create_ride()
+        self.assertEqual(
+            self.ride_columns(ride), {"version": 1, "picked_up_at": None, "dropped_off_at": None, "last_event_at": None}
+        )
+
+        RideEvent.objects.bulk_create(
+            [
+                self.event(ride, "Status changed to pickup", 10),
+                self.event(ride, "Status changed to dropoff", 50),
+                self.event(ride, "Running late", 60),
+            ]
+        )
+        # A later insert only moves the timings outward.
+        RideEvent.objects.bulk_create(
+            [self.event(ride, "Status changed to pickup", 5), self.event(ride, "Status changed to dropoff", 40)]
+        )
+        columns = self.ride_columns(ride)
+        self.assertEqual(columns["picked_up_at"], self.start + timedelta(minutes=5))
+        self.assertEqual(columns["dropped_off_at"], self.start + timedelta(minutes=50))
+        self.assertEqual(columns["last_event_at"], self.start + timedelta(minutes=60))
+
+    def test_updates_and_deletes_recompute(self):
+        ride = self.create_ride()
+        pickup, dropoff, late = RideEvent.objects.bulk_create(
+            [
+                self.event(ride, "Status changed to pickup", 10),
+                self.event(ride, "Status changed to dropoff", 50),
+                self.event(ride, "Running late", 60),
+            ]
+        )
+
+        pickup.description = "Pickup cancelled"
+        pickup.save()
+        late.delete()
+        columns = self.ride_columns(ride)
+        self.assertIsNone(columns["picked_up_at"])
+        self.assertEqual(columns["dropped_off_at"], self.start + timedelta(minutes=50))
+        self.assertEqual(columns["last_event_at"], self.start + timedelta(minutes=50))
+
+    def test_moving_an_event_updates_both_rides(self):
+        ride, other = self.create_ride(), self.create_ride()
+        (pickup,) = RideEvent.objects.bulk_create([self.event(ride, "Status changed to pickup", 10)])
+
+        RideEvent.objects.filter(pk=pickup.pk).update(id_ride=other)
+        self.assertIsNone(self.ride_columns(ride)["picked_up_at"])
+        self.assertIsNone(self.ride_columns(ride)["last_event_at"])
+        self.assertEqual(self.ride_columns(other)["picked_up_at"], self.start + timedelta(minutes=10))
+
+
+class UserVersionTests(TriggerTestCase):
+    """
+    Profile fields rides embed bump the user's own `version` (migration 0012); credentials
+    bump `auth_version` (migration 0008). Neither touches the user's rides.
+    """
+
+    def user_columns(self, user):
+        return User.objects.values_list("version", "auth_version").get(pk=user.pk)
+
+    def test_profile_edits(self):
+        ride = self.create_ride()
+        user = User.objects.get(pk=self.rider.pk)
+
+        user.first_name = "Grace"
+        user.save()
+        self.assertEqual(self.user_columns(user), (2, 1))
+
+        user.last_login = timezone.now()
+        user.save()
+        self.assertEqual(self.user_columns(user), (2, 1))
+
+        User.objects.filter(pk=user.pk).update(phone_number="+1 555 0100")
+        self.assertEqual(self.user_columns(user), (3, 1))
+        self.assertEqual(self.ride_columns(ride)["version"], 1)
+
+    def test_credentials(self):
+        user = User.objects.get(pk=self.rider.pk)
+        stale = User.objects.get(pk=self.rider.pk)
+
+        user.set_password("changed")
+        user.save()
+        self.assertEqual(self.user_columns(user), (1, 2))
+
+        # `role` is embedded in rides and a credential, so it bumps both.
+        User.objects.filter(pk=user.pk).update(role=User.ROLE_ADMIN)
+        self.assertEqual(self.user_columns(user), (2, 3))
+
+        # A save from an instance loaded before both changes writes the old role and password
+        # back: both versions move forward again rather than back to the stale copy's.
+        stale.save()
+        self.assertEqual(self.user_columns(user), (3, 4))